@@ -0,0 +1,132 @@
+import threading
+import time
+
+from flask import has_request_context
+from pymongo import monitoring
+
+
+def parse_route_limits(value):
+    """Parse "get_artists=8,get_playlists=8" into {"get_artists": 8, ...}."""
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            endpoint, limit = item.split("=", 1)
+            limits[endpoint.strip()] = int(limit)
+    return limits
+
+
+class AdmissionController:
+    """
+    Concurrency limiter in front of the database.
+
+    Requests take a slot from a global limit and, when configured, from a
+    per-endpoint limit. A request that cannot get a slot within
+    ``queue_timeout`` seconds is rejected so the caller can fail fast.
+
+    The global limit adapts to database latency (AIMD). Each window of
+    ``limit`` samples (about one round of in-flight requests, TCP's RTT)
+    allows at most one decrease: while the latency EWMA is above
+    ``target_latency`` the limit shrinks by 10% per window, down to
+    ``min_limit``. Otherwise it grows by 1/``limit`` per sample, i.e. about
+    one slot per window, up to ``max_limit``.
+    """
+
+    def __init__(self, max_limit=64, min_limit=4, target_latency=0.05, queue_timeout=0.05,
+                 route_limits=None, smoothing=0.2):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.target_latency = target_latency
+        self.queue_timeout = queue_timeout
+        self.route_limits = route_limits or {}
+        self.smoothing = smoothing
+        self.limit = float(max_limit)
+        self.latency = None
+        # Samples since the last decrease; starts full so the first congestion signal counts
+        self._window_samples = max_limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._route_in_flight = {}
+        self._cond = threading.Condition()
+
+    def _has_room(self, route):
+        if self.in_flight >= int(self.limit):
+            return False
+        route_limit = self.route_limits.get(route)
+        return route_limit is None or self._route_in_flight.get(route, 0) < route_limit
+
+    def try_acquire(self, route):
+        """Return True once a slot is held, or False after queueing for queue_timeout."""
+        deadline = time.monotonic() + self.queue_timeout
+        with self._cond:
+            while not self._has_room(route):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            self._route_in_flight[route] = self._route_in_flight.get(route, 0) + 1
+            return True
+
+    def release(self, route):
+        with self._cond:
+            self.in_flight -= 1
+            self._route_in_flight[route] -= 1
+            self._cond.notify_all()
+
+    def observe_latency(self, seconds):
+        with self._cond:
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += self.smoothing * (seconds - self.latency)
+
+            self._window_samples += 1
+            if self.latency > self.target_latency:
+                if self._window_samples >= self.limit:
+                    self.limit = max(self.min_limit, self.limit * 0.9)
+                    self._window_samples = 0
+            else:
+                grown = self.limit + 1 / self.limit
+                if int(grown) > int(self.limit):
+                    self._cond.notify_all()
+                self.limit = min(self.max_limit, grown)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "db_latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+            }
+
+
+class DbLatencyListener(monitoring.CommandListener):
+    """
+    Feeds PyMongo command durations into an AdmissionController.
+
+    Only commands issued while serving a request are counted; background
+    work such as change-stream getMores (which block for up to a second by
+    design) would otherwise read as congestion. Events are published on the
+    thread that runs the command, so a thread-local ties each completion to
+    its start.
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self._local = threading.local()
+
+    def started(self, event):
+        self._local.request_id = event.request_id if has_request_context() else None
+
+    def _observe(self, event):
+        if getattr(self._local, "request_id", None) == event.request_id:
+            self.controller.observe_latency(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._observe(event)
+
+    def failed(self, event):
+        # Timeouts and errors under load are a congestion signal too
+        self._observe(event)
@@ -0,0 +1,69 @@
+from pymongo import ASCENDING, UpdateOne
+
+from durations import parse_duration
+
+
+def song_seconds(song):
+    song = song or {}
+    if isinstance(song.get("duration_seconds"), int):
+        return song["duration_seconds"]
+    # Songs written before durations were parsed on ingestion
+    return parse_duration(song.get("duration")) or 0
+
+
+def playlist_aggregates(songs):
+    songs = [song for song in songs or [] if song]
+    return {
+        "song_count": len(songs),
+        "total_duration_seconds": sum(song_seconds(song) for song in songs),
+    }
+
+
+def ensure_aggregate_indexes(db):
+    # Both directions of ?sort=song_count walk this index (forwards or backwards)
+    db.artists.create_index([("song_count", ASCENDING), ("_id", ASCENDING)], name="song_count_1__id_1")
+
+
+def recompute_playlist_aggregates(db, batch_size=500):
+    """
+    Recompute song_count / total_duration_seconds for every playlist, e.g.
+    after a backfill or to repair drift. Returns the number of playlists whose
+    stored values changed.
+    """
+    modified = 0
+    operations = []
+    cursor = db.playlists.find(
+        {}, {"songs.duration": 1, "songs.duration_seconds": 1, "song_count": 1, "total_duration_seconds": 1}
+    ).batch_size(batch_size)
+
+    for playlist in cursor:
+        expected = playlist_aggregates(playlist.get("songs"))
+        current = {key: playlist.get(key) for key in expected}
+        if current == expected:
+            continue
+        # Every song write moves the counters, so matching the values we read
+        # skips playlists edited since the scan instead of clobbering them
+        operations.append(UpdateOne(
+            {"_id": playlist["_id"], **current},
+            {"$set": expected}
+        ))
+        if len(operations) >= batch_size:
+            modified += db.playlists.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        modified += db.playlists.bulk_write(operations, ordered=False).modified_count
+    return modified
+
+
+def recompute_artist_song_counts(db):
+    """
+    Set song_count = len(songs) on every artist where it is missing or has
+    drifted, in a single server-side update. Returns the number modified.
+    """
+    actual = {"$size": {"$ifNull": ["$songs", []]}}
+    result = db.artists.update_many(
+        {"$expr": {"$ne": ["$song_count", actual]}},
+        [{"$set": {"song_count": actual}}]
+    )
+    return result.modified_count
@@ -1,17 +1,266 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, has_request_context, jsonify, request
 from flask_pymongo import PyMongo
+import click
 from bson import ObjectId, errors
 import os
 from dotenv import load_dotenv
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 import json
+from pymongo import ASCENDING, DESCENDING
+import search
+import autocomplete
+import cache
+import aggregates
+import durations
+import cascade
+import batch
+import admission
+import ratelimit
+import singleflight
+import writebehind
+import idempotency
+import export
+import roundtrips
+import storage
+import replicas
 
 load_dotenv()
 
 app = Flask(__name__)
 app.config["MONGO_URI"] = os.getenv("MONGO_URI", "mongodb://mongo:27017/music_db")
-mongo = PyMongo(app)
+app.config["AUTOCOMPLETE_TRIE_ENABLED"] = os.getenv("AUTOCOMPLETE_TRIE_ENABLED", "false").lower() == "true"
+app.config["AUTOCOMPLETE_SNAPSHOT_PATH"] = os.getenv("AUTOCOMPLETE_SNAPSHOT_PATH", "/tmp/music-manager-autocomplete.json")
+app.config["CASCADE_BATCH_SIZE"] = int(os.getenv("CASCADE_BATCH_SIZE", "200"))
+app.config["CASCADE_BATCH_PAUSE_SECONDS"] = float(os.getenv("CASCADE_BATCH_PAUSE_SECONDS", "0.05"))
+app.config["IO_POOL_WORKERS"] = int(os.getenv("IO_POOL_WORKERS", "8"))
+app.config["QUERY_POOL_WORKERS"] = int(os.getenv("QUERY_POOL_WORKERS", "12"))
+app.config["READ_CACHE_TTL_SECONDS"] = float(os.getenv("READ_CACHE_TTL_SECONDS", "0"))
+app.config["READ_CACHE_FALLBACK_TTL_SECONDS"] = float(os.getenv("READ_CACHE_FALLBACK_TTL_SECONDS", "5"))
+app.config["READ_CACHE_MAX_ENTRIES"] = int(os.getenv("READ_CACHE_MAX_ENTRIES", "10000"))
+app.config["ADMISSION_CONTROL_ENABLED"] = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+app.config["ADMISSION_MAX_CONCURRENCY"] = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+app.config["ADMISSION_MIN_CONCURRENCY"] = int(os.getenv("ADMISSION_MIN_CONCURRENCY", "4"))
+app.config["ADMISSION_TARGET_DB_LATENCY_MS"] = float(os.getenv("ADMISSION_TARGET_DB_LATENCY_MS", "50"))
+app.config["ADMISSION_QUEUE_TIMEOUT_MS"] = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "50"))
+app.config["ADMISSION_ROUTE_LIMITS"] = admission.parse_route_limits(os.getenv("ADMISSION_ROUTE_LIMITS", ""))
+app.config["ADMISSION_RETRY_AFTER_SECONDS"] = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+admission_controller = admission.AdmissionController(
+    max_limit=app.config["ADMISSION_MAX_CONCURRENCY"],
+    min_limit=app.config["ADMISSION_MIN_CONCURRENCY"],
+    target_latency=app.config["ADMISSION_TARGET_DB_LATENCY_MS"] / 1000,
+    queue_timeout=app.config["ADMISSION_QUEUE_TIMEOUT_MS"] / 1000,
+    route_limits=app.config["ADMISSION_ROUTE_LIMITS"]
+)
+app.config["RATE_LIMIT_ENABLED"] = os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true"
+app.config["RATE_LIMIT_BACKEND"] = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Comma-separated issued API keys; callers with any other X-API-Key are identified by IP
+app.config["API_KEYS"] = ratelimit.parse_api_keys(os.getenv("API_KEYS", ""))
+# "memory" keeps artists, playlists and favorites in this process (benchmarks, hermetic tests)
+app.config["STORAGE_BACKEND"] = os.getenv("STORAGE_BACKEND", "mongo")
+app.config["RATE_LIMIT_CAPACITY"] = float(os.getenv("RATE_LIMIT_CAPACITY", "60"))
+app.config["RATE_LIMIT_REFILL_PER_SECOND"] = float(os.getenv("RATE_LIMIT_REFILL_PER_SECOND", "10"))
+app.config["RATE_LIMIT_ROUTE_COSTS"] = admission.parse_route_limits(
+    os.getenv("RATE_LIMIT_ROUTE_COSTS", "get_artists=5,get_playlists=5,get_library=5,export_collection=20")
+)
+app.config["WRITE_COALESCING_ENABLED"] = os.getenv("WRITE_COALESCING_ENABLED", "false").lower() == "true"
+app.config["WRITE_COALESCING_WINDOW_MS"] = float(os.getenv("WRITE_COALESCING_WINDOW_MS", "5"))
+app.config["WRITE_COALESCING_MAX_BATCH"] = int(os.getenv("WRITE_COALESCING_MAX_BATCH", "500"))
+app.config["WRITE_COALESCING_TIMEOUT_SECONDS"] = float(os.getenv("WRITE_COALESCING_TIMEOUT_SECONDS", "10"))
+app.config["IDEMPOTENCY_KEY_TTL_SECONDS"] = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400"))
+app.config["DB_ROUND_TRIP_BUDGET"] = int(os.getenv("DB_ROUND_TRIP_BUDGET", "5"))
+# e.g. "get_artists=secondaryPreferred,get_playlists=secondaryPreferred"; unlisted routes use the client default
+app.config["READ_PREFERENCE_ROUTES"] = replicas.parse_route_preferences(os.getenv("READ_PREFERENCE_ROUTES", ""))
+app.config["READ_MAX_STALENESS_SECONDS"] = int(os.getenv("READ_MAX_STALENESS_SECONDS", "90"))
+# How long a client reads from the primary after a write; keep it above the max staleness
+app.config["READ_YOUR_WRITES_SECONDS"] = int(os.getenv("READ_YOUR_WRITES_SECONDS", "120"))
+mongo = PyMongo(app, event_listeners=[
+    admission.DbLatencyListener(admission_controller),
+    roundtrips.RoundTripListener()
+])
+read_router = replicas.ReadRouter(
+    app.config["READ_PREFERENCE_ROUTES"],
+    max_staleness=app.config["READ_MAX_STALENESS_SECONDS"],
+    pin_seconds=app.config["READ_YOUR_WRITES_SECONDS"]
+)
 
+def _request_read_preference():
+    return request.environ.get(replicas.READ_PREFERENCE_ENVIRON_KEY) if has_request_context() else None
+
+store = (
+    storage.MemoryStorage() if app.config["STORAGE_BACKEND"] == "memory"
+    else storage.MongoStorage(lambda: mongo.db, lambda: mongo.cx, _request_read_preference)
+)
+autocomplete_index = autocomplete.AutocompleteIndex(snapshot_path=app.config["AUTOCOMPLETE_SNAPSHOT_PATH"])
+read_cache = cache.ReadCache(
+    ttl=app.config["READ_CACHE_TTL_SECONDS"],
+    fallback_ttl=app.config["READ_CACHE_FALLBACK_TTL_SECONDS"],
+    max_entries=app.config["READ_CACHE_MAX_ENTRIES"]
+)
+cache_invalidator = cache.CacheInvalidator(read_cache)
+read_flights = singleflight.SingleFlight()
+# Collects bursty appends for a few ms and flushes them as one bulk_write per collection
+write_coalescer = writebehind.WriteCoalescer(
+    window=app.config["WRITE_COALESCING_WINDOW_MS"] / 1000,
+    max_batch=app.config["WRITE_COALESCING_MAX_BATCH"],
+    logger=app.logger,
+    timeout=app.config["WRITE_COALESCING_TIMEOUT_SECONDS"]
+)
+
+def cached_read(key, loader):
+    """Serve a read from the local cache, coalescing concurrent misses into one query."""
+    if has_request_context() and (request.environ.get(replicas.PINNED_ENVIRON_KEY)
+                                  or replicas.reads_secondary(_request_read_preference())):
+        # Pinned: the cache may predate this client's write. Secondary: the replica
+        # may lag the invalidation stream, so its result must not be shared.
+        return loader()
+    return read_cache.get_or_load(key, lambda: read_flights.do(key, loader))
+
+def cache_id(doc_id):
+    """Canonical id for cache and single-flight keys: ObjectId hex is case-insensitive in URLs."""
+    return str(ObjectId(doc_id))
+
+def invalidate_reads(collection, doc_id=None):
+    if doc_id is not None:
+        doc_id = cache_id(doc_id)
+    read_cache.invalidate(collection, doc_id)
+    read_flights.forget(lambda key: cache.ReadCache.key_matches(key, collection, doc_id))
+
+# Bounded pool for running independent reads concurrently within one request
+io_pool = ThreadPoolExecutor(max_workers=app.config["IO_POOL_WORKERS"], thread_name_prefix="io")
+# Leaf database queries fanned out by a single request. Tasks on this pool
+# never submit to it, so a batch of fan-out requests cannot deadlock it.
+query_pool = ThreadPoolExecutor(max_workers=app.config["QUERY_POOL_WORKERS"], thread_name_prefix="query")
+cascade_worker = cascade.CascadeWorker(
+    batch_size=app.config["CASCADE_BATCH_SIZE"],
+    pause=app.config["CASCADE_BATCH_PAUSE_SECONDS"],
+    on_playlists_updated=lambda ids: [invalidate_reads("playlists", str(i)) for i in ids],
+    on_favorites_updated=lambda: invalidate_reads("favorites"),
+    logger=app.logger
+)
+
+rate_limiter = ratelimit.RateLimiter(
+    ratelimit.MongoBucketStore(lambda: mongo.db.rate_limits)
+    if app.config["RATE_LIMIT_BACKEND"] == "mongo" else ratelimit.MemoryBucketStore(),
+    capacity=app.config["RATE_LIMIT_CAPACITY"],
+    rate=app.config["RATE_LIMIT_REFILL_PER_SECOND"],
+    route_costs=app.config["RATE_LIMIT_ROUTE_COSTS"]
+)
+
+idempotency_store = (
+    idempotency.MemoryIdempotencyStore(app.config["IDEMPOTENCY_KEY_TTL_SECONDS"])
+    if app.config["STORAGE_BACKEND"] == "memory"
+    else idempotency.IdempotencyStore(lambda: mongo.db.idempotency_keys)
+)
+
+round_trip_stats = roundtrips.RoundTripStats(budget=app.config["DB_ROUND_TRIP_BUDGET"])
+
+# Registered first so database work done by the other hooks is charged to the request too
+@app.before_request
+def count_round_trips():
+    # Batch sub-requests are charged to the enclosing batch request
+    if request.environ.get(batch.SUBREQUEST_ENVIRON_KEY) and roundtrips.current() is not None:
+        return None
+    request.environ["db.round_trips"] = roundtrips.start()
+    return None
+
+@app.after_request
+def report_round_trips(response):
+    if "db.round_trips" in request.environ:
+        counter, _ = request.environ["db.round_trips"]
+        response.headers["X-DB-Round-Trips"] = str(counter.count)
+        if round_trip_stats.record(request.endpoint, counter.count):
+            app.logger.warning(
+                "%s %s made %d database round trips (budget %d): %s",
+                request.method, request.path, counter.count, round_trip_stats.budget, ", ".join(counter.commands)
+            )
+    return response
+
+@app.teardown_request
+def stop_round_trips(exc=None):
+    if "db.round_trips" in request.environ:
+        roundtrips.stop(request.environ.pop("db.round_trips")[1])
+
+@app.before_request
+def route_reads():
+    if not read_router.enabled:
+        return None
+    pinned = (request.environ.get(replicas.PINNED_ENVIRON_KEY)
+              or read_router.is_pinned(request.cookies.get(replicas.PIN_COOKIE)))
+    request.environ[replicas.PINNED_ENVIRON_KEY] = bool(pinned)
+    if request.method in batch.READ_METHODS:
+        request.environ[replicas.READ_PREFERENCE_ENVIRON_KEY] = read_router.preference(request.endpoint, pinned)
+    return None
+
+@app.after_request
+def pin_reads_after_write(response):
+    # Batch sub-requests are covered by the cookie set on the batch response
+    wrote = request.environ.get(replicas.WROTE_ENVIRON_KEY, request.method not in batch.READ_METHODS)
+    if (read_router.enabled and wrote and response.status_code < 400
+            and not request.environ.get(batch.SUBREQUEST_ENVIRON_KEY)):
+        response.set_cookie(
+            replicas.PIN_COOKIE, str(read_router.pin_until()),
+            max_age=read_router.pin_seconds, httponly=True, samesite="Lax"
+        )
+    return response
+
+def _client_key():
+    """The caller's identity for rate limits and idempotency keys; batch sub-requests inherit the batch caller's."""
+    if batch.CLIENT_ENVIRON_KEY in request.environ:
+        return request.environ[batch.CLIENT_ENVIRON_KEY]
+    return ratelimit.client_key(request.headers.get("X-API-Key"), request.remote_addr, app.config["API_KEYS"])
+
+RATE_LIMIT_EXEMPT_ENDPOINTS = {"health_check", "metrics", "static"}
+
+@app.before_request
+def limit_rate():
+    if not app.config["RATE_LIMIT_ENABLED"] or request.endpoint in RATE_LIMIT_EXEMPT_ENDPOINTS:
+        return None
+    key = _client_key()
+    try:
+        allowed, remaining, retry_after = rate_limiter.check(key, request.endpoint)
+    except Exception as e:
+        # Fail open: a broken limiter store must not take the API down with it
+        app.logger.warning("Rate limiter unavailable: %s", e)
+        return None
+
+    request.environ["ratelimit.remaining"] = remaining
+    if not allowed:
+        response = jsonify({"success": False, "error": "Rate limit exceeded"})
+        response.headers["Retry-After"] = str(retry_after)
+        return response, 429
+    return None
+
+@app.after_request
+def add_rate_limit_headers(response):
+    if "ratelimit.remaining" in request.environ:
+        response.headers["X-RateLimit-Limit"] = str(int(rate_limiter.capacity))
+        response.headers["X-RateLimit-Remaining"] = str(request.environ["ratelimit.remaining"])
+        response.headers["X-RateLimit-Cost"] = str(rate_limiter.cost(request.endpoint))
+    return response
+
+# Probes must keep answering while the API sheds load
+ADMISSION_EXEMPT_ENDPOINTS = {"health_check", "metrics", "admission_stats", "static"}
+
+@app.before_request
+def admit_request():
+    if (not app.config["ADMISSION_CONTROL_ENABLED"]
+            or request.endpoint in ADMISSION_EXEMPT_ENDPOINTS
+            or request.environ.get(batch.SUBREQUEST_ENVIRON_KEY)):
+        return None
+    if not admission_controller.try_acquire(request.endpoint):
+        response = jsonify({"success": False, "error": "Server is overloaded, please retry"})
+        response.headers["Retry-After"] = str(app.config["ADMISSION_RETRY_AFTER_SECONDS"])
+        return response, 503
+    # Kept in the WSGI environ (not g) so batch sub-requests sharing an app context can't clobber it
+    request.environ["admission.route"] = request.endpoint
+    return None
+
+@app.teardown_request
+def release_admission(exc=None):
+    if "admission.route" in request.environ:
+        admission_controller.release(request.environ.pop("admission.route"))
 
 @app.route("/health", methods=["GET"])
 def health_check():
@@ -29,7 +278,7 @@ def health_check():
     """
     try:
         # Ping the MongoDB server to check connectivity
-        mongo.cx.admin.command("ping")
+        store.ping()
         return jsonify({"success": True, "status": "healthy", "database": "connected"}), 200
     except Exception as e:
         # Handle errors, including authentication issues
@@ -57,28 +306,162 @@ def validate_json(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def idempotent(f):
+    """
+    Honour an Idempotency-Key header: the first request with a key runs and
+    its response is stored; retries with the same key and body get that
+    response replayed without executing the write again. Requests without
+    the header are untouched.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(idempotency.HEADER)
+        if key is None:
+            return f(*args, **kwargs)
+        if not key or len(key) > idempotency.MAX_KEY_LENGTH:
+            return jsonify({"success": False, "error": f"{idempotency.HEADER} must be 1-{idempotency.MAX_KEY_LENGTH} characters"}), 400
+
+        record_key = idempotency.record_id(_client_key(), key)
+        request_fingerprint = idempotency.fingerprint(request.method, request.path, request.get_data())
+        try:
+            record = idempotency_store.begin(record_key, request_fingerprint)
+        except Exception as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+
+        if record is not None:
+            if record["fingerprint"] != request_fingerprint:
+                return jsonify({"success": False, "error": f"{idempotency.HEADER} was already used for a different request"}), 422
+            if record["status"] == idempotency.IN_PROGRESS:
+                response = jsonify({"success": False, "error": "A request with this idempotency key is still in progress"})
+                response.headers["Retry-After"] = "1"
+                return response, 409
+            stored = record["response"]
+            response = app.response_class(stored["body"], status=stored["status"], content_type=stored["content_type"])
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            response = app.make_response(f(*args, **kwargs))
+        except Exception:
+            idempotency_store.abandon(record_key)
+            raise
+        try:
+            if response.status_code >= 500:
+                # Server errors may be transient; let the retry run again
+                idempotency_store.abandon(record_key)
+            else:
+                idempotency_store.complete(record_key, response.status_code, response.get_data(as_text=True), response.content_type)
+        except Exception as e:
+            app.logger.warning("Could not store idempotent response: %s", e)
+        return response
+    return decorated_function
+
+# Attempts at a versioned read-modify-write before giving up with 409
+OCC_MAX_RETRIES = 3
+
+def _if_match_version():
+    """Parse If-Match into a document version; None when absent or "*". Raises ValueError."""
+    value = request.headers.get("If-Match", "").strip()
+    if not value or value == "*":
+        return None
+    try:
+        return int(value.removeprefix("W/").strip('"'))
+    except ValueError:
+        raise ValueError("If-Match must be an ETag returned by this API") from None
+
+def _etag(version):
+    return f'"{version}"'
+
+def _precondition_failed(current_version):
+    response = jsonify({"success": False, "error": "Resource was modified, reload and retry"})
+    response.headers["ETag"] = _etag(current_version)
+    return response, 412
+
+MAX_PAGE_SIZE = 200
+ARTIST_SORT_FIELDS = {"name": "name_normalized", "song_count": "song_count", "created": "_id"}
+
+def _pagination_args():
+    """Read ?limit= and ?offset=; raises ValueError on invalid values."""
+    limit = None
+    if "limit" in request.args:
+        limit = request.args.get("limit", type=int)
+        if limit is None or not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be an integer between 1 and {MAX_PAGE_SIZE}")
+    offset = 0
+    if "offset" in request.args:
+        offset = request.args.get("offset", type=int)
+        if offset is None or offset < 0:
+            raise ValueError("offset must be a non-negative integer")
+    return limit, offset
+
+def _artist_query_args():
+    """
+    Translate ?name_prefix=, ?min_songs= and ?sort= into artist filters and a
+    sort spec. Ties are broken on _id in the same direction so every sort
+    maps onto a single index walk (forwards or backwards).
+    """
+    filters = {}
+    name_prefix = search.normalize(request.args.get("name_prefix", ""))
+    if name_prefix:
+        filters["name_prefix"] = name_prefix
+
+    if "min_songs" in request.args:
+        min_songs = request.args.get("min_songs", type=int)
+        if min_songs is None or min_songs < 0:
+            raise ValueError("min_songs must be a non-negative integer")
+        filters["min_songs"] = min_songs
+
+    sort = None
+    sort_arg = request.args.get("sort")
+    if sort_arg:
+        direction = DESCENDING if sort_arg.startswith("-") else ASCENDING
+        field = ARTIST_SORT_FIELDS.get(sort_arg.lstrip("-"))
+        if not field:
+            raise ValueError(f"sort must be one of: {', '.join(ARTIST_SORT_FIELDS)} (prefix with - for descending)")
+        sort = [(field, direction)] if field == "_id" else [(field, direction), ("_id", direction)]
+    return filters, sort
+
+def _load_artists(filters=None, sort=None, limit=None, offset=0, projection=None):
+    artists = store.artists.find(**(filters or {}), sort=sort, limit=limit, offset=offset, projection=projection)
+    for artist in artists:
+        artist["_id"] = str(artist["_id"])
+    return artists
+
 @app.route("/api/artists", methods=["GET"])
 def get_artists():
     try:
-        artists = list(mongo.db.artists.find())
-        for artist in artists:
-            artist["_id"] = str(artist["_id"])
-        return jsonify(artists)
+        try:
+            filters, sort = _artist_query_args()
+            limit, offset = _pagination_args()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        # Keyed on the parsed arguments so unrecognised query params can't fan out copies
+        cache_key = ("artists", None, tuple(sorted(filters.items())), tuple(sort or ()), limit, offset)
+        return jsonify(cached_read(cache_key, lambda: _load_artists(filters, sort, limit, offset)))
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route("/api/artists", methods=["POST"])
 @validate_json
+@idempotent
 def add_artist():
     try:
         name = request.json.get("name")
         if not name or len(name.strip()) == 0:
             return jsonify({"success": False, "error": "Artist name is required"}), 400
 
-        result = mongo.db.artists.insert_one({"name": name, "songs": []})
+        artist_id = store.artists.insert({
+            "name": name,
+            "name_normalized": search.normalize(name),
+            "songs": [],
+            "song_count": 0,
+            "version": 0
+        })
+        invalidate_reads("artists")
         return jsonify({
             "success": True,
-            "id": str(result.inserted_id)
+            "id": str(artist_id)
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
@@ -86,17 +469,31 @@ def add_artist():
 @app.route("/api/artists/<artist_id>", methods=["DELETE"])
 def delete_artist(artist_id):
     try:
-        result = mongo.db.artists.delete_one({"_id": ObjectId(artist_id)})
-        if result.deleted_count == 0:
+        if not store.artists.delete(artist_id):
             return jsonify({"success": False, "error": "Artist not found"}), 404
-        return jsonify({"success": True})
+        invalidate_reads("artists", artist_id)
+        # Playlist and favorite entries referencing the artist are removed in the background
+        job_id = store.enqueue_cascade(cascade_worker, artist_id)
+        return jsonify({"success": True, "cleanup_job": job_id})
     except errors.InvalidId:
         return jsonify({"success": False, "error": "Invalid artist ID format"}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify(cascade_worker.jobs())
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = cascade_worker.get(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify(job)
+
 @app.route("/api/artists/<artist_id>/songs", methods=["POST"])
 @validate_json
+@idempotent
 def add_song(artist_id):
     try:
         title = request.json.get("title")
@@ -105,15 +502,25 @@ def add_song(artist_id):
         if not title or not duration:
             return jsonify({"success": False, "error": "Title and duration are required"}), 400
 
-        song = {"title": title, "duration": duration}
-        result = mongo.db.artists.update_one(
-            {"_id": ObjectId(artist_id)},
-            {"$push": {"songs": song}}
-        )
-        
-        if result.matched_count == 0:
+        try:
+            expected_version = _if_match_version()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        song = {
+            "title": title,
+            "title_normalized": search.normalize(title),
+            "duration": duration,
+            "duration_seconds": durations.parse_duration(duration)
+        }
+        if not store.artists.push_song(artist_id, song, expected_version):
+            if expected_version is not None:
+                current = store.artists.get(artist_id, {"version": 1})
+                if current:
+                    return _precondition_failed(current.get("version", 0))
             return jsonify({"success": False, "error": "Artist not found"}), 404
-            
+
+        invalidate_reads("artists", artist_id)
         return jsonify({"success": True})
     except errors.InvalidId:
         return jsonify({"success": False, "error": "Invalid artist ID format"}), 400
@@ -123,40 +530,113 @@ def add_song(artist_id):
 @app.route("/api/artists/<artist_id>/songs/<int:song_index>", methods=["DELETE"])
 def delete_song(artist_id, song_index):
     try:
-        artist = mongo.db.artists.find_one({"_id": ObjectId(artist_id)})
-        if not artist:
-            return jsonify({"success": False, "error": "Artist not found"}), 404
-            
-        if song_index >= len(artist['songs']):
-            return jsonify({"success": False, "error": "Song index out of range"}), 404
+        try:
+            expected_version = _if_match_version()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
 
-        mongo.db.artists.update_one(
-            {"_id": ObjectId(artist_id)},
-            {"$unset": {f"songs.{song_index}": 1}}
-        )
-        mongo.db.artists.update_one(
-            {"_id": ObjectId(artist_id)},
-            {"$pull": {"songs": None}}
-        )
-        return jsonify({"success": True})
+        # Versioned read-modify-write: the update only applies if nobody wrote in between
+        for _ in range(OCC_MAX_RETRIES):
+            artist = store.artists.get(artist_id)
+            if not artist:
+                return jsonify({"success": False, "error": "Artist not found"}), 404
+
+            version = artist.get("version", 0)
+            if expected_version is not None and version != expected_version:
+                return _precondition_failed(version)
+            if song_index >= len(artist['songs']):
+                return jsonify({"success": False, "error": "Song index out of range"}), 404
+
+            if store.artists.remove_song(artist_id, artist, song_index):
+                invalidate_reads("artists", artist_id)
+                response = jsonify({"success": True})
+                response.headers["ETag"] = _etag(version + 1)
+                return response
+        return jsonify({"success": False, "error": "Artist is being modified concurrently, please retry"}), 409
     except errors.InvalidId:
         return jsonify({"success": False, "error": "Invalid artist ID format"}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route("/api/search", methods=["GET"])
+def search_catalog():
+    try:
+        query = request.args.get("q", "")
+        limit = request.args.get("limit", default=search.DEFAULT_LIMIT, type=int)
+        if not 1 <= limit <= search.MAX_LIMIT:
+            return jsonify({"success": False, "error": f"limit must be between 1 and {search.MAX_LIMIT}"}), 400
+
+        if autocomplete_index.ready:
+            return jsonify(autocomplete_index.search(query, limit))
+        return jsonify(store.search(query, limit))
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route("/api/search/stats", methods=["GET"])
+def search_stats():
+    stats = autocomplete_index.stats()
+    stats["enabled"] = app.config["AUTOCOMPLETE_TRIE_ENABLED"]
+    return jsonify(stats)
+
+EXPANDABLE = {"artists"}
+EXPANDED_ARTIST_FIELDS = {"name": 1, "song_count": 1}
+
+def _expand_args():
+    """Read ?expand=; raises ValueError on unsupported relations."""
+    expand = {value.strip() for value in request.args.get("expand", "").split(",") if value.strip()}
+    unsupported = expand - EXPANDABLE
+    if unsupported:
+        raise ValueError(f"Unsupported expand value: {', '.join(sorted(unsupported))}")
+    return expand
+
+def _with_artists(doc):
+    """
+    Return a copy of a playlist/favorites document whose songs carry their
+    artist, resolved with a single $in query over the distinct artist ids.
+    The input may be a shared cached value, so it is never modified.
+    """
+    songs = [song for song in doc.get("songs", []) if song]
+    ids = list(dict.fromkeys(
+        ObjectId(song["artist_id"]) for song in songs if ObjectId.is_valid(song.get("artist_id"))
+    ))
+    artists = {}
+    if ids:
+        for artist in store.artists.find(ids=ids, projection=EXPANDED_ARTIST_FIELDS):
+            artist["_id"] = str(artist["_id"])
+            artists[artist["_id"]] = artist
+
+    expanded = dict(doc)
+    expanded["songs"] = [dict(song, artist=artists.get(str(song.get("artist_id")))) for song in songs]
+    return expanded
+
 # Playlist Routes
+def _load_playlists(summary=False, limit=None, offset=0):
+    projection = {"songs": 0} if summary else None
+    playlists = store.playlists.find(projection, limit, offset)
+    for playlist in playlists:
+        playlist["_id"] = str(playlist["_id"])
+    return playlists
+
 @app.route("/api/playlists", methods=["GET"])
 def get_playlists():
     try:
-        playlists = list(mongo.db.playlists.find())
-        for playlist in playlists:
-            playlist["_id"] = str(playlist["_id"])
-        return jsonify(playlists)
+        try:
+            limit, offset = _pagination_args()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        # ?summary=true omits the songs arrays; song_count/total_duration_seconds remain
+        summary = request.args.get("summary", "false").lower() == "true"
+        return jsonify(cached_read(
+            ("playlists", None, summary, limit, offset),
+            lambda: _load_playlists(summary, limit, offset)
+        ))
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route("/api/playlists", methods=["POST"])
 @validate_json
+@idempotent
 def create_playlist():
     try:
         name = request.json.get("name")
@@ -166,24 +646,42 @@ def create_playlist():
         playlist_data = {
             "name": name,
             "description": request.json.get("description", ""),
-            "songs": []
+            "songs": [],
+            "song_count": 0,
+            "total_duration_seconds": 0,
+            "version": 0
         }
-        result = mongo.db.playlists.insert_one(playlist_data)
+        playlist_id = store.playlists.insert(playlist_data)
+        invalidate_reads("playlists")
         return jsonify({
             "success": True,
-            "id": str(result.inserted_id)
+            "id": str(playlist_id)
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
+def _load_playlist(playlist_id):
+    playlist = store.playlists.get(playlist_id)
+    if playlist:
+        playlist["_id"] = str(playlist["_id"])
+    return playlist
+
 @app.route("/api/playlists/<playlist_id>", methods=["GET"])
 def get_playlist(playlist_id):
     try:
-        playlist = mongo.db.playlists.find_one({"_id": ObjectId(playlist_id)})
+        try:
+            expand = _expand_args()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        playlist = cached_read(("playlists", cache_id(playlist_id)), lambda: _load_playlist(playlist_id))
         if not playlist:
             return jsonify({"success": False, "error": "Playlist not found"}), 404
-        playlist["_id"] = str(playlist["_id"])
-        return jsonify(playlist)
+        if "artists" in expand:
+            playlist = _with_artists(playlist)
+        response = jsonify(playlist)
+        response.headers["ETag"] = _etag(playlist.get("version", 0))
+        return response
     except errors.InvalidId:
         return jsonify({"success": False, "error": "Invalid playlist ID format"}), 400
     except Exception as e:
@@ -192,9 +690,9 @@ def get_playlist(playlist_id):
 @app.route("/api/playlists/<playlist_id>", methods=["DELETE"])
 def delete_playlist(playlist_id):
     try:
-        result = mongo.db.playlists.delete_one({"_id": ObjectId(playlist_id)})
-        if result.deleted_count == 0:
+        if not store.playlists.delete(playlist_id):
             return jsonify({"success": False, "error": "Playlist not found"}), 404
+        invalidate_reads("playlists", playlist_id)
         return jsonify({"success": True})
     except errors.InvalidId:
         return jsonify({"success": False, "error": "Invalid playlist ID format"}), 400
@@ -203,6 +701,7 @@ def delete_playlist(playlist_id):
 
 @app.route("/api/playlists/<playlist_id>/songs", methods=["POST"])
 @validate_json
+@idempotent
 def add_song_to_playlist(playlist_id):
     try:
         required_fields = ["artist_id", "artist_name", "title", "duration"]
@@ -214,17 +713,24 @@ def add_song_to_playlist(playlist_id):
             "artist_id": request.json["artist_id"],
             "artist_name": request.json["artist_name"],
             "title": request.json["title"],
-            "duration": request.json["duration"]
+            "duration": request.json["duration"],
+            "duration_seconds": durations.parse_duration(request.json["duration"])
         }
 
-        result = mongo.db.playlists.update_one(
-            {"_id": ObjectId(playlist_id)},
-            {"$push": {"songs": song_data}}
-        )
-        
-        if result.matched_count == 0:
+        try:
+            expected_version = _if_match_version()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        coalescer = write_coalescer if app.config["WRITE_COALESCING_ENABLED"] else None
+        if not store.playlists.push_song(playlist_id, song_data, expected_version, coalescer):
+            if expected_version is not None:
+                current = store.playlists.get(playlist_id, {"version": 1})
+                if current:
+                    return _precondition_failed(current.get("version", 0))
             return jsonify({"success": False, "error": "Playlist not found"}), 404
-            
+
+        invalidate_reads("playlists", playlist_id)
         return jsonify({"success": True})
     except errors.InvalidId:
         return jsonify({"success": False, "error": "Invalid playlist ID format"}), 400
@@ -234,34 +740,112 @@ def add_song_to_playlist(playlist_id):
 @app.route("/api/playlists/<playlist_id>/songs/<int:song_index>", methods=["DELETE"])
 def remove_song_from_playlist(playlist_id, song_index):
     try:
-        playlist = mongo.db.playlists.find_one({"_id": ObjectId(playlist_id)})
-        if not playlist:
-            return jsonify({"success": False, "error": "Playlist not found"}), 404
+        try:
+            expected_version = _if_match_version()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
 
-        if song_index >= len(playlist['songs']):
-            return jsonify({"success": False, "error": "Song index out of range"}), 404
+        # Versioned read-modify-write: the update only applies if nobody wrote in between
+        for _ in range(OCC_MAX_RETRIES):
+            playlist = store.playlists.get(playlist_id)
+            if not playlist:
+                return jsonify({"success": False, "error": "Playlist not found"}), 404
 
-        mongo.db.playlists.update_one(
-            {"_id": ObjectId(playlist_id)},
-            {"$unset": {f"songs.{song_index}": 1}}
-        )
-        mongo.db.playlists.update_one(
-            {"_id": ObjectId(playlist_id)},
-            {"$pull": {"songs": None}}
+            version = playlist.get("version", 0)
+            if expected_version is not None and version != expected_version:
+                return _precondition_failed(version)
+            if song_index >= len(playlist['songs']):
+                return jsonify({"success": False, "error": "Song index out of range"}), 404
+
+            if store.playlists.remove_song(playlist_id, playlist, song_index):
+                invalidate_reads("playlists", playlist_id)
+                response = jsonify({"success": True})
+                response.headers["ETag"] = _etag(version + 1)
+                return response
+        return jsonify({"success": False, "error": "Playlist is being modified concurrently, please retry"}), 409
+    except errors.InvalidId:
+        return jsonify({"success": False, "error": "Invalid playlist ID format"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def _playlist_order_response(playlist_id, version, expected_version, mismatch_error):
+    """Answer a move/reorder; when nothing matched (``version`` is None) work out why on the slow path."""
+    if version is not None:
+        invalidate_reads("playlists", playlist_id)
+        response = jsonify({"success": True})
+        response.headers["ETag"] = _etag(version)
+        return response
+
+    current = store.playlists.get(playlist_id, {"version": 1})
+    if not current:
+        return jsonify({"success": False, "error": "Playlist not found"}), 404
+    if expected_version is not None and current.get("version", 0) != expected_version:
+        return _precondition_failed(current.get("version", 0))
+    return jsonify({"success": False, "error": mismatch_error}), 409
+
+def _is_index(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+@app.route("/api/playlists/<playlist_id>/songs:move", methods=["POST"])
+@validate_json
+def move_playlist_song(playlist_id):
+    try:
+        from_index = request.json.get("from")
+        to_index = request.json.get("to")
+        if not _is_index(from_index) or not _is_index(to_index):
+            return jsonify({"success": False, "error": "from and to must be non-negative integers"}), 400
+        try:
+            expected_version = _if_match_version()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        version = store.playlists.move_song(playlist_id, from_index, to_index, expected_version)
+        return _playlist_order_response(playlist_id, version, expected_version, "Song index out of range")
+    except errors.InvalidId:
+        return jsonify({"success": False, "error": "Invalid playlist ID format"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route("/api/playlists/<playlist_id>/songs:reorder", methods=["POST"])
+@validate_json
+def reorder_playlist_songs(playlist_id):
+    try:
+        order = request.json.get("order")
+        if (not isinstance(order, list) or not all(_is_index(i) for i in order)
+                or sorted(order) != list(range(len(order)))):
+            return jsonify({"success": False, "error": "order must be a permutation of the song indexes"}), 400
+        try:
+            expected_version = _if_match_version()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        version = store.playlists.reorder_songs(playlist_id, order, expected_version)
+        return _playlist_order_response(
+            playlist_id, version, expected_version, "order does not match the playlist's current songs"
         )
-        return jsonify({"success": True})
     except errors.InvalidId:
         return jsonify({"success": False, "error": "Invalid playlist ID format"}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 # Favorites Routes
+def _load_favorites(songs_limit=None, songs_offset=0):
+    favorites = store.favorites.get(songs_limit, songs_offset) or {"songs": []}
+    if "_id" in favorites:
+        favorites["_id"] = str(favorites["_id"])
+    return favorites
+
 @app.route("/api/favorites", methods=["GET"])
 def get_favorites():
     try:
-        favorites = mongo.db.favorites.find_one({"type": "user_favorites"}) or {"songs": []}
-        if "_id" in favorites:
-            favorites["_id"] = str(favorites["_id"])
+        try:
+            expand = _expand_args()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        favorites = cached_read(("favorites", None), _load_favorites)
+        if "artists" in expand:
+            favorites = _with_artists(favorites)
         return jsonify(favorites)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -279,30 +863,13 @@ def add_favorite_song():
             "artist_id": request.json["artist_id"],
             "artist_name": request.json["artist_name"],
             "title": request.json["title"],
-            "duration": request.json["duration"]
+            "duration": request.json["duration"],
+            "duration_seconds": durations.parse_duration(request.json["duration"])
         }
         
-        # Initialize favorites document if it doesn't exist
-        mongo.db.favorites.update_one(
-            {"type": "user_favorites"},
-            {
-                "$setOnInsert": {"type": "user_favorites", "songs": []},
-            },
-            upsert=True
-        )
-        
-        # Add the song to favorites if it's not already there
-        result = mongo.db.favorites.update_one(
-            {
-                "type": "user_favorites",
-                "songs": {"$not": {"$elemMatch": {
-                    "artist_id": song_data["artist_id"],
-                    "title": song_data["title"]
-                }}}
-            },
-            {"$push": {"songs": song_data}}
-        )
-        
+        store.favorites.add_song(song_data, write_coalescer if app.config["WRITE_COALESCING_ENABLED"] else None)
+
+        invalidate_reads("favorites")
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
@@ -310,17 +877,198 @@ def add_favorite_song():
 @app.route("/api/favorites/songs/<artist_id>/<path:title>", methods=["DELETE"])
 def remove_favorite_song(artist_id, title):
     try:
-        result = mongo.db.favorites.update_one(
-            {"type": "user_favorites"},
-            {"$pull": {"songs": {"artist_id": artist_id, "title": title}}}
-        )
-        
-        if result.matched_count == 0:
+        if not store.favorites.remove_song(artist_id, title):
             return jsonify({"success": False, "error": "Favorites not found"}), 404
-            
+
+        invalidate_reads("favorites")
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+LIBRARY_PAGE_SIZE = 50
+LIBRARY_ARTIST_FIELDS = {"name": 1, "song_count": 1}
+
+@app.route("/api/library", methods=["GET"])
+def get_library():
+    """
+    Artists, playlists and favorites for the home screen in one response.
+
+    The three projected, paginated queries run concurrently on the query
+    pool, so latency is the slowest query rather than the sum. ?limit= and
+    ?offset= apply to each section (default limit 50).
+    """
+    try:
+        try:
+            limit, offset = _pagination_args()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        limit = limit or LIBRARY_PAGE_SIZE
+        page = ("library", limit, offset)
+
+        # in_current_context keeps the pooled queries charged to this request's round-trip count
+        artists = query_pool.submit(roundtrips.in_current_context(cached_read), ("artists", None) + page, lambda: _load_artists(
+            sort=[("_id", ASCENDING)], limit=limit, offset=offset, projection=LIBRARY_ARTIST_FIELDS
+        ))
+        playlists = query_pool.submit(roundtrips.in_current_context(cached_read), ("playlists", None) + page, lambda: _load_playlists(
+            summary=True, limit=limit, offset=offset
+        ))
+        favorites = query_pool.submit(roundtrips.in_current_context(cached_read), ("favorites", None) + page, lambda: _load_favorites(
+            songs_limit=limit, songs_offset=offset
+        ))
+        return jsonify({
+            "artists": artists.result(),
+            "playlists": playlists.result(),
+            "favorites": favorites.result()
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route("/api/export/<collection>", methods=["GET"])
+def export_collection(collection):
+    """
+    Stream a whole collection as NDJSON (relaxed Extended JSON, one document
+    per line, in _id order) without materializing it. ?after=<_id> resumes
+    after the last line received, ?compress=gzip gzips the stream,
+    ?snapshot=true reads from a single point in time and ?batch_size=
+    tunes the cursor.
+    """
+    try:
+        if collection not in export.EXPORT_COLLECTIONS:
+            return jsonify({"success": False, "error": f"collection must be one of: {', '.join(export.EXPORT_COLLECTIONS)}"}), 404
+        after = request.args.get("after")
+        if after is not None and not ObjectId.is_valid(after):
+            return jsonify({"success": False, "error": "after must be a valid _id"}), 400
+        batch_size = request.args.get("batch_size", default=export.DEFAULT_BATCH_SIZE, type=int)
+        if not 1 <= batch_size <= export.MAX_BATCH_SIZE:
+            return jsonify({"success": False, "error": f"batch_size must be between 1 and {export.MAX_BATCH_SIZE}"}), 400
+        compress = request.args.get("compress")
+        if compress not in (None, "gzip"):
+            return jsonify({"success": False, "error": "compress must be gzip"}), 400
+        snapshot = request.args.get("snapshot", "false").lower() == "true"
+
+        chunks = store.stream_collection(collection, after, batch_size, snapshot=snapshot, compress=compress == "gzip")
+        # Pull the first chunk now so query errors still get a proper error response
+        first = next(chunks, b"")
+        filename = collection + (".ndjson.gz" if compress else ".ndjson")
+        return Response(
+            itertools.chain([first], chunks),
+            mimetype="application/gzip" if compress else "application/x-ndjson",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify({
+        "admission": admission_controller.stats(),
+        "read_cache": {"enabled": read_cache.enabled, "entries": len(read_cache), "stream_healthy": read_cache.stream_healthy},
+        "singleflight": read_flights.stats(),
+        "db_round_trips": round_trip_stats.stats(),
+        "write_coalescing": dict(write_coalescer.stats(), enabled=app.config["WRITE_COALESCING_ENABLED"]),
+    })
+
+@app.route("/api/admission", methods=["GET"])
+def admission_stats():
+    return jsonify(admission_controller.stats())
+
+@app.route("/api/batch", methods=["POST"])
+@validate_json
+def run_batch():
+    try:
+        # Accept either a bare array or {"requests": [...]}
+        payload = request.json
+        sub_requests = payload.get("requests") if isinstance(payload, dict) else payload
+        error = batch.validate(sub_requests)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+
+        writes = any(str(sub.get("method", "GET")).upper() not in batch.READ_METHODS for sub in sub_requests)
+        request.environ[replicas.WROTE_ENVIRON_KEY] = writes
+        # Reads in a batch that writes must see the batch's own writes
+        pinned = writes or request.environ.get(replicas.PINNED_ENVIRON_KEY)
+        environ = {"REMOTE_ADDR": request.remote_addr, batch.CLIENT_ENVIRON_KEY: _client_key()}
+        if pinned and read_router.enabled:
+            environ[replicas.PINNED_ENVIRON_KEY] = True
+        return jsonify({"success": True, "responses": batch.run(app, sub_requests, io_pool, environ)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def ensure_indexes():
+    # The in-memory storage backend maintains its own indexes
+    catalog_in_mongo = app.config["STORAGE_BACKEND"] == "mongo"
+    try:
+        if catalog_in_mongo:
+            search.ensure_search_indexes(mongo.db)
+            durations.ensure_duration_indexes(mongo.db)
+            aggregates.ensure_aggregate_indexes(mongo.db)
+            cascade.ensure_cascade_indexes(mongo.db)
+            idempotency.ensure_idempotency_indexes(mongo.db, app.config["IDEMPOTENCY_KEY_TTL_SECONDS"])
+        if app.config["RATE_LIMIT_BACKEND"] == "mongo":
+            ratelimit.ensure_rate_limit_indexes(mongo.db)
+        if catalog_in_mongo:
+            # Last: fails on databases that already hold duplicate favorites documents
+            storage.ensure_favorites_indexes(mongo.db)
+    except Exception as e:
+        app.logger.warning("Could not create indexes: %s", e)
+
+def start_background_workers():
+    # Both follow the catalog through Mongo change streams
+    if app.config["STORAGE_BACKEND"] != "mongo":
+        return
+    if app.config["AUTOCOMPLETE_TRIE_ENABLED"]:
+        autocomplete_index.start(mongo.db, app.logger)
+    if read_cache.enabled:
+        cache_invalidator.start(mongo.db, app.logger)
+
+@app.cli.command("backfill-search")
+def backfill_search_command():
+    """Populate normalized search fields on existing artists."""
+    updated = search.backfill_search_fields(mongo.db)
+    print(f"Updated {updated} artists")
+
+@app.cli.command("backfill-durations")
+def backfill_durations_command():
+    """Parse songs.duration into songs.duration_seconds on existing documents."""
+    updated = durations.backfill_duration_seconds(mongo.db)
+    print(", ".join(f"Updated {count} {name}" for name, count in updated.items()))
+
+@app.cli.command("recompute-playlist-aggregates")
+def recompute_playlist_aggregates_command():
+    """Recompute song_count / total_duration_seconds on all playlists."""
+    modified = aggregates.recompute_playlist_aggregates(mongo.db)
+    print(f"Updated {modified} playlists")
+
+@app.cli.command("recompute-artist-song-counts")
+def recompute_artist_song_counts_command():
+    """Recompute song_count on all artists."""
+    modified = aggregates.recompute_artist_song_counts(mongo.db)
+    print(f"Updated {modified} artists")
+
+@app.cli.command("cascade-sweep")
+def cascade_sweep_command():
+    """Remove songs of deleted artists whose cleanup job was lost (e.g. the pod restarted)."""
+    job_ids = cascade_worker.sweep(mongo.db)
+    cascade_worker.join()
+    failed = [job for job in map(cascade_worker.get, job_ids) if job["state"] == "failed"]
+    print(f"Cleaned up {len(job_ids) - len(failed)} deleted artists, {len(failed)} failed")
+
+@app.cli.command("export-data")
+@click.argument("directory")
+@click.option("--gzip", "compress", is_flag=True, help="Write .ndjson.gz files.")
+@click.option("--snapshot", is_flag=True, help="Read all collections from one point in time (replica set only).")
+@click.option("--batch-size", default=export.DEFAULT_BATCH_SIZE, show_default=True, help="Cursor batch size.")
+@click.option("--after", help="Only export documents whose _id is greater than this ObjectId, "
+                              "e.g. the last _id an interrupted export wrote.")
+def export_data_command(directory, compress, snapshot, batch_size, after):
+    """Export artists, playlists and favorites as NDJSON files into DIRECTORY."""
+    if after is not None and not ObjectId.is_valid(after):
+        raise click.BadParameter("must be a 24-character hex ObjectId", param_hint="--after")
+    for path in export.export_to_directory(mongo.db, directory, after=after, batch_size=batch_size,
+                                           snapshot=snapshot, compress=compress):
+        print(f"Wrote {path}")
+
 if __name__ == "__main__":
+    ensure_indexes()
+    start_background_workers()
     app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
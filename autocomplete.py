@@ -0,0 +1,360 @@
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+import search
+
+ARTIST = "artist"
+SONG = "song"
+# Events that carry no documentKey and end or reset the stream: rebuild from a scan
+REBUILD_EVENTS = {"drop", "rename", "dropDatabase", "invalidate"}
+
+
+def _payload_order(payload):
+    # Payloads may hold None (a song without a duration), which doesn't compare with str
+    return tuple("" if value is None else str(value) for value in payload) if isinstance(payload, tuple) else payload
+
+
+class PrefixTrie:
+    """
+    Compact trie whose nodes live in parallel typed arrays.
+
+    Node ``i`` is described by ``_chars[i]`` (code point of the edge leading
+    into it), ``_first_child[i]`` and ``_next_sibling[i]``; children form a
+    sibling list kept in code-point order. ``_counts[i]`` is the number of
+    payloads in the subtree under node ``i``. Only terminal nodes carry
+    Python objects (a set of payloads), so the per-node overhead is 16 bytes.
+    A node whose count drops to zero is unlinked and its slot (and those
+    below it) reused by later inserts, so churn doesn't grow the arrays.
+    """
+
+    def __init__(self):
+        self._chars = array("I", [0])
+        self._first_child = array("i", [-1])
+        self._next_sibling = array("i", [-1])
+        self._counts = array("i", [0])
+        self._free = []
+        self._payloads = {}
+
+    def __len__(self):
+        return len(self._chars) - len(self._free)
+
+    def _child(self, node, code):
+        child = self._first_child[node]
+        while child != -1 and self._chars[child] < code:
+            child = self._next_sibling[child]
+        if child != -1 and self._chars[child] == code:
+            return child
+        return -1
+
+    def _add_child(self, node, code):
+        if self._free:
+            new = self._free.pop()
+            self._chars[new] = code
+            self._first_child[new] = -1
+            self._counts[new] = 0
+        else:
+            new = len(self._chars)
+            self._chars.append(code)
+            self._first_child.append(-1)
+            self._next_sibling.append(-1)
+            self._counts.append(0)
+
+        prev, child = -1, self._first_child[node]
+        while child != -1 and self._chars[child] < code:
+            prev, child = child, self._next_sibling[child]
+        self._next_sibling[new] = child
+        if prev == -1:
+            self._first_child[node] = new
+        else:
+            self._next_sibling[prev] = new
+        return new
+
+    def _unlink(self, parent, node):
+        prev, child = -1, self._first_child[parent]
+        while child != node:
+            prev, child = child, self._next_sibling[child]
+        if prev == -1:
+            self._first_child[parent] = self._next_sibling[node]
+        else:
+            self._next_sibling[prev] = self._next_sibling[node]
+        # Free the node and everything below it; none of it holds payloads
+        stack = [node]
+        while stack:
+            freed = stack.pop()
+            self._free.append(freed)
+            child = self._first_child[freed]
+            while child != -1:
+                stack.append(child)
+                child = self._next_sibling[child]
+
+    def _path(self, key):
+        """Nodes from the root to ``key``, or None if it isn't in the trie."""
+        path = [0]
+        for ch in key:
+            node = self._child(path[-1], ord(ch))
+            if node == -1:
+                return None
+            path.append(node)
+        return path
+
+    def _find(self, key):
+        path = self._path(key)
+        return path[-1] if path else -1
+
+    def insert(self, key, payload):
+        path = [0]
+        for ch in key:
+            code = ord(ch)
+            child = self._child(path[-1], code)
+            path.append(child if child != -1 else self._add_child(path[-1], code))
+        payloads = self._payloads.setdefault(path[-1], set())
+        if payload not in payloads:
+            payloads.add(payload)
+            for node in path:
+                self._counts[node] += 1
+
+    def remove(self, key, payload):
+        path = self._path(key)
+        if path is None or payload not in self._payloads.get(path[-1], ()):
+            return
+        payloads = self._payloads[path[-1]]
+        payloads.discard(payload)
+        if not payloads:
+            del self._payloads[path[-1]]
+        for node in path:
+            self._counts[node] -= 1
+        # Prune from the highest node left empty; the root always stays
+        for parent, node in zip(path, path[1:]):
+            if not self._counts[node]:
+                self._unlink(parent, node)
+                break
+
+    def iter_prefix(self, prefix):
+        """Yield payloads under ``prefix``, shortest keys first."""
+        start = self._find(prefix)
+        if start == -1:
+            return
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for payload in sorted(self._payloads.get(node, ()), key=_payload_order):
+                yield payload
+            child = self._first_child[node]
+            while child != -1:
+                queue.append(child)
+                child = self._next_sibling[child]
+
+    def memory_bytes(self):
+        arrays = sum(a.itemsize * len(a) for a in (self._chars, self._first_child, self._next_sibling, self._counts))
+        payloads = sys.getsizeof(self._payloads) + sum(
+            sys.getsizeof(s) + sum(sys.getsizeof(p) for p in s) for s in self._payloads.values()
+        )
+        return arrays + payloads
+
+
+class AutocompleteIndex:
+    """
+    In-process autocomplete over artist names and song titles.
+
+    Built from a streaming scan of ``artists`` and kept fresh by a background
+    change-stream consumer. The indexed catalog and the last resume token are
+    snapshotted to ``snapshot_path`` so a restart resumes the stream instead of
+    rescanning the collection.
+    """
+
+    def __init__(self, snapshot_path=None, batch_size=1000, snapshot_interval=30.0):
+        self.snapshot_path = snapshot_path
+        self.batch_size = batch_size
+        self.snapshot_interval = snapshot_interval
+        self.resume_token = None
+        self.ready = False
+        self._lock = threading.RLock()
+        self._trie = PrefixTrie()
+        self._artists = {}
+        self._dirty = False
+        self._last_snapshot = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Index maintenance
+
+    @staticmethod
+    def _entries(artist_id, name, songs):
+        yield search.normalize(name), (ARTIST, artist_id, name, "", "")
+        for title, duration in songs:
+            yield search.normalize(title), (SONG, artist_id, name, title, duration)
+
+    def _set_artist(self, artist_id, record):
+        with self._lock:
+            old = self._artists.pop(artist_id, None)
+            if old is not None:
+                for key, payload in self._entries(artist_id, *old):
+                    self._trie.remove(key, payload)
+            if record is not None:
+                self._artists[artist_id] = record
+                for key, payload in self._entries(artist_id, *record):
+                    if key:
+                        self._trie.insert(key, payload)
+            self._dirty = True
+
+    @staticmethod
+    def _record(doc):
+        songs = tuple(
+            # Duration as stored, matching what the Mongo search path returns
+            (song.get("title") or "", song.get("duration"))
+            for song in doc.get("songs") or [] if song
+        )
+        return (doc.get("name") or "", songs)
+
+    def clear(self):
+        with self._lock:
+            self._trie = PrefixTrie()
+            self._artists = {}
+            self.ready = False
+            self.resume_token = None
+            self._dirty = True
+
+    def apply_change(self, change):
+        if change["operationType"] in REBUILD_EVENTS:
+            self.clear()
+            return
+        artist_id = str(change["documentKey"]["_id"])
+        if change["operationType"] == "delete" or change.get("fullDocument") is None:
+            self._set_artist(artist_id, None)
+        else:
+            self._set_artist(artist_id, self._record(change["fullDocument"]))
+
+    def build(self, db):
+        """Rebuild from scratch. Changes racing the scan are replayed by the caller's stream."""
+        projection = {"name": 1, "songs.title": 1, "songs.duration": 1}
+        fresh = AutocompleteIndex()
+        for doc in db.artists.find({}, projection).batch_size(self.batch_size):
+            fresh._set_artist(str(doc["_id"]), self._record(doc))
+        with self._lock:
+            self._trie = fresh._trie
+            self._artists = fresh._artists
+            self._dirty = True
+
+    # Queries
+
+    def search(self, query, limit=search.DEFAULT_LIMIT):
+        prefix = search.normalize(query)
+        results = {"artists": [], "songs": []}
+        if not prefix:
+            return results
+        with self._lock:
+            for kind, artist_id, name, title, duration in self._trie.iter_prefix(prefix):
+                if kind == ARTIST and len(results["artists"]) < limit:
+                    results["artists"].append({"_id": artist_id, "name": name})
+                elif kind == SONG and len(results["songs"]) < limit:
+                    results["songs"].append({
+                        "artist_id": artist_id,
+                        "artist_name": name,
+                        "title": title,
+                        "duration": duration
+                    })
+                if len(results["artists"]) >= limit and len(results["songs"]) >= limit:
+                    break
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "artists": len(self._artists),
+                "nodes": len(self._trie),
+                "memory_bytes": self._trie.memory_bytes() + sys.getsizeof(self._artists),
+                "resume_token": self.resume_token is not None,
+            }
+
+    # Persistence
+
+    def save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            data = {
+                "resume_token": self.resume_token,
+                "artists": {aid: [name, [list(s) for s in songs]] for aid, (name, songs) in self._artists.items()},
+            }
+            self._dirty = False
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.snapshot_path)
+        self._last_snapshot = time.monotonic()
+
+    def load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        with open(self.snapshot_path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not data.get("resume_token"):
+            return False
+        for artist_id, (name, songs) in data["artists"].items():
+            self._set_artist(artist_id, (name, tuple(tuple(s) for s in songs)))
+        self.resume_token = data["resume_token"]
+        self._dirty = False
+        return True
+
+    # Background consumer
+
+    def _consume(self, db, resume_token):
+        with db.artists.watch(full_document="updateLookup", resume_after=resume_token) as stream:
+            if resume_token is None:
+                # Stream is open before the scan starts, so nothing is missed
+                self.resume_token = stream.resume_token
+                self.build(db)
+            self.ready = True
+            while stream.alive and not self._stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    self.apply_change(change)
+                    if change["operationType"] in REBUILD_EVENTS:
+                        return
+                self.resume_token = stream.resume_token
+                if self._dirty and time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                    self.save_snapshot()
+
+    def run(self, db, logger=None):
+        resume_token = self.resume_token if self.load_snapshot() else None
+        while not self._stop.is_set():
+            try:
+                self._consume(db, resume_token)
+                # Stream closed or collection dropped; clear() reset the token if a rescan is due
+                resume_token = self.resume_token
+            except OperationFailure as e:
+                # Token fell off the oplog (or streams unsupported): rescan
+                if logger:
+                    logger.warning("Autocomplete stream failed, rebuilding: %s", e)
+                resume_token = None
+                self._stop.wait(5)
+            except PyMongoError as e:
+                if logger:
+                    logger.warning("Autocomplete stream interrupted: %s", e)
+                resume_token = self.resume_token
+                self._stop.wait(1)
+            except Exception as e:
+                # Never leave a stale index marked ready behind a dead thread
+                if logger:
+                    logger.exception("Autocomplete consumer failed, rebuilding: %s", e)
+                self.clear()
+                resume_token = None
+                self._stop.wait(5)
+        self.save_snapshot()
+
+    def start(self, db, logger=None):
+        self._thread = threading.Thread(target=self.run, args=(db, logger), name="autocomplete", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
@@ -0,0 +1,72 @@
+import contextvars
+
+MAX_BATCH_SIZE = 25
+READ_METHODS = ("GET", "HEAD")
+# Marks sub-requests so per-request admission is charged once, to the batch
+SUBREQUEST_ENVIRON_KEY = "music_manager.batch_subrequest"
+# The batch caller's client key; sub-requests act as that client whatever headers they carry
+CLIENT_ENVIRON_KEY = "music_manager.client"
+
+
+def validate(sub_requests):
+    """Return an error message for a malformed batch, or None."""
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return "requests must be a non-empty array"
+    if len(sub_requests) > MAX_BATCH_SIZE:
+        return f"A batch may contain at most {MAX_BATCH_SIZE} requests"
+    for i, sub in enumerate(sub_requests):
+        if not isinstance(sub, dict) or not isinstance(sub.get("path"), str):
+            return f"requests[{i}] must be an object with a path"
+        if not sub["path"].startswith("/api/") or sub["path"].split("?")[0].rstrip("/") == "/api/batch":
+            return f"requests[{i}].path must be an /api/ route other than /api/batch"
+        if not isinstance(sub.get("method", "GET"), str):
+            return f"requests[{i}].method must be a string"
+    return None
+
+
+def dispatch(flask_app, sub, environ=None):
+    """
+    Run one sub-request through the app's normal dispatch (hooks, routing,
+    view function, error handlers) inside a synthetic request context, with
+    no HTTP round trip.
+    """
+    method = sub.get("method", "GET").upper()
+    kwargs = {
+        "method": method,
+        "headers": sub.get("headers") or {},
+        "environ_base": dict(environ or {}, **{SUBREQUEST_ENVIRON_KEY: True}),
+    }
+    if "body" in sub:
+        kwargs["json"] = sub["body"]
+    with flask_app.test_request_context(sub["path"], **kwargs):
+        response = flask_app.full_dispatch_request()
+        body = response.get_json(silent=True)
+        if body is None:
+            body = response.get_data(as_text=True)
+        return {"status": response.status_code, "body": body}
+
+
+def run(flask_app, sub_requests, executor, environ=None):
+    """
+    Execute sub-requests in order, returning their results in the same order.
+    Consecutive reads run concurrently on ``executor``; a write waits for
+    the reads before it and finishes before anything after it starts.
+    ``environ`` is added to every sub-request's WSGI environ.
+    """
+    results = [None] * len(sub_requests)
+    pending = []
+
+    def drain():
+        for index, future in pending:
+            results[index] = future.result()
+        pending.clear()
+
+    for index, sub in enumerate(sub_requests):
+        if sub.get("method", "GET").upper() in READ_METHODS:
+            # Run in a copy of the caller's context so per-request state (round-trip counting) carries over
+            pending.append((index, executor.submit(contextvars.copy_context().run, dispatch, flask_app, sub, environ)))
+        else:
+            drain()
+            results[index] = dispatch(flask_app, sub, environ)
+    drain()
+    return results
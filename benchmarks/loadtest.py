@@ -0,0 +1,434 @@
+"""
+End-to-end load benchmark for the music manager API.
+
+Drives a weighted mix of requests across every API route from concurrent
+workers and reports throughput plus p50/p95/p99 latency per route. Runs
+against a live server (--url), or in-process through the Flask test client
+against the configured MONGO_URI (--backend mongo) or the in-memory
+storage backend (--backend memory).
+
+    python -m benchmarks.loadtest --backend memory --requests 5000 --concurrency 16
+    python -m benchmarks.loadtest --url http://localhost:5000 --duration 60 \\
+        --baseline benchmarks/baselines/local.json --max-regression 0.2
+
+Against a database loaded by benchmarks.seed, pass --catalog ARTISTS:PLAYLISTS
+to drive requests at the seeded documents instead of a small API-built set.
+
+Results can be saved as a baseline (--save-baseline) and later runs compared
+against it; the exit status is 1 when any route regresses beyond
+--max-regression.
+"""
+import argparse
+import http.client
+import json
+import math
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks import seed as dataset
+
+DEFAULT_SEED = 1234
+SEED_ARTISTS = 50
+SEED_PLAYLISTS = 20
+SEED_SONGS_PER_ARTIST = 10
+
+
+class State:
+    """Ids created during the run, shared between workers."""
+
+    def __init__(self):
+        self.artists = []
+        self.playlists = []
+        self._lock = threading.Lock()
+
+    def pick(self, name, rng):
+        with self._lock:
+            ids = getattr(self, name)
+            return rng.choice(ids) if ids else None
+
+    def add(self, name, value):
+        with self._lock:
+            getattr(self, name).append(value)
+
+    def take(self, name, rng, keep=1):
+        """Remove and return a random id, leaving at least ``keep`` behind."""
+        with self._lock:
+            ids = getattr(self, name)
+            if len(ids) <= keep:
+                return None
+            return ids.pop(rng.randrange(len(ids)))
+
+
+def _song(rng, artist_id):
+    return {
+        "artist_id": artist_id,
+        "artist_name": f"Artist {artist_id[-4:]}",
+        "title": f"Song {rng.randrange(10000)}",
+        "duration": f"{rng.randrange(2, 6)}:{rng.randrange(60):02d}"
+    }
+
+
+# Each operation returns (method, path, body) or None when its precondition
+# (e.g. an existing playlist) isn't met yet.
+def _get_artists(state, rng):
+    return "GET", rng.choice([
+        "/api/artists?limit=50",
+        "/api/artists?sort=-song_count&limit=20",
+        "/api/artists?name_prefix=art&limit=20",
+    ]), None
+
+def _add_artist(state, rng):
+    return "POST", "/api/artists", {"name": f"Artist {rng.randrange(10 ** 6)}"}
+
+def _delete_artist(state, rng):
+    artist_id = state.take("artists", rng, keep=SEED_ARTISTS // 2)
+    return artist_id and ("DELETE", f"/api/artists/{artist_id}", None)
+
+def _add_song(state, rng):
+    artist_id = state.pick("artists", rng)
+    return artist_id and ("POST", f"/api/artists/{artist_id}/songs", {"title": f"Song {rng.randrange(10000)}", "duration": "3:30"})
+
+def _delete_song(state, rng):
+    artist_id = state.pick("artists", rng)
+    return artist_id and ("DELETE", f"/api/artists/{artist_id}/songs/0", None)
+
+def _search(state, rng):
+    return "GET", f"/api/search?q={rng.choice(['art', 'song', 'artist 1', 'so'])}", None
+
+def _get_playlists(state, rng):
+    return "GET", rng.choice(["/api/playlists?summary=true", "/api/playlists?limit=20"]), None
+
+def _create_playlist(state, rng):
+    return "POST", "/api/playlists", {"name": f"Playlist {rng.randrange(10 ** 6)}"}
+
+def _get_playlist(state, rng):
+    playlist_id = state.pick("playlists", rng)
+    return playlist_id and ("GET", f"/api/playlists/{playlist_id}{rng.choice(['', '?expand=artists'])}", None)
+
+def _delete_playlist(state, rng):
+    playlist_id = state.take("playlists", rng, keep=SEED_PLAYLISTS // 2)
+    return playlist_id and ("DELETE", f"/api/playlists/{playlist_id}", None)
+
+def _add_to_playlist(state, rng):
+    playlist_id, artist_id = state.pick("playlists", rng), state.pick("artists", rng)
+    return playlist_id and artist_id and ("POST", f"/api/playlists/{playlist_id}/songs", _song(rng, artist_id))
+
+def _remove_from_playlist(state, rng):
+    playlist_id = state.pick("playlists", rng)
+    return playlist_id and ("DELETE", f"/api/playlists/{playlist_id}/songs/0", None)
+
+def _move_in_playlist(state, rng):
+    playlist_id = state.pick("playlists", rng)
+    return playlist_id and ("POST", f"/api/playlists/{playlist_id}/songs:move", {"from": 0, "to": 1})
+
+def _reorder_playlist(state, rng):
+    playlist_id = state.pick("playlists", rng)
+    return playlist_id and ("POST", f"/api/playlists/{playlist_id}/songs:reorder", {"order": [1, 0]})
+
+def _get_favorites(state, rng):
+    return "GET", "/api/favorites", None
+
+def _add_favorite(state, rng):
+    artist_id = state.pick("artists", rng)
+    return artist_id and ("POST", "/api/favorites/songs", _song(rng, artist_id))
+
+def _remove_favorite(state, rng):
+    artist_id = state.pick("artists", rng)
+    return artist_id and ("DELETE", f"/api/favorites/songs/{artist_id}/Song {rng.randrange(10000)}", None)
+
+def _library(state, rng):
+    return "GET", "/api/library", None
+
+def _batch(state, rng):
+    return "POST", "/api/batch", [{"path": "/api/favorites"}, {"path": "/api/playlists?summary=true"}]
+
+def _export(state, rng):
+    return "GET", "/api/export/playlists?batch_size=500", None
+
+def _health(state, rng):
+    return "GET", "/health", None
+
+
+# (route name, weight, operation). Reads dominate, as in production.
+WORKLOAD = [
+    ("GET /api/artists", 12, _get_artists),
+    ("POST /api/artists", 2, _add_artist),
+    ("DELETE /api/artists/<id>", 0.5, _delete_artist),
+    ("POST /api/artists/<id>/songs", 3, _add_song),
+    ("DELETE /api/artists/<id>/songs/<i>", 1, _delete_song),
+    ("GET /api/search", 10, _search),
+    ("GET /api/playlists", 10, _get_playlists),
+    ("POST /api/playlists", 1, _create_playlist),
+    ("GET /api/playlists/<id>", 15, _get_playlist),
+    ("DELETE /api/playlists/<id>", 0.5, _delete_playlist),
+    ("POST /api/playlists/<id>/songs", 6, _add_to_playlist),
+    ("DELETE /api/playlists/<id>/songs/<i>", 2, _remove_from_playlist),
+    ("POST /api/playlists/<id>/songs:move", 2, _move_in_playlist),
+    ("POST /api/playlists/<id>/songs:reorder", 1, _reorder_playlist),
+    ("GET /api/favorites", 8, _get_favorites),
+    ("POST /api/favorites/songs", 4, _add_favorite),
+    ("DELETE /api/favorites/songs/<artist_id>/<title>", 2, _remove_favorite),
+    ("GET /api/library", 6, _library),
+    ("POST /api/batch", 2, _batch),
+    ("GET /api/export/<collection>", 0.5, _export),
+    ("GET /health", 1, _health),
+]
+
+
+class HttpClient:
+    """One keep-alive connection per worker."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self._connect = lambda: http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        self._prefix = parts.path.rstrip("/")
+        self._conn = self._connect()
+
+    def request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+        try:
+            self._conn.request(method, self._prefix + path, body=payload, headers=headers)
+            response = self._conn.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            self._conn.close()
+            self._conn = self._connect()
+            raise
+
+
+class InProcessClient:
+    def __init__(self, flask_app):
+        self._client = flask_app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self._client.open(path, method=method, json=body)
+        return response.status_code, response.get_data()
+
+
+def in_process_app(backend):
+    """Import the app, switching it to in-memory storage for --backend memory."""
+    import app as app_module
+    import storage
+    if backend == "memory":
+        app_module.store = storage.MemoryStorage()
+    return app_module.app
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def seed(client, state, rng):
+    for _ in range(SEED_ARTISTS):
+        status, body = client.request("POST", "/api/artists", {"name": f"Artist {rng.randrange(10 ** 6)}"})
+        if status == 200:
+            artist_id = json.loads(body)["id"]
+            state.add("artists", artist_id)
+            for _ in range(SEED_SONGS_PER_ARTIST):
+                client.request("POST", f"/api/artists/{artist_id}/songs", {"title": f"Song {rng.randrange(10000)}", "duration": "3:30"})
+    for _ in range(SEED_PLAYLISTS):
+        status, body = client.request("POST", "/api/playlists", {"name": f"Playlist {rng.randrange(10 ** 6)}"})
+        if status == 200:
+            playlist_id = json.loads(body)["id"]
+            state.add("playlists", playlist_id)
+            for _ in range(5):
+                client.request("POST", f"/api/playlists/{playlist_id}/songs", _song(rng, state.pick("artists", rng)))
+    if not state.artists or not state.playlists:
+        raise RuntimeError("Seeding failed; is the API reachable and the database up?")
+
+
+def _record_created(state, name, status, body):
+    if status != 200:
+        return
+    if name == "POST /api/artists":
+        state.add("artists", json.loads(body)["id"])
+    elif name == "POST /api/playlists":
+        state.add("playlists", json.loads(body)["id"])
+
+
+def catalog_state(artists, playlists, rng, sample=10000):
+    """Target a catalog loaded by benchmarks.seed (whose _ids are known) instead of seeding through the API."""
+    state = State()
+    for i in rng.sample(range(artists), min(sample, artists)):
+        state.add("artists", str(dataset.object_id(1, i)))
+    for i in rng.sample(range(playlists), min(sample, playlists)):
+        state.add("playlists", str(dataset.object_id(2, i)))
+    return state
+
+
+def run(client_factory, workload=None, concurrency=8, total_requests=None, duration=None,
+        seed_value=DEFAULT_SEED, state=None):
+    """
+    Run the workload and return {route: {"count", "errors", "latencies"}} plus
+    the elapsed wall time. Stops after ``total_requests`` or ``duration``
+    seconds, whichever is given. Without a ``state`` a small catalog is
+    first created through the API.
+    """
+    workload = workload or WORKLOAD
+    if state is None:
+        state = State()
+        seed(client_factory(), state, random.Random(seed_value))
+
+    names = [w[0] for w in workload]
+    weights = [w[1] for w in workload]
+    operations = {w[0]: w[2] for w in workload}
+    results = {name: {"count": 0, "errors": 0, "latencies": []} for name in names}
+    lock = threading.Lock()
+    remaining = [total_requests] if total_requests else None
+    deadline = time.monotonic() + duration if duration else None
+
+    def claim():
+        if deadline is not None:
+            return time.monotonic() < deadline
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker(index):
+        client = client_factory()
+        rng = random.Random(seed_value + index + 1)
+        local = {name: {"count": 0, "errors": 0, "latencies": []} for name in names}
+        while claim():
+            name = rng.choices(names, weights)[0]
+            request = operations[name](state, rng)
+            if not request:
+                continue
+            started = time.perf_counter()
+            try:
+                status, body = client.request(*request)
+            except Exception:
+                status, body = None, b""
+            elapsed = time.perf_counter() - started
+            stats = local[name]
+            stats["count"] += 1
+            stats["latencies"].append(elapsed)
+            # 4xx from races (e.g. index out of range) are expected; only server errors count
+            if status is None or status >= 500:
+                stats["errors"] += 1
+            _record_created(state, name, status, body)
+        with lock:
+            for name, stats in local.items():
+                results[name]["count"] += stats["count"]
+                results[name]["errors"] += stats["errors"]
+                results[name]["latencies"].extend(stats["latencies"])
+
+    if deadline is None and not total_requests:
+        raise ValueError("Either total_requests or duration is required")
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.monotonic() - started
+
+
+def summarize(results, elapsed):
+    summary = {}
+    for name, stats in results.items():
+        if not stats["count"]:
+            continue
+        latencies = sorted(stats["latencies"])
+        summary[name] = {
+            "requests": stats["count"],
+            "errors": stats["errors"],
+            "throughput": round(stats["count"] / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        }
+    return summary
+
+
+def compare(summary, baseline, max_regression):
+    """Return a list of human-readable regressions against a stored baseline."""
+    regressions = []
+    for name, current in summary.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput"] < base["throughput"] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {base['throughput']}/s -> {current['throughput']}/s")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {current['errors']}")
+    return regressions
+
+
+def format_table(summary):
+    header = f"{'route':<48} {'reqs':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    rows = [header, "-" * len(header)]
+    for name, s in sorted(summary.items()):
+        rows.append(f"{name:<48} {s['requests']:>7} {s['errors']:>5} {s['throughput']:>9} "
+                    f"{s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+    return "\n".join(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Benchmark a running server instead of the in-process app.")
+    target.add_argument("--backend", choices=["mongo", "memory"], default="memory",
+                        help="In-process storage: MONGO_URI or in-memory (default).")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, help="Total requests to send.")
+    parser.add_argument("--duration", type=float, help="Seconds to run for (overrides --requests).")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--catalog", metavar="ARTISTS:PLAYLISTS",
+                        help="Use a catalog already loaded by benchmarks.seed with these counts.")
+    parser.add_argument("--output", help="Write the JSON summary here.")
+    parser.add_argument("--save-baseline", help="Store this run as the baseline at this path.")
+    parser.add_argument("--baseline", help="Compare against the baseline at this path.")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed fractional p95 increase / throughput drop per route.")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        client_factory = lambda: HttpClient(args.url)
+    else:
+        flask_app = in_process_app(args.backend)
+        client_factory = lambda: InProcessClient(flask_app)
+
+    state = None
+    if args.catalog:
+        artists, playlists = (int(n) for n in args.catalog.split(":"))
+        state = catalog_state(artists, playlists, random.Random(args.seed))
+
+    results, elapsed = run(
+        client_factory, WORKLOAD, args.concurrency,
+        total_requests=None if args.duration else (args.requests or 2000),
+        duration=args.duration, seed_value=args.seed, state=state
+    )
+    summary = summarize(results, elapsed)
+    print(format_table(summary))
+    print(f"\n{sum(s['requests'] for s in summary.values())} requests in {elapsed:.2f}s")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(summary, json.load(f), args.max_regression)
+        if regressions:
+            print("\nRegressions against baseline:")
+            print("\n".join("  " + r for r in regressions))
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Deterministic synthetic catalog generator for scale testing.
+
+Fills artists, playlists and favorites with documents shaped exactly like
+the ones the API writes (normalized names, duration_seconds, song_count,
+playlist aggregates, version). The same --seed always produces the same
+data, including _ids, so query plans and benchmark runs are reproducible.
+
+Playlist and favorite entries pick artists with Zipfian popularity: a few
+artists appear in a large share of playlists, as in production.
+
+    python -m benchmarks.seed --uri mongodb://localhost:27017/music_bench \\
+        --artists 1000000 --songs-per-artist 20 --playlists 100000 --drop
+
+Everything is streamed into insert_many batches, so memory stays flat
+regardless of scale; artist details are recomputed from their index
+instead of being kept around.
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sys
+import time
+from array import array
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+import search
+import durations
+import aggregates
+import cascade
+import storage
+
+DEFAULT_SEED = 42
+# Fixed ObjectId timestamp so generated _ids sort in generation order
+ID_TIMESTAMP = 0x65000000
+WORDS = (
+    "blue", "night", "river", "gold", "fire", "silent", "electric", "summer", "ghost", "velvet",
+    "echo", "wild", "neon", "paper", "stone", "ocean", "midnight", "crystal", "broken", "golden",
+    "shadow", "dream", "city", "storm", "honey", "iron", "lunar", "sugar", "thunder", "winter",
+)
+ACCENTED = ("é", "ö", "ñ", "å", "ç")
+
+
+def object_id(kind, index):
+    """Deterministic, index-ordered _id; ``kind`` keeps collections apart."""
+    return ObjectId(f"{ID_TIMESTAMP:08x}{kind:02x}{index:014x}")
+
+
+class Catalog:
+    """
+    A seeded catalog definition. Every artist is a pure function of its index,
+    so playlists can reference any artist's songs without holding the
+    catalog in memory.
+    """
+
+    def __init__(self, artists=1000, songs_per_artist=20, playlists=100, playlist_size=50,
+                 favorites=200, zipf_s=1.1, seed=DEFAULT_SEED):
+        self.artists = artists
+        self.songs_per_artist = songs_per_artist
+        self.playlists = playlists
+        self.playlist_size = playlist_size
+        self.favorites = favorites
+        self.seed = seed
+        self._cumulative = array("d", itertools.accumulate(1 / (rank ** zipf_s) for rank in range(1, artists + 1)))
+        # Spread popular ranks across the _id range rather than at its start
+        self._stride = self._coprime_stride(artists)
+
+    @staticmethod
+    def _coprime_stride(n):
+        stride = max(1, int(n * 0.618)) | 1
+        while n > 1 and _gcd(stride, n) != 1:
+            stride += 2
+        return stride
+
+    def _rng(self, *key):
+        # String seeds are hashed with SHA-512, so this is stable across processes
+        return random.Random(":".join(map(str, (self.seed,) + key)))
+
+    def popular_artist(self, rng):
+        """Draw an artist index with Zipfian popularity."""
+        rank = bisect.bisect_left(self._cumulative, rng.random() * self._cumulative[-1])
+        return (min(rank, self.artists - 1) * self._stride) % self.artists
+
+    def artist_name(self, index):
+        rng = self._rng("artist", index)
+        name = " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 3)))
+        if rng.random() < 0.1:
+            name += " " + rng.choice(ACCENTED)
+        return f"{name} {index}"
+
+    def song_count(self, index):
+        return self._rng("artist", index, "songs").randint(1, 2 * self.songs_per_artist - 1)
+
+    def song(self, artist_index, song_index):
+        rng = self._rng("song", artist_index, song_index)
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).capitalize()
+        seconds = rng.randint(90, 480)
+        return {
+            "title": f"{title} {song_index}",
+            "title_normalized": search.normalize(f"{title} {song_index}"),
+            "duration": f"{seconds // 60}:{seconds % 60:02d}",
+            "duration_seconds": seconds,
+        }
+
+    def artist(self, index):
+        name = self.artist_name(index)
+        songs = [self.song(index, i) for i in range(self.song_count(index))]
+        return {
+            "_id": object_id(1, index),
+            "name": name,
+            "name_normalized": search.normalize(name),
+            "songs": songs,
+            "song_count": len(songs),
+            "version": 0,
+        }
+
+    def song_reference(self, rng):
+        """A playlist/favorites entry pointing at a popularity-weighted artist's song."""
+        artist_index = self.popular_artist(rng)
+        song = self.song(artist_index, rng.randrange(self.song_count(artist_index)))
+        return {
+            "artist_id": str(object_id(1, artist_index)),
+            "artist_name": self.artist_name(artist_index),
+            "title": song["title"],
+            "duration": song["duration"],
+            "duration_seconds": song["duration_seconds"],
+        }
+
+    def playlist(self, index):
+        rng = self._rng("playlist", index)
+        songs = [self.song_reference(rng) for _ in range(rng.randint(1, 2 * self.playlist_size - 1))]
+        return {
+            "_id": object_id(2, index),
+            "name": f"{rng.choice(WORDS).capitalize()} mix {index}",
+            "description": "",
+            "songs": songs,
+            "song_count": len(songs),
+            "total_duration_seconds": sum(aggregates.song_seconds(s) for s in songs),
+            "version": 0,
+        }
+
+    def favorites_document(self):
+        rng = self._rng("favorites")
+        seen = set()
+        songs = []
+        for _ in range(self.favorites):
+            song = self.song_reference(rng)
+            if (song["artist_id"], song["title"]) not in seen:
+                seen.add((song["artist_id"], song["title"]))
+                songs.append(song)
+        return {"_id": object_id(3, 0), "type": "user_favorites", "songs": songs}
+
+
+def _gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+
+def _batches(documents, size):
+    iterator = iter(documents)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def seed(db, catalog, batch_size=1000, drop=False, create_indexes=True, progress=None):
+    """Insert the catalog into ``db`` and return the number of documents per collection."""
+    if drop:
+        for name in ("artists", "playlists", "favorites"):
+            db[name].drop()
+
+    counts = {}
+    sources = {
+        "artists": (catalog.artist(i) for i in range(catalog.artists)),
+        "playlists": (catalog.playlist(i) for i in range(catalog.playlists)),
+        "favorites": iter([catalog.favorites_document()] if catalog.favorites else []),
+    }
+    for name, documents in sources.items():
+        counts[name] = 0
+        for batch in _batches(documents, batch_size):
+            db[name].insert_many(batch, ordered=False)
+            counts[name] += len(batch)
+            if progress:
+                progress(name, counts[name])
+
+    if create_indexes:
+        # Built after the load: one index build is much cheaper than per-insert maintenance
+        search.ensure_search_indexes(db)
+        durations.ensure_duration_indexes(db)
+        aggregates.ensure_aggregate_indexes(db)
+        cascade.ensure_cascade_indexes(db)
+        storage.ensure_favorites_indexes(db)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/music_bench"),
+                        help="Target database (the URI must include the database name).")
+    parser.add_argument("--artists", type=int, default=1000)
+    parser.add_argument("--songs-per-artist", type=int, default=20, help="Mean songs per artist.")
+    parser.add_argument("--playlists", type=int, default=100)
+    parser.add_argument("--playlist-size", type=int, default=50, help="Mean songs per playlist.")
+    parser.add_argument("--favorites", type=int, default=200, help="Favorite songs to draw.")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Zipf exponent for artist popularity.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--drop", action="store_true", help="Drop the collections first.")
+    parser.add_argument("--no-indexes", action="store_true", help="Skip creating the app's indexes afterwards.")
+    args = parser.parse_args(argv)
+
+    catalog = Catalog(args.artists, args.songs_per_artist, args.playlists, args.playlist_size,
+                      args.favorites, args.zipf_s, args.seed)
+    db = MongoClient(args.uri).get_default_database()
+    started = time.monotonic()
+
+    def progress(name, count):
+        if count % (args.batch_size * 100) == 0:
+            print(f"{name}: {count} ({time.monotonic() - started:.0f}s)", flush=True)
+
+    counts = seed(db, catalog, args.batch_size, drop=args.drop, create_indexes=not args.no_indexes, progress=progress)
+    print(", ".join(f"{count} {name}" for name, count in counts.items()) + f" in {time.monotonic() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Micro-benchmarks for the per-request hot paths in app.py: JSON validation
+and parsing, _id stringification and jsonify, on production-sized documents.
+
+    pytest benchmarks/ --benchmark-autosave
+    pytest benchmarks/ --benchmark-compare --benchmark-compare-fail=mean:15%
+
+Each benchmark also asserts an absolute ceiling on its mean (THRESHOLDS, in
+seconds) so a serialization slowdown fails even without a saved run to
+compare against. Set BENCHMARK_THRESHOLD_SCALE to loosen them on slow
+machines.
+"""
+import json
+import os
+import random
+import pytest
+from unittest.mock import patch
+from bson import ObjectId
+
+import app as app_module
+from app import app
+
+ARTIST_SONGS = 5000
+PLAYLIST_SONGS = 10000
+LISTED_ARTISTS = 2000
+
+THRESHOLDS = {
+    "validate_json": 0.050,
+    "stringify_ids": 0.010,
+    "jsonify_playlist": 0.150,
+    "jsonify_artist": 0.080,
+    "get_playlist_route": 0.200,
+    "get_artists_route": 0.150,
+}
+SCALE = float(os.getenv("BENCHMARK_THRESHOLD_SCALE", "1"))
+
+
+def _song(rng, i):
+    return {
+        "artist_id": str(ObjectId()),
+        "artist_name": f"Artist {rng.randrange(10000)}",
+        "title": f"Song number {i} ({rng.random():.6f})",
+        "title_normalized": f"song number {i}",
+        "duration": f"{rng.randrange(2, 7)}:{rng.randrange(60):02d}",
+        "duration_seconds": rng.randrange(120, 420),
+    }
+
+
+@pytest.fixture(scope="module")
+def rng():
+    return random.Random(42)
+
+
+@pytest.fixture(scope="module")
+def big_artist(rng):
+    return {
+        "_id": ObjectId(), "name": "Prolific", "name_normalized": "prolific",
+        "songs": [_song(rng, i) for i in range(ARTIST_SONGS)],
+        "song_count": ARTIST_SONGS, "version": 1,
+    }
+
+
+@pytest.fixture(scope="module")
+def big_playlist(rng):
+    songs = [_song(rng, i) for i in range(PLAYLIST_SONGS)]
+    return {
+        "_id": ObjectId(), "name": "Everything", "description": "",
+        "songs": songs, "song_count": len(songs),
+        "total_duration_seconds": sum(s["duration_seconds"] for s in songs), "version": 1,
+    }
+
+
+@pytest.fixture(scope="module")
+def artist_list(rng):
+    return [
+        {"_id": ObjectId(), "name": f"Artist {i}", "songs": [_song(rng, j) for j in range(10)], "song_count": 10}
+        for i in range(LISTED_ARTISTS)
+    ]
+
+
+def _check(benchmark, name):
+    if benchmark.disabled:
+        # --benchmark-disable runs each body once as a smoke test; there are no timings
+        return
+    mean = benchmark.stats.stats.mean
+    assert mean < THRESHOLDS[name] * SCALE, f"{name} mean {mean * 1000:.2f}ms exceeds {THRESHOLDS[name] * 1000:.0f}ms"
+
+
+def test_validate_json_large_body(benchmark, big_playlist):
+    """validate_json plus the view's own request.json on a 10k-song body: parsed once, not twice."""
+    body = json.dumps({"order": list(range(PLAYLIST_SONGS)), "songs": big_playlist["songs"]})
+    view = app_module.validate_json(lambda: len(app_module.request.json["order"]))
+
+    def run():
+        with app.test_request_context("/", method="POST", data=body, content_type="application/json"):
+            return view()
+
+    with patch("flask.json.provider.json.loads", wraps=json.loads) as loads:
+        assert run() == PLAYLIST_SONGS
+        assert loads.call_count == 1
+    assert benchmark(run) == PLAYLIST_SONGS
+    _check(benchmark, "validate_json")
+
+
+def test_stringify_ids(benchmark, artist_list):
+    """The _id loop in _load_artists over a full listing."""
+    def run():
+        with patch("app.mongo") as mock_mongo:
+            mock_mongo.db.artists.find.return_value = [dict(a) for a in artist_list]
+            return app_module._load_artists()
+
+    assert isinstance(benchmark(run)[0]["_id"], str)
+    _check(benchmark, "stringify_ids")
+
+
+def test_jsonify_playlist(benchmark, big_playlist):
+    doc = dict(big_playlist, _id=str(big_playlist["_id"]))
+
+    def run():
+        with app.app_context():
+            return app_module.jsonify(doc)
+
+    assert benchmark(run).status_code == 200
+    _check(benchmark, "jsonify_playlist")
+
+
+def test_jsonify_artist(benchmark, big_artist):
+    doc = dict(big_artist, _id=str(big_artist["_id"]))
+
+    def run():
+        with app.app_context():
+            return app_module.jsonify([doc])
+
+    assert benchmark(run).status_code == 200
+    _check(benchmark, "jsonify_artist")
+
+
+def test_get_playlist_route(benchmark, big_playlist):
+    """Full GET /api/playlists/<id> dispatch (hooks, load, stringify, jsonify) for 10k songs."""
+    client = app.test_client()
+    with patch("app.mongo") as mock_mongo:
+        mock_mongo.db.playlists.find_one.side_effect = lambda *a, **k: dict(big_playlist)
+        response = benchmark(client.get, f"/api/playlists/{big_playlist['_id']}")
+
+    assert response.status_code == 200
+    assert len(response.get_json()["songs"]) == PLAYLIST_SONGS
+    _check(benchmark, "get_playlist_route")
+
+
+def test_get_artists_route(benchmark, artist_list):
+    client = app.test_client()
+    with patch("app.mongo") as mock_mongo:
+        mock_mongo.db.artists.find.side_effect = lambda *a, **k: [dict(a) for a in artist_list]
+        response = benchmark(client.get, "/api/artists")
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == LISTED_ARTISTS
+    _check(benchmark, "get_artists_route")
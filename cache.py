@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+WATCHED_COLLECTIONS = ("artists", "playlists", "favorites")
+
+
+class ReadCache:
+    """
+    Thread-safe TTL cache for serialized read results.
+
+    Keys are tuples whose first element is the collection and whose second is
+    a document id (or None for whole-collection reads such as listings), so a
+    write to one document only evicts that document and the listings.
+    Entries live for ``ttl`` seconds while the invalidation stream is healthy
+    and for the much shorter ``fallback_ttl`` otherwise. A ``ttl`` of 0
+    disables caching entirely. Cached values are shared between requests and
+    must not be mutated.
+
+    At most ``max_entries`` are kept, evicting the least recently used, and
+    expired entries are swept out at most once per TTL. A value whose key
+    was invalidated while it was loading is returned but not stored, since
+    it may predate the write.
+    """
+
+    def __init__(self, ttl=0, fallback_ttl=5, max_entries=10000):
+        self.ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self.max_entries = max_entries
+        self.stream_healthy = False
+        self._entries = OrderedDict()
+        # key -> [generation, loads in flight]; only held while a key is loading
+        self._generations = {}
+        self._next_sweep = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def current_ttl(self):
+        return self.ttl if self.stream_healthy else min(self.ttl, self.fallback_ttl)
+
+    def get_or_load(self, key, loader):
+        if not self.enabled:
+            return loader()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+            loading = self._generations.setdefault(key, [0, 0])
+            loading[1] += 1
+            generation = loading[0]
+        value = None
+        try:
+            value = loader()
+            return value
+        finally:
+            with self._lock:
+                if value is not None and loading[0] == generation:
+                    self._store(key, (now + self.current_ttl(), value), now)
+                loading[1] -= 1
+                if not loading[1]:
+                    del self._generations[key]
+
+    def _store(self, key, entry, now):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if now >= self._next_sweep:
+            for expired in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                del self._entries[expired]
+            self._next_sweep = now + self.current_ttl()
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def key_matches(key, collection, doc_id=None):
+        """True if a write to ``doc_id`` in ``collection`` (any document when None) affects ``key``."""
+        return key[0] == collection and (doc_id is None or key[1] is None or key[1] == doc_id)
+
+    def invalidate(self, collection, doc_id=None):
+        """Evict ``doc_id`` and every listing of ``collection`` (all of it when doc_id is None)."""
+        with self._lock:
+            for key in list(self._entries):
+                if self.key_matches(key, collection, doc_id):
+                    del self._entries[key]
+            for key, loading in self._generations.items():
+                if self.key_matches(key, collection, doc_id):
+                    loading[0] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for loading in self._generations.values():
+                loading[0] += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheInvalidator:
+    """
+    Follows the database change stream and evicts cache entries touched by
+    writes from any replica. Standalone mongod has no change streams; in
+    that case the cache falls back to its short TTL and the stream is
+    retried every ``retry_interval`` seconds.
+    """
+
+    def __init__(self, cache, collections=WATCHED_COLLECTIONS, retry_interval=30):
+        self.cache = cache
+        self.collections = list(collections)
+        self.retry_interval = retry_interval
+        self.resume_token = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _set_healthy(self, healthy):
+        if self.cache.stream_healthy and not healthy:
+            # Events may be lost from here on; drop long-lived entries
+            self.cache.clear()
+        self.cache.stream_healthy = healthy
+
+    def handle(self, change):
+        operation = change["operationType"]
+        if operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            self.cache.clear()
+            return
+        collection = change["ns"]["coll"]
+        self.cache.invalidate(collection, str(change["documentKey"]["_id"]))
+
+    def _consume(self, db):
+        pipeline = [{"$match": {"ns.coll": {"$in": self.collections}}}]
+        with db.watch(pipeline, resume_after=self.resume_token) as stream:
+            if self.resume_token is None:
+                # Nothing cached before the stream opened can be trusted
+                self.cache.clear()
+            self._set_healthy(True)
+            while stream.alive and not self._stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    self.handle(change)
+                    if change["operationType"] == "invalidate":
+                        # The stream is closed and can't be resumed past this event: reopen fresh
+                        self.resume_token = None
+                        return
+                self.resume_token = stream.resume_token
+
+    def run(self, db, logger=None):
+        while not self._stop.is_set():
+            try:
+                self._consume(db)
+            except OperationFailure as e:
+                # Stream unsupported or resume token no longer in the oplog
+                if logger:
+                    logger.warning("Cache invalidation stream unavailable, using fallback TTL: %s", e)
+                self.resume_token = None
+                self._set_healthy(False)
+                self._stop.wait(self.retry_interval)
+            except PyMongoError as e:
+                if logger:
+                    logger.warning("Cache invalidation stream interrupted: %s", e)
+                self._set_healthy(False)
+                self._stop.wait(1)
+
+    def start(self, db, logger=None):
+        self._thread = threading.Thread(target=self.run, args=(db, logger), name="cache-invalidator", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
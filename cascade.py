@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+from pymongo import ASCENDING
+
+MAX_TRACKED_JOBS = 100
+
+
+def ensure_cascade_indexes(db):
+    db.playlists.create_index([("songs.artist_id", ASCENDING)], name="songs_artist_id_1")
+    db.favorites.create_index([("songs.artist_id", ASCENDING)], name="songs_artist_id_1")
+
+
+def orphaned_artist_ids(db):
+    """
+    Artist ids still referenced by playlist or favorite songs although the
+    artist no longer exists: deletes whose cascade never ran to completion.
+    """
+    referenced = set(db.playlists.distinct("songs.artist_id")) | set(db.favorites.distinct("songs.artist_id"))
+    candidates = {artist_id for artist_id in referenced if isinstance(artist_id, str) and ObjectId.is_valid(artist_id)}
+    if not candidates:
+        return []
+    existing = {str(doc["_id"]) for doc in db.artists.find({"_id": {"$in": [ObjectId(i) for i in candidates]}}, {"_id": 1})}
+    return sorted(candidates - existing)
+
+
+def _remove_artist_pipeline(artist_id):
+    # Filter the songs and recompute the playlist aggregates in one server-side update
+    return [
+        {"$set": {"songs": {"$filter": {
+            "input": "$songs",
+            "cond": {"$ne": ["$$this.artist_id", artist_id]}
+        }}}},
+        {"$set": {
+            "song_count": {"$size": "$songs"},
+            "total_duration_seconds": {"$sum": "$songs.duration_seconds"},
+            "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+        }},
+    ]
+
+
+class CascadeWorker:
+    """
+    Background queue that removes a deleted artist's songs from playlists and
+    favorites.
+
+    Playlists are cleaned in ``_id`` order, ``batch_size`` documents per
+    ``update_many``. After each batch the worker sleeps for at least as long
+    as the batch took, so a cascade never keeps Mongo busy more than half the
+    time. Job progress is tracked in memory on the pod that accepted the
+    delete, under an ObjectId so ids never collide across replicas. Jobs
+    still queued when that pod stops are lost; ``sweep`` (the
+    ``cascade-sweep`` command) finds their artists and queues them again.
+    """
+
+    def __init__(self, batch_size=200, pause=0.05, on_playlists_updated=None, on_favorites_updated=None, logger=None):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.on_playlists_updated = on_playlists_updated
+        self.on_favorites_updated = on_favorites_updated
+        self.logger = logger
+        self._jobs = OrderedDict()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _track(self, artist_id, **fields):
+        job = {
+            "id": str(ObjectId()),
+            "artist_id": artist_id,
+            "state": "queued",
+            "batches": 0,
+            "playlists_updated": 0,
+            "favorites_updated": 0,
+            "error": None,
+        }
+        job.update(fields)
+        with self._lock:
+            self._jobs[job["id"]] = job
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                self._jobs.popitem(last=False)
+        return job
+
+    def enqueue(self, db, artist_id):
+        job = self._track(artist_id)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name="artist-cascade", daemon=True)
+                self._thread.start()
+        self._queue.put((db, job))
+        return job["id"]
+
+    def sweep(self, db):
+        """Queue a cascade for every deleted artist whose songs are still referenced; returns the job ids."""
+        return [self.enqueue(db, artist_id) for artist_id in orphaned_artist_ids(db)]
+
+    def record_done(self, artist_id, playlists_updated, favorites_updated):
+        """Track a cascade that already ran inline (in-memory storage); returns its job id."""
+        job = self._track(artist_id, state="done", playlists_updated=playlists_updated, favorites_updated=favorites_updated)
+        return job["id"]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def jobs(self):
+        with self._lock:
+            return [dict(job) for job in self._jobs.values()]
+
+    def _work(self):
+        while True:
+            db, job = self._queue.get()
+            try:
+                job["state"] = "running"
+                self.run(db, job)
+                job["state"] = "done"
+            except Exception as e:
+                job["state"] = "failed"
+                job["error"] = str(e)
+                if self.logger:
+                    self.logger.warning("Cascade for artist %s failed: %s", job["artist_id"], e)
+            finally:
+                self._queue.task_done()
+
+    def run(self, db, job):
+        artist_id = job["artist_id"]
+        pipeline = _remove_artist_pipeline(artist_id)
+        last_id = None
+
+        while True:
+            query = {"songs.artist_id": artist_id}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            started = time.monotonic()
+            ids = [doc["_id"] for doc in db.playlists.find(query, {"_id": 1}).sort("_id", ASCENDING).limit(self.batch_size)]
+            if not ids:
+                break
+
+            result = db.playlists.update_many({"_id": {"$in": ids}}, pipeline)
+            job["batches"] += 1
+            job["playlists_updated"] += result.modified_count
+            last_id = ids[-1]
+            if self.on_playlists_updated:
+                self.on_playlists_updated(ids)
+            if self.logger:
+                self.logger.info("Cascade %s: %d playlists cleaned", job["id"], job["playlists_updated"])
+            time.sleep(max(self.pause, time.monotonic() - started))
+
+        result = db.favorites.update_many(
+            {"songs.artist_id": artist_id},
+            {"$pull": {"songs": {"artist_id": artist_id}}}
+        )
+        job["favorites_updated"] = result.modified_count
+        if result.modified_count and self.on_favorites_updated:
+            self.on_favorites_updated()
+
+    def join(self):
+        """Block until every queued job has finished (used by tests and the CLI)."""
+        self._queue.join()
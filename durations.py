@@ -0,0 +1,68 @@
+import math
+
+from pymongo import ASCENDING
+
+
+def parse_duration(value):
+    """
+    Parse a song duration into whole seconds.
+
+    Accepts numbers (seconds) and strings such as "245", "3:30" or
+    "1:02:03". Returns None when the value cannot be interpreted.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(round(value)) if math.isfinite(value) and value >= 0 else None
+    if not isinstance(value, str):
+        return None
+
+    parts = value.strip().split(":")
+    if not 1 <= len(parts) <= 3:
+        return None
+    try:
+        numbers = [float(part) if i == len(parts) - 1 else int(part) for i, part in enumerate(parts)]
+    except ValueError:
+        return None
+    if any(n < 0 for n in numbers) or any(n >= 60 for n in numbers[1:]):
+        return None
+
+    seconds = 0
+    for n in numbers:
+        seconds = seconds * 60 + n
+    # float() accepts "inf", "nan" and overflowing exponents such as "1e400"
+    if not math.isfinite(seconds):
+        return None
+    return int(round(seconds))
+
+
+def ensure_duration_indexes(db):
+    db.artists.create_index([("songs.duration_seconds", ASCENDING)], name="songs_duration_seconds_1")
+    db.playlists.create_index([("songs.duration_seconds", ASCENDING)], name="songs_duration_seconds_1")
+
+
+def backfill_duration_seconds(db, batch_size=500):
+    """
+    Add songs.duration_seconds to artists, playlists and favorites written
+    before durations were parsed on ingestion. Returns updated document
+    counts per collection.
+    """
+    updated = {}
+    for collection in (db.artists, db.playlists, db.favorites):
+        count = 0
+        cursor = collection.find(
+            {"songs": {"$elemMatch": {"duration_seconds": {"$exists": False}}}},
+            {"songs": 1}
+        ).batch_size(batch_size)
+
+        for doc in cursor:
+            songs = doc["songs"]
+            parsed = [
+                dict(song, duration_seconds=parse_duration(song.get("duration"))) if song else song
+                for song in songs
+            ]
+            # Match on the songs we read so a concurrent write isn't overwritten
+            result = collection.update_one({"_id": doc["_id"], "songs": songs}, {"$set": {"songs": parsed}})
+            count += result.modified_count
+        updated[collection.name] = count
+    return updated
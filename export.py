@@ -0,0 +1,83 @@
+import os
+import zlib
+from contextlib import contextmanager
+
+from bson import ObjectId
+from bson import json_util
+
+EXPORT_COLLECTIONS = ("artists", "playlists", "favorites")
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+# Bytes of NDJSON collected before a chunk is compressed and handed to the client
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_documents(db, name, after=None, batch_size=DEFAULT_BATCH_SIZE, session=None):
+    """
+    Walk a collection in _id order. ``after`` (an ObjectId or its hex string)
+    resumes an interrupted export from the last _id it wrote.
+    """
+    query = {}
+    if after is not None:
+        query["_id"] = {"$gt": ObjectId(after)}
+    return db[name].find(query, sort=[("_id", 1)], batch_size=batch_size, session=session)
+
+
+def iter_ndjson(documents, compress=False, chunk_size=CHUNK_SIZE):
+    """Serialize documents as relaxed Extended JSON lines, optionally gzip-compressed, in chunks."""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = []
+    size = 0
+    for doc in documents:
+        line = (json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n").encode("utf-8")
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            data = b"".join(buffer)
+            buffer, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = b"".join(buffer)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+@contextmanager
+def snapshot_session(db, enabled=True):
+    """
+    A session whose reads all see one point in time, so an export spanning
+    several collections is consistent. Needs a replica set (MongoDB 5.0+),
+    and the snapshot expires after minSnapshotHistoryWindowInSeconds
+    (300s by default), which bounds how long a snapshot export can run.
+    """
+    if not enabled:
+        yield None
+        return
+    with db.client.start_session(snapshot=True) as session:
+        yield session
+
+
+def stream_collection(db, name, after=None, batch_size=DEFAULT_BATCH_SIZE, snapshot=False, compress=False):
+    with snapshot_session(db, snapshot) as session:
+        yield from iter_ndjson(iter_documents(db, name, after, batch_size, session), compress)
+
+
+def export_to_directory(db, directory, names=EXPORT_COLLECTIONS, after=None, batch_size=DEFAULT_BATCH_SIZE,
+                        snapshot=False, compress=False):
+    """
+    Write ``<name>.ndjson[.gz]`` per collection and return the paths written.
+    ``after`` limits every collection to documents with a greater _id.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    with snapshot_session(db, snapshot) as session:
+        for name in names:
+            path = os.path.join(directory, name + (".ndjson.gz" if compress else ".ndjson"))
+            with open(path, "wb") as f:
+                for chunk in iter_ndjson(iter_documents(db, name, after, batch_size, session), compress):
+                    f.write(chunk)
+            paths.append(path)
+    return paths
@@ -0,0 +1,144 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+
+def ensure_idempotency_indexes(db, ttl_seconds):
+    db.idempotency_keys.create_index("created_at", name="created_at_ttl", expireAfterSeconds=int(ttl_seconds))
+
+
+def record_id(client, key):
+    """Keys are scoped per client so two callers can't collide or read each other's responses."""
+    return hashlib.sha256(f"{client}\n{key}".encode("utf-8")).hexdigest()
+
+
+def fingerprint(method, path, body):
+    digest = hashlib.sha256(f"{method} {path}\n".encode("utf-8"))
+    digest.update(body or b"")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Remembers the response to each idempotent request in a TTL-indexed
+    collection.
+
+    ``begin`` claims a key by inserting an in-progress record; the unique
+    _id makes the claim atomic across replicas. A second request with the
+    same key gets the existing record back instead: the stored response
+    once ``complete`` has run, or the in-progress marker while the first
+    request is still executing. A claim left in progress for longer than
+    ``lock_timeout`` seconds (its owner crashed) can be taken over.
+    """
+
+    def __init__(self, collection_getter, lock_timeout=60):
+        self._collection = collection_getter
+        self.lock_timeout = lock_timeout
+
+    def begin(self, record_key, request_fingerprint, retry=True):
+        """Returns None if the caller now owns the key, else the existing record."""
+        now = datetime.now(timezone.utc)
+        try:
+            self._collection().insert_one({
+                "_id": record_key,
+                "fingerprint": request_fingerprint,
+                "status": IN_PROGRESS,
+                "created_at": now
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        taken_over = self._collection().find_one_and_update(
+            {
+                "_id": record_key,
+                "fingerprint": request_fingerprint,
+                "status": IN_PROGRESS,
+                "created_at": {"$lt": now - timedelta(seconds=self.lock_timeout)}
+            },
+            {"$set": {"created_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if taken_over:
+            return None
+        record = self._collection().find_one({"_id": record_key})
+        if record is None and retry:
+            # Expired between the insert and the read; try once more
+            return self.begin(record_key, request_fingerprint, retry=False)
+        return record
+
+    def complete(self, record_key, status_code, body, content_type):
+        self._collection().update_one(
+            {"_id": record_key},
+            {"$set": {
+                "status": COMPLETED,
+                "response": {"status": status_code, "body": body, "content_type": content_type}
+            }}
+        )
+
+    def abandon(self, record_key):
+        """Release a claim whose request failed so that a retry executes again."""
+        self._collection().delete_one({"_id": record_key, "status": IN_PROGRESS})
+
+
+class MemoryIdempotencyStore:
+    """
+    ``IdempotencyStore`` for the in-memory storage backend: the same claim,
+    replay and takeover rules, held in a dict for a single process. Records
+    expire ``ttl_seconds`` after they were claimed, like the TTL index.
+    """
+
+    def __init__(self, ttl_seconds, lock_timeout=60):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.lock_timeout = lock_timeout
+        self._records = {}
+        self._lock = threading.Lock()
+        self._next_sweep = datetime.now(timezone.utc) + self.ttl
+
+    def _sweep(self, now):
+        if now < self._next_sweep:
+            return
+        self._records = {k: r for k, r in self._records.items() if now - r["created_at"] < self.ttl}
+        self._next_sweep = now + self.ttl
+
+    def begin(self, record_key, request_fingerprint):
+        """Returns None if the caller now owns the key, else the existing record."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._sweep(now)
+            record = self._records.get(record_key)
+            stale = record is not None and (
+                now - record["created_at"] >= self.ttl
+                or (record["status"] == IN_PROGRESS and record["fingerprint"] == request_fingerprint
+                    and now - record["created_at"] > timedelta(seconds=self.lock_timeout))
+            )
+            if record is None or stale:
+                self._records[record_key] = {
+                    "_id": record_key,
+                    "fingerprint": request_fingerprint,
+                    "status": IN_PROGRESS,
+                    "created_at": now
+                }
+                return None
+            return dict(record)
+
+    def complete(self, record_key, status_code, body, content_type):
+        with self._lock:
+            record = self._records.get(record_key)
+            if record is not None:
+                record["status"] = COMPLETED
+                record["response"] = {"status": status_code, "body": body, "content_type": content_type}
+
+    def abandon(self, record_key):
+        """Release a claim whose request failed so that a retry executes again."""
+        with self._lock:
+            if self._records.get(record_key, {}).get("status") == IN_PROGRESS:
+                del self._records[record_key]
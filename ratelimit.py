@@ -0,0 +1,119 @@
+import hashlib
+import math
+import threading
+import time
+
+from pymongo import ReturnDocument
+
+MAX_MEMORY_BUCKETS = 10000
+
+
+def parse_api_keys(value):
+    """Parse a comma-separated list of issued API keys into a set."""
+    return frozenset(key.strip() for key in (value or "").split(",") if key.strip())
+
+
+def client_key(api_key, remote_addr, valid_keys=frozenset()):
+    """
+    Identify the caller by API key (hashed, never stored raw) when it is one
+    of ``valid_keys``, else by IP. Unrecognised keys are ignored, so a caller
+    can't get a fresh bucket by sending a new key.
+    """
+    if api_key and api_key in valid_keys:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+    return "ip:" + (remote_addr or "unknown")
+
+
+class MemoryBucketStore:
+    """Token buckets held in this process; each replica limits independently."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, cost, capacity, rate):
+        """Take ``cost`` tokens if available. Returns (allowed, tokens_left)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > MAX_MEMORY_BUCKETS:
+                self._prune(now, capacity, rate)
+        return allowed, tokens
+
+    def _prune(self, now, capacity, rate):
+        # A bucket idle long enough to refill completely is equivalent to no bucket
+        idle = capacity / rate
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated >= idle:
+                del self._buckets[key]
+
+
+class MongoBucketStore:
+    """
+    Token buckets shared by all replicas in a Mongo collection.
+
+    Each check is a single find_one_and_update whose pipeline refills,
+    tests and debits the bucket atomically on the server using $$NOW, so
+    replica clock skew doesn't matter. Buckets carry an expires_at for a
+    TTL index to reap idle callers.
+    """
+
+    def __init__(self, collection_getter):
+        self._collection = collection_getter
+
+    @staticmethod
+    def pipeline(cost, capacity, rate):
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, rate]}]}]}
+        return [
+            {"$set": {"tokens": refilled, "updated_at": "$$NOW"}},
+            {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                "expires_at": {"$add": ["$$NOW", int(capacity / rate * 1000)]},
+            }},
+        ]
+
+    def consume(self, key, cost, capacity, rate):
+        bucket = self._collection().find_one_and_update(
+            {"_id": key},
+            self.pipeline(cost, capacity, rate),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return bucket["allowed"], bucket["tokens"]
+
+
+def ensure_rate_limit_indexes(db):
+    db.rate_limits.create_index("expires_at", name="expires_at_ttl", expireAfterSeconds=0)
+
+
+class RateLimiter:
+    """
+    Per-client token-bucket rate limiting.
+
+    Every client gets a bucket of ``capacity`` tokens refilled at ``rate``
+    tokens per second. A request costs ``route_costs[endpoint]`` tokens
+    (default 1), so full-collection reads can be priced above point reads.
+    """
+
+    def __init__(self, store, capacity=60, rate=10, route_costs=None):
+        self.store = store
+        self.capacity = capacity
+        self.rate = rate
+        self.route_costs = route_costs or {}
+
+    def cost(self, endpoint):
+        return self.route_costs.get(endpoint, 1)
+
+    def check(self, key, endpoint):
+        """Returns (allowed, remaining, retry_after_seconds)."""
+        cost = self.cost(endpoint)
+        allowed, tokens = self.store.consume(key, cost, self.capacity, self.rate)
+        retry_after = 0 if allowed else max(1, math.ceil((cost - tokens) / self.rate))
+        return allowed, int(tokens), retry_after
@@ -0,0 +1,76 @@
+import time
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+# Expiry (epoch seconds) of the client's read-your-writes window
+PIN_COOKIE = "read_primary_until"
+PINNED_ENVIRON_KEY = "music_manager.read_primary"
+READ_PREFERENCE_ENVIRON_KEY = "music_manager.read_preference"
+# Overrides whether a request counts as a write for pinning (a batch of only reads doesn't)
+WROTE_ENVIRON_KEY = "music_manager.wrote"
+
+
+def parse_route_preferences(value):
+    """Parse "get_artists=secondaryPreferred,..." into {"get_artists": "secondaryPreferred", ...}."""
+    routes = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            endpoint, mode = (part.strip() for part in item.split("=", 1))
+            if mode not in MODES:
+                raise ValueError(f"Unknown read preference {mode!r} for {endpoint}; use one of: {', '.join(MODES)}")
+            routes[endpoint] = mode
+    return routes
+
+
+def reads_secondary(preference):
+    """True when ``preference`` may be served by a secondary, i.e. possibly stale."""
+    return preference is not None and not isinstance(preference, Primary)
+
+
+class ReadRouter:
+    """
+    Chooses the read preference for each GET endpoint.
+
+    Routes listed in ``routes`` read with their configured mode, bounded by
+    ``max_staleness`` seconds of replication lag (-1 for no bound) for every
+    mode but primary; anything else uses the client's default. After a
+    successful write the client gets a cookie that pins its reads to the
+    primary for ``pin_seconds``, so it always sees its own writes. That
+    window should exceed ``max_staleness``.
+    """
+
+    def __init__(self, routes=None, max_staleness=-1, pin_seconds=120):
+        self.pin_seconds = pin_seconds
+        self.routes = {
+            endpoint: MODES[mode]() if mode == "primary" else MODES[mode](max_staleness=max_staleness)
+            for endpoint, mode in (routes or {}).items()
+        }
+
+    @property
+    def enabled(self):
+        return bool(self.routes)
+
+    def preference(self, endpoint, pinned=False):
+        """The read preference for ``endpoint``, or None for the client default."""
+        if not self.enabled:
+            return None
+        return Primary() if pinned else self.routes.get(endpoint)
+
+    def pin_until(self, now=None):
+        return int((now if now is not None else time.time()) + self.pin_seconds) + 1
+
+    def is_pinned(self, cookie, now=None):
+        """True while a pin cookie is live; values further out than a fresh pin are ignored."""
+        try:
+            until = int(cookie)
+        except (TypeError, ValueError):
+            return False
+        now = now if now is not None else time.time()
+        return now < until <= self.pin_until(now)
@@ -0,0 +1,88 @@
+import contextvars
+import threading
+
+from pymongo import monitoring
+
+_current = contextvars.ContextVar("db_round_trips", default=None)
+
+
+class RoundTripCounter:
+    """Database commands issued on behalf of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.commands = []
+        self._lock = threading.Lock()
+
+    def add(self, command_name):
+        with self._lock:
+            self.count += 1
+            self.commands.append(command_name)
+
+
+def start():
+    """Begin counting for the current request; returns (counter, token for ``stop``)."""
+    counter = RoundTripCounter()
+    return counter, _current.set(counter)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def in_current_context(fn):
+    """
+    Wrap ``fn`` to run in a copy of the caller's context, so queries it
+    issues from a pool thread are still charged to the calling request.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+class RoundTripListener(monitoring.CommandListener):
+    """Charges every command to the request that issued it. Started events fire on the issuing thread."""
+
+    def started(self, event):
+        counter = _current.get()
+        if counter is not None:
+            counter.add(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class RoundTripStats:
+    """Per-endpoint round-trip totals for /metrics."""
+
+    def __init__(self, budget=0):
+        self.budget = budget
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, count):
+        """Returns True if ``count`` exceeded the budget."""
+        over = bool(self.budget) and count > self.budget
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {"requests": 0, "round_trips": 0, "max": 0, "over_budget": 0})
+            stats["requests"] += 1
+            stats["round_trips"] += count
+            stats["max"] = max(stats["max"], count)
+            stats["over_budget"] += over
+        return over
+
+    def stats(self):
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "endpoints": {
+                    endpoint: dict(s, mean=round(s["round_trips"] / s["requests"], 2))
+                    for endpoint, s in self._endpoints.items()
+                }
+            }
@@ -0,0 +1,126 @@
+import re
+import unicodedata
+
+from pymongo import ASCENDING
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def normalize(text):
+    """
+    Normalize a name or title for prefix matching.
+
+    Strips diacritics (including Hebrew niqqud), case-folds and collapses
+    whitespace so that "Beyoncé", "beyonce" and "  BEYONCE " share a key.
+    """
+    if not isinstance(text, str):
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def ensure_search_indexes(db):
+    # _id suffix lets ?sort=name on the artists listing break ties without a blocking sort
+    db.artists.create_index([("name_normalized", ASCENDING), ("_id", ASCENDING)], name="name_normalized_1__id_1")
+    db.artists.create_index([("songs.title_normalized", ASCENDING)], name="songs_title_normalized_1")
+
+
+def _rank(key, prefix):
+    # Exact matches first, then shorter (closer) completions, then alphabetical
+    return (key != prefix, len(key), key)
+
+
+def rank(results, prefix):
+    """Order results by their normalized ``_key`` against ``prefix``, then drop the key."""
+    results.sort(key=lambda result: _rank(result["_key"], prefix))
+    for result in results:
+        del result["_key"]
+    return results
+
+
+def search_artists(db, prefix, limit):
+    cursor = db.artists.find(
+        {"name_normalized": {"$regex": "^" + re.escape(prefix)}},
+        {"name": 1, "name_normalized": 1}
+    ).sort("name_normalized", ASCENDING).limit(limit)
+
+    artists = [
+        {"_id": str(artist["_id"]), "name": artist["name"], "_key": artist.get("name_normalized", "")}
+        for artist in cursor
+    ]
+    return rank(artists, prefix)
+
+
+def search_songs(db, prefix, limit):
+    pipeline = [
+        {"$match": {"songs.title_normalized": {"$regex": "^" + re.escape(prefix)}}},
+        # Bound the number of artist documents touched before unwinding
+        {"$limit": limit},
+        {"$project": {
+            "name": 1,
+            "songs": {"$filter": {
+                "input": "$songs",
+                "cond": {"$eq": [
+                    {"$indexOfCP": [{"$ifNull": ["$$this.title_normalized", ""]}, prefix]},
+                    0
+                ]}
+            }}
+        }},
+        {"$unwind": "$songs"},
+        {"$limit": limit},
+    ]
+
+    songs = [
+        {
+            "artist_id": str(doc["_id"]),
+            "artist_name": doc.get("name"),
+            "title": doc["songs"].get("title"),
+            "duration": doc["songs"].get("duration"),
+            "_key": doc["songs"].get("title_normalized", ""),
+        }
+        for doc in db.artists.aggregate(pipeline)
+    ]
+    return rank(songs, prefix)
+
+
+def search_catalog(db, query, limit=DEFAULT_LIMIT):
+    prefix = normalize(query)
+    if not prefix:
+        return {"artists": [], "songs": []}
+    return {
+        "artists": search_artists(db, prefix, limit),
+        "songs": search_songs(db, prefix, limit),
+    }
+
+
+def backfill_search_fields(db, batch_size=500):
+    """
+    Populate name_normalized / songs.title_normalized on documents written
+    before search existed. Returns the number of artists updated.
+    """
+    updated = 0
+    cursor = db.artists.find(
+        {"$or": [
+            {"name_normalized": {"$exists": False}},
+            {"songs": {"$elemMatch": {"title_normalized": {"$exists": False}}}},
+        ]},
+        {"name": 1, "songs": 1}
+    ).batch_size(batch_size)
+
+    for artist in cursor:
+        songs = artist.get("songs", [])
+        normalized_songs = [
+            dict(song, title_normalized=normalize(song.get("title"))) for song in songs
+        ]
+        # Match on the songs we read so a concurrent push isn't overwritten
+        result = db.artists.update_one(
+            {"_id": artist["_id"], "songs": songs},
+            {"$set": {
+                "name_normalized": normalize(artist.get("name")),
+                "songs": normalized_songs,
+            }}
+        )
+        updated += result.modified_count
+    return updated
@@ -0,0 +1,69 @@
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls within this process.
+
+    The first caller for a key runs ``fn``; callers arriving while it is in
+    flight wait and receive the same result (or exception). Nothing is
+    remembered once the call returns, so this only collapses bursts and
+    never serves stale data. The result object is shared between callers
+    and must not be mutated.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def forget(self, predicate):
+        """
+        Detach in-flight calls whose key matches, so callers arriving after a
+        write start a fresh query instead of joining one that began before it.
+        """
+        with self._lock:
+            for key in [key for key in self._calls if predicate(key)]:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
@@ -0,0 +1,711 @@
+"""
+Storage backends for the catalog: artists, playlists and favorites.
+
+Route handlers go through a storage object's ``artists``, ``playlists`` and
+``favorites`` repositories rather than calling collections directly. Both
+backends implement the same methods:
+
+- MongoStorage issues the same queries the routes always have, against
+  collections resolved on every call, so patching ``app.mongo`` or
+  reconfiguring the client takes effect immediately.
+- MemoryStorage keeps documents in this process behind sorted secondary
+  indexes, for in-process benchmarks and hermetic tests. Nothing persists.
+
+Documents carry ObjectId _ids on both backends, and reads return copies the
+caller may modify. Conditional writes return a falsy value when the
+document is missing or its version has moved on; the caller decides which
+error that is.
+"""
+import bisect
+import itertools
+import re
+import threading
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import aggregates
+import export
+import search
+
+FAVORITES_QUERY = {"type": "user_favorites"}
+
+
+def ensure_favorites_indexes(db):
+    # Single favorites document looked up by type; unique so concurrent init upserts can't duplicate it
+    db.favorites.create_index([("type", ASCENDING)], name="type_1", unique=True)
+
+
+def _version_filter(doc_id, version):
+    # Documents written before versioning have no field; they count as version 0
+    return {"_id": doc_id, "version": version if version else {"$in": [0, None]}}
+
+
+def _bumped_version():
+    return {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+
+
+def _move_song_pipeline(from_index, to_index):
+    # Take the song out, then splice it back in at to_index. The filter has
+    # already checked both indexes exist, so $size is at least 1 here.
+    size = {"$size": "$songs"}
+    return [{"$set": {
+        "songs": {"$let": {
+            "vars": {
+                "song": {"$arrayElemAt": ["$songs", from_index]},
+                "rest": {"$concatArrays": [
+                    {"$slice": ["$songs", from_index]},
+                    {"$slice": ["$songs", from_index + 1, size]}
+                ]}
+            },
+            "in": {"$concatArrays": [
+                {"$slice": ["$$rest", to_index]},
+                ["$$song"],
+                {"$slice": ["$$rest", to_index, size]}
+            ]}
+        }},
+        "version": _bumped_version()
+    }}]
+
+
+def _remove_song_pipeline(song_index, **decrements):
+    # Splice the song out on the server instead of sending the rest of the
+    # array back; the version filter guarantees song_index still exists.
+    size = {"$size": "$songs"}
+    counters = {field: {"$add": [{"$ifNull": ["$" + field, 0]}, -amount]} for field, amount in decrements.items()}
+    return [{"$set": {
+        "songs": {"$concatArrays": [
+            {"$slice": ["$songs", song_index]},
+            {"$slice": ["$songs", song_index + 1, size]}
+        ]},
+        **counters,
+        "version": _bumped_version()
+    }}]
+
+
+def _reorder_songs_pipeline(order):
+    return [{"$set": {
+        "songs": {"$map": {"input": {"$literal": order}, "in": {"$arrayElemAt": ["$songs", "$$this"]}}},
+        "version": _bumped_version()
+    }}]
+
+
+class MongoArtists:
+    def __init__(self, collection_getter):
+        self._collection = collection_getter
+
+    def find(self, name_prefix=None, min_songs=None, ids=None, sort=None, limit=None, offset=0, projection=None):
+        query = {}
+        if ids is not None:
+            query["_id"] = {"$in": ids}
+        if name_prefix:
+            query["name_normalized"] = {"$regex": "^" + re.escape(name_prefix)}
+        if min_songs is not None:
+            query["song_count"] = {"$gte": min_songs}
+        if not sort and (limit or offset):
+            # A stable order is needed for pages to line up
+            sort = [("_id", ASCENDING)]
+        cursor = self._collection().find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if offset:
+            cursor = cursor.skip(offset)
+        if limit:
+            cursor = cursor.limit(limit)
+        return list(cursor)
+
+    def get(self, artist_id, projection=None):
+        query = {"_id": ObjectId(artist_id)}
+        if projection:
+            return self._collection().find_one(query, projection)
+        return self._collection().find_one(query)
+
+    def insert(self, artist):
+        return self._collection().insert_one(artist).inserted_id
+
+    def delete(self, artist_id):
+        return self._collection().delete_one({"_id": ObjectId(artist_id)}).deleted_count != 0
+
+    def push_song(self, artist_id, song, expected_version=None):
+        query = {"_id": ObjectId(artist_id)}
+        if expected_version is not None:
+            query = _version_filter(query["_id"], expected_version)
+        result = self._collection().update_one(
+            query,
+            {"$push": {"songs": song}, "$inc": {"song_count": 1, "version": 1}}
+        )
+        return result.matched_count != 0
+
+    def remove_song(self, artist_id, artist, song_index):
+        """Remove a song from ``artist`` as read; False if it was written since."""
+        result = self._collection().update_one(
+            _version_filter(ObjectId(artist_id), artist.get("version", 0)),
+            _remove_song_pipeline(song_index, song_count=1)
+        )
+        return bool(result.matched_count)
+
+
+class MongoPlaylists:
+    def __init__(self, collection_getter):
+        self._collection = collection_getter
+
+    def find(self, projection=None, limit=None, offset=0):
+        cursor = self._collection().find({}, projection)
+        if limit or offset:
+            # A stable order is needed for pages to line up
+            cursor = cursor.sort("_id", ASCENDING).skip(offset)
+            if limit:
+                cursor = cursor.limit(limit)
+        return list(cursor)
+
+    def get(self, playlist_id, projection=None):
+        query = {"_id": ObjectId(playlist_id)}
+        if projection:
+            return self._collection().find_one(query, projection)
+        return self._collection().find_one(query)
+
+    def insert(self, playlist):
+        return self._collection().insert_one(playlist).inserted_id
+
+    def delete(self, playlist_id):
+        return self._collection().delete_one({"_id": ObjectId(playlist_id)}).deleted_count != 0
+
+    def push_song(self, playlist_id, song, expected_version=None, coalescer=None):
+        query = {"_id": ObjectId(playlist_id)}
+        if expected_version is not None:
+            query = _version_filter(query["_id"], expected_version)
+        update = {
+            "$push": {"songs": song},
+            "$inc": {
+                "song_count": 1,
+                "total_duration_seconds": aggregates.song_seconds(song),
+                "version": 1
+            }
+        }
+        if coalescer and expected_version is None:
+            # A coalesced write can't report whether the version predicate matched
+            return coalescer.submit(self._collection(), query, update).result(coalescer.timeout)
+        return self._collection().update_one(query, update).matched_count > 0
+
+    def remove_song(self, playlist_id, playlist, song_index):
+        """Remove a song from ``playlist`` as read; False if it was written since."""
+        result = self._collection().update_one(
+            _version_filter(ObjectId(playlist_id), playlist.get("version", 0)),
+            _remove_song_pipeline(
+                song_index, song_count=1,
+                total_duration_seconds=aggregates.song_seconds(playlist["songs"][song_index])
+            )
+        )
+        return bool(result.matched_count)
+
+    def move_song(self, playlist_id, from_index, to_index, expected_version=None):
+        """Move one song in a single round trip; returns the new version, or None if nothing matched."""
+        query = {
+            "_id": ObjectId(playlist_id),
+            f"songs.{max(from_index, to_index)}": {"$exists": True}
+        }
+        return self._update_order(query, _move_song_pipeline(from_index, to_index), expected_version)
+
+    def reorder_songs(self, playlist_id, order, expected_version=None):
+        """Apply a permutation of the song indexes; returns the new version, or None if nothing matched."""
+        # The $size guard makes sure the permutation covers exactly the current songs
+        query = {"_id": ObjectId(playlist_id), "songs": {"$size": len(order)}}
+        return self._update_order(query, _reorder_songs_pipeline(order), expected_version)
+
+    def _update_order(self, query, pipeline, expected_version):
+        if expected_version is not None:
+            query.update(_version_filter(query["_id"], expected_version))
+        playlist = self._collection().find_one_and_update(
+            query, pipeline, projection={"version": 1}, return_document=ReturnDocument.AFTER
+        )
+        return playlist["version"] if playlist else None
+
+
+class MongoFavorites:
+    def __init__(self, collection_getter):
+        self._collection = collection_getter
+
+    def get(self, songs_limit=None, songs_offset=0):
+        if songs_limit:
+            return self._collection().find_one(FAVORITES_QUERY, {"songs": {"$slice": [songs_offset, songs_limit]}})
+        return self._collection().find_one(FAVORITES_QUERY)
+
+    def add_song(self, song, coalescer=None):
+        init_update = {"$setOnInsert": {"type": "user_favorites", "songs": []}}
+        push_query = {
+            "type": "user_favorites",
+            "songs": {"$not": {"$elemMatch": {
+                "artist_id": song["artist_id"],
+                "title": song["title"]
+            }}}
+        }
+        push_update = {"$push": {"songs": song}}
+
+        if coalescer:
+            # Concurrent adds share one init upsert and land in a single bulk_write
+            pending = [
+                coalescer.submit(self._collection(), FAVORITES_QUERY, init_update, upsert=True, dedupe_key="favorites-init"),
+                coalescer.submit(self._collection(), push_query, push_update)
+            ]
+            for future in pending:
+                future.result(coalescer.timeout)
+        else:
+            # Initialize favorites document if it doesn't exist
+            self._collection().update_one(FAVORITES_QUERY, init_update, upsert=True)
+            # Add the song to favorites if it's not already there
+            self._collection().update_one(push_query, push_update)
+
+    def remove_song(self, artist_id, title):
+        result = self._collection().update_one(
+            FAVORITES_QUERY,
+            {"$pull": {"songs": {"artist_id": artist_id, "title": title}}}
+        )
+        return result.matched_count != 0
+
+
+class MongoStorage:
+    """
+    ``read_preference_getter`` returns the read preference for the current
+    request, or None for the client default. Reads and writes both go through
+    it; writes always go to the primary whatever it says.
+    """
+
+    def __init__(self, db_getter, client_getter, read_preference_getter=None):
+        self._db = db_getter
+        self._client = client_getter
+        self._read_preference = read_preference_getter
+        self.artists = MongoArtists(lambda: self._routed_db().artists)
+        self.playlists = MongoPlaylists(lambda: self._routed_db().playlists)
+        self.favorites = MongoFavorites(lambda: self._routed_db().favorites)
+
+    def _routed_db(self):
+        db = self._db()
+        read_preference = self._read_preference() if self._read_preference else None
+        return db.with_options(read_preference=read_preference) if read_preference else db
+
+    def ping(self):
+        self._client().admin.command("ping")
+
+    def search(self, query, limit=search.DEFAULT_LIMIT):
+        return search.search_catalog(self._routed_db(), query, limit)
+
+    def stream_collection(self, name, after=None, batch_size=export.DEFAULT_BATCH_SIZE, snapshot=False, compress=False):
+        return export.stream_collection(self._routed_db(), name, after, batch_size, snapshot=snapshot, compress=compress)
+
+    def enqueue_cascade(self, worker, artist_id):
+        """Queue removal of the artist's songs from playlists and favorites; returns the job id."""
+        return worker.enqueue(self._db(), artist_id)
+
+
+class _SortedIndex:
+    """Sorted (key, _id) entries: prefix and range scans, walked in either direction."""
+
+    def __init__(self):
+        self._entries = []
+
+    def add(self, key, doc_id):
+        bisect.insort(self._entries, (key, doc_id))
+
+    def remove(self, key, doc_id):
+        i = bisect.bisect_left(self._entries, (key, doc_id))
+        if i < len(self._entries) and self._entries[i] == (key, doc_id):
+            del self._entries[i]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def scan(self, low=None, prefix=None, descending=False):
+        """Entries with key >= ``low`` or starting with ``prefix``."""
+        bound = prefix if prefix is not None else low
+        start = bisect.bisect_left(self._entries, (bound,)) if bound is not None else 0
+        end = len(self._entries)
+        if prefix is not None:
+            end = start
+            while end < len(self._entries) and self._entries[end][0].startswith(prefix):
+                end += 1
+        entries = self._entries[start:end]
+        return reversed(entries) if descending else iter(entries)
+
+
+def _copy(doc, projection=None):
+    if projection and any(v for k, v in projection.items() if k != "_id"):
+        copied = {k: doc[k] for k, v in projection.items() if v and k in doc}
+        if projection.get("_id", 1):
+            copied["_id"] = doc["_id"]
+    else:
+        copied = {k: v for k, v in doc.items() if (projection or {}).get(k, 1)}
+    if isinstance(copied.get("songs"), list):
+        copied["songs"] = list(copied["songs"])
+    return copied
+
+
+def _sort_key(value):
+    # Missing values sort first, as in Mongo, without comparing None to other types
+    return (value is not None, value)
+
+
+def _sorted(docs, sort):
+    for field, direction in reversed(sort):
+        docs.sort(key=lambda doc: _sort_key(doc.get(field)), reverse=direction == DESCENDING)
+    return docs
+
+
+def _version_matches(doc, expected_version):
+    return expected_version is None or doc.get("version", 0) == expected_version
+
+
+class _MemoryCollection:
+    """
+    Documents by _id plus sorted indexes. Stored documents are never modified
+    in place: writes swap in a new dict, so copies and snapshots handed out
+    earlier stay consistent.
+    """
+
+    def __init__(self, lock, indexed_fields=()):
+        self._lock = lock
+        self._docs = {}
+        self._indexed_fields = indexed_fields
+        self._indexes = {field: _SortedIndex() for field in ("_id",) + tuple(indexed_fields)}
+
+    def _index(self, doc):
+        for field, index in self._indexes.items():
+            if doc.get(field) is not None:
+                index.add(doc[field], doc["_id"])
+
+    def _unindex(self, doc):
+        for field, index in self._indexes.items():
+            if doc.get(field) is not None:
+                index.remove(doc[field], doc["_id"])
+
+    def _store(self, doc):
+        old = self._docs.get(doc["_id"])
+        if old is not None:
+            self._unindex(old)
+        self._docs[doc["_id"]] = doc
+        self._index(doc)
+
+    def _update(self, doc, **changes):
+        changes["version"] = doc.get("version", 0) + 1
+        updated = dict(doc, **changes)
+        self._store(updated)
+        return updated
+
+    def _ordered(self, field, low=None, prefix=None, descending=False):
+        return (self._docs[doc_id] for _, doc_id in self._indexes[field].scan(low, prefix, descending))
+
+    def get(self, doc_id, projection=None):
+        with self._lock:
+            doc = self._docs.get(ObjectId(doc_id))
+            return _copy(doc, projection) if doc else None
+
+    def insert(self, doc):
+        doc = dict(doc)
+        doc.setdefault("_id", ObjectId())
+        with self._lock:
+            if doc["_id"] in self._docs:
+                raise DuplicateKeyError(f"duplicate _id {doc['_id']}")
+            self._store(doc)
+        return doc["_id"]
+
+    def delete(self, doc_id):
+        with self._lock:
+            doc = self._docs.pop(ObjectId(doc_id), None)
+            if doc is None:
+                return False
+            self._unindex(doc)
+            return True
+
+    def documents(self, after=None):
+        """All documents in _id order, from a point-in-time view."""
+        with self._lock:
+            docs = list(self._ordered("_id", low=ObjectId(after) if after is not None else None))
+        return [doc for doc in docs if after is None or doc["_id"] != ObjectId(after)]
+
+
+class MemoryArtists(_MemoryCollection):
+    def __init__(self, lock):
+        super().__init__(lock, indexed_fields=("name_normalized", "song_count"))
+        # (title_normalized, artist _id), one entry per song
+        self._titles = _SortedIndex()
+
+    def _index(self, doc):
+        super()._index(doc)
+        for song in doc.get("songs", []):
+            if song.get("title_normalized"):
+                self._titles.add(song["title_normalized"], doc["_id"])
+
+    def _unindex(self, doc):
+        super()._unindex(doc)
+        for song in doc.get("songs", []):
+            if song.get("title_normalized"):
+                self._titles.remove(song["title_normalized"], doc["_id"])
+
+    def _scan(self, name_prefix, min_songs, ids, sort):
+        """Candidates from the most selective index, in index order when that satisfies ``sort``."""
+        if ids is not None:
+            field = None
+            docs = (self._docs[i] for i in dict.fromkeys(ids) if i in self._docs)
+        elif name_prefix:
+            field = "name_normalized"
+            docs = self._ordered(field, prefix=name_prefix)
+        elif min_songs is not None:
+            field = "song_count"
+            docs = self._ordered(field, low=min_songs)
+        else:
+            field = sort[0][0] if sort and sort[0][0] in self._indexes else "_id"
+            if len(self._indexes[field]) != len(self._docs):
+                # Documents missing the field aren't in its index; Mongo still returns them
+                field = "_id"
+            docs = self._ordered(field)
+
+        if not sort:
+            return docs
+        direction = sort[0][1]
+        index_order = [(field, direction)] if field == "_id" else [(field, direction), ("_id", direction)]
+        if [tuple(s) for s in sort] != index_order:
+            return iter(_sorted(list(docs), sort))
+        return reversed(list(docs)) if direction == DESCENDING else docs
+
+    def find(self, name_prefix=None, min_songs=None, ids=None, sort=None, limit=None, offset=0, projection=None):
+        if not sort and (limit or offset):
+            # Same page order as MongoArtists
+            sort = [("_id", ASCENDING)]
+        with self._lock:
+            docs = (
+                doc for doc in self._scan(name_prefix, min_songs, ids, sort)
+                if (not name_prefix or doc.get("name_normalized", "").startswith(name_prefix))
+                and (min_songs is None or doc.get("song_count", 0) >= min_songs)
+            )
+            page = itertools.islice(docs, offset, offset + limit if limit else None)
+            return [_copy(doc, projection) for doc in page]
+
+    def push_song(self, artist_id, song, expected_version=None):
+        with self._lock:
+            artist = self._docs.get(ObjectId(artist_id))
+            if not artist or not _version_matches(artist, expected_version):
+                return False
+            self._update(artist, songs=artist.get("songs", []) + [dict(song)], song_count=artist.get("song_count", 0) + 1)
+            return True
+
+    def remove_song(self, artist_id, artist, song_index):
+        with self._lock:
+            current = self._docs.get(ObjectId(artist_id))
+            if not current or current.get("version", 0) != artist.get("version", 0):
+                return False
+            songs = current["songs"]
+            self._update(current, songs=songs[:song_index] + songs[song_index + 1:],
+                         song_count=current.get("song_count", 0) - 1)
+            return True
+
+    def search_names(self, prefix, limit):
+        with self._lock:
+            artists = [
+                {"_id": str(artist["_id"]), "name": artist["name"], "_key": artist["name_normalized"]}
+                for artist in itertools.islice(self._ordered("name_normalized", prefix=prefix), limit)
+            ]
+        return search.rank(artists, prefix)
+
+    def search_titles(self, prefix, limit):
+        with self._lock:
+            artist_ids = itertools.islice(dict.fromkeys(doc_id for _, doc_id in self._titles.scan(prefix=prefix)), limit)
+            songs = [
+                {
+                    "artist_id": str(artist["_id"]),
+                    "artist_name": artist.get("name"),
+                    "title": song.get("title"),
+                    "duration": song.get("duration"),
+                    "_key": song.get("title_normalized", ""),
+                }
+                for artist in (self._docs[i] for i in artist_ids)
+                for song in artist.get("songs", [])
+                if song.get("title_normalized", "").startswith(prefix)
+            ][:limit]
+        return search.rank(songs, prefix)
+
+
+class MemoryPlaylists(_MemoryCollection):
+    def __init__(self, lock):
+        super().__init__(lock)
+        # artist_id -> playlist _ids with at least one of the artist's songs
+        self._by_artist = {}
+
+    def _index(self, doc):
+        super()._index(doc)
+        for artist_id in {song.get("artist_id") for song in doc.get("songs", [])}:
+            self._by_artist.setdefault(artist_id, set()).add(doc["_id"])
+
+    def _unindex(self, doc):
+        super()._unindex(doc)
+        for artist_id in {song.get("artist_id") for song in doc.get("songs", [])}:
+            playlist_ids = self._by_artist.get(artist_id)
+            if playlist_ids is not None:
+                playlist_ids.discard(doc["_id"])
+                if not playlist_ids:
+                    del self._by_artist[artist_id]
+
+    def find(self, projection=None, limit=None, offset=0):
+        with self._lock:
+            docs = self._ordered("_id") if limit or offset else iter(self._docs.values())
+            page = itertools.islice(docs, offset, offset + limit if limit else None)
+            return [_copy(doc, projection) for doc in page]
+
+    def push_song(self, playlist_id, song, expected_version=None, coalescer=None):
+        # Appends are already cheap in memory; there is nothing for a coalescer to batch
+        with self._lock:
+            playlist = self._docs.get(ObjectId(playlist_id))
+            if not playlist or not _version_matches(playlist, expected_version):
+                return False
+            self._update(
+                playlist,
+                songs=playlist.get("songs", []) + [dict(song)],
+                song_count=playlist.get("song_count", 0) + 1,
+                total_duration_seconds=playlist.get("total_duration_seconds", 0) + aggregates.song_seconds(song)
+            )
+            return True
+
+    def remove_song(self, playlist_id, playlist, song_index):
+        with self._lock:
+            current = self._docs.get(ObjectId(playlist_id))
+            if not current or current.get("version", 0) != playlist.get("version", 0):
+                return False
+            songs = current["songs"]
+            self._update(
+                current,
+                songs=songs[:song_index] + songs[song_index + 1:],
+                song_count=current.get("song_count", 0) - 1,
+                total_duration_seconds=current.get("total_duration_seconds", 0) - aggregates.song_seconds(songs[song_index])
+            )
+            return True
+
+    def move_song(self, playlist_id, from_index, to_index, expected_version=None):
+        def move(songs):
+            if max(from_index, to_index) >= len(songs):
+                return None
+            rest = songs[:from_index] + songs[from_index + 1:]
+            return rest[:to_index] + [songs[from_index]] + rest[to_index:]
+        return self._update_order(playlist_id, move, expected_version)
+
+    def reorder_songs(self, playlist_id, order, expected_version=None):
+        def reorder(songs):
+            return [songs[i] for i in order] if len(songs) == len(order) else None
+        return self._update_order(playlist_id, reorder, expected_version)
+
+    def _update_order(self, playlist_id, reorder, expected_version):
+        with self._lock:
+            playlist = self._docs.get(ObjectId(playlist_id))
+            if not playlist or not _version_matches(playlist, expected_version):
+                return None
+            songs = reorder(playlist.get("songs", []))
+            if songs is None:
+                return None
+            return self._update(playlist, songs=songs)["version"]
+
+    def remove_artist(self, artist_id):
+        """Drop the artist's songs and recompute aggregates; returns the playlist _ids changed."""
+        with self._lock:
+            playlist_ids = sorted(self._by_artist.get(artist_id, ()))
+            for playlist_id in playlist_ids:
+                playlist = self._docs[playlist_id]
+                songs = [song for song in playlist["songs"] if song.get("artist_id") != artist_id]
+                self._update(
+                    playlist,
+                    songs=songs,
+                    song_count=len(songs),
+                    total_duration_seconds=sum(
+                        song["duration_seconds"] for song in songs
+                        if isinstance(song.get("duration_seconds"), (int, float))
+                    )
+                )
+            return playlist_ids
+
+
+class MemoryFavorites:
+    def __init__(self, lock):
+        self._lock = lock
+        self._doc = None
+        # (artist_id, title) pairs already in the list
+        self._keys = set()
+
+    def get(self, songs_limit=None, songs_offset=0):
+        with self._lock:
+            if self._doc is None:
+                return None
+            favorites = _copy(self._doc)
+        if songs_limit:
+            favorites["songs"] = favorites["songs"][songs_offset:songs_offset + songs_limit]
+        return favorites
+
+    def add_song(self, song, coalescer=None):
+        with self._lock:
+            doc = self._doc or {"_id": ObjectId(), "type": "user_favorites", "songs": []}
+            key = (song["artist_id"], song["title"])
+            if key not in self._keys:
+                self._keys.add(key)
+                doc = dict(doc, songs=doc["songs"] + [dict(song)])
+            self._doc = doc
+
+    def remove_song(self, artist_id, title):
+        with self._lock:
+            if self._doc is None:
+                return False
+            self._set_songs([s for s in self._doc["songs"] if (s.get("artist_id"), s.get("title")) != (artist_id, title)])
+            return True
+
+    def remove_artist(self, artist_id):
+        """Drop the artist's songs; returns whether anything changed."""
+        with self._lock:
+            if self._doc is None:
+                return False
+            songs = [song for song in self._doc["songs"] if song.get("artist_id") != artist_id]
+            changed = len(songs) != len(self._doc["songs"])
+            self._set_songs(songs)
+            return changed
+
+    def _set_songs(self, songs):
+        self._doc = dict(self._doc, songs=songs)
+        self._keys = {(s.get("artist_id"), s.get("title")) for s in songs}
+
+    def documents(self, after=None):
+        with self._lock:
+            doc = self._doc
+        return [doc] if doc is not None and (after is None or doc["_id"] > ObjectId(after)) else []
+
+
+class MemoryStorage:
+    def __init__(self):
+        # One lock across repositories so cascades touching several stay atomic
+        self._lock = threading.RLock()
+        self.artists = MemoryArtists(self._lock)
+        self.playlists = MemoryPlaylists(self._lock)
+        self.favorites = MemoryFavorites(self._lock)
+
+    def ping(self):
+        pass
+
+    def search(self, query, limit=search.DEFAULT_LIMIT):
+        prefix = search.normalize(query)
+        if not prefix:
+            return {"artists": [], "songs": []}
+        return {
+            "artists": self.artists.search_names(prefix, limit),
+            "songs": self.artists.search_titles(prefix, limit),
+        }
+
+    def stream_collection(self, name, after=None, batch_size=export.DEFAULT_BATCH_SIZE, snapshot=False, compress=False):
+        # Every export reads a point-in-time copy, so ``snapshot`` is always honoured
+        yield from export.iter_ndjson(getattr(self, name).documents(after), compress)
+
+    def enqueue_cascade(self, worker, artist_id):
+        """
+        Remove the artist's songs inline: there is no I/O to pace. The
+        worker's callbacks still fire and the job is recorded as done.
+        """
+        with self._lock:
+            playlist_ids = self.playlists.remove_artist(artist_id)
+            favorites_updated = self.favorites.remove_artist(artist_id)
+        if playlist_ids and worker.on_playlists_updated:
+            worker.on_playlists_updated(playlist_ids)
+        if favorites_updated and worker.on_favorites_updated:
+            worker.on_favorites_updated()
+        return worker.record_done(artist_id, len(playlist_ids), int(favorites_updated))
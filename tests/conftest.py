@@ -1,4 +1,5 @@
 import pytest
+import mongomock
 from unittest.mock import Mock, patch
 from app import app
 
@@ -25,4 +26,98 @@ def mock_db():
         mock_favorites_collection = Mock()
         mock_mongo.db.favorites = mock_favorites_collection
         
-        yield mock_mongo
\ No newline at end of file
+        yield mock_mongo
+
+
+# Collection methods that each cost one database round trip
+DB_CALL_METHODS = {
+    "find", "find_one", "aggregate", "count_documents", "estimated_document_count", "distinct",
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one", "delete_many",
+    "find_one_and_update", "find_one_and_delete", "bulk_write",
+}
+
+
+def count_db_calls(mock_mongo):
+    """ספירת הקריאות לדאטהבייס דרך ה-collections המדומים"""
+    count = 0
+    for name in ("artists", "playlists", "favorites"):
+        collection = getattr(mock_mongo.db, name)
+        count += sum(1 for call in collection.mock_calls if call[0] in DB_CALL_METHODS)
+    return count
+
+
+@pytest.fixture
+def assert_max_db_calls(mock_db):
+    """וידוא שנתיב לא עובר את תקציב הקריאות לדאטהבייס"""
+    def check(maximum):
+        calls = count_db_calls(mock_db)
+        assert calls <= maximum, f"{calls} database calls, budget is {maximum}"
+        return calls
+    return check
+
+
+def _slice(array, *args):
+    if len(args) == 1:
+        return array[:args[0]]
+    position, n = args
+    return array[position:position + n]
+
+
+def _evaluate(expr, doc, variables):
+    """Evaluate the small subset of aggregation expressions the storage pipelines use."""
+    if isinstance(expr, str) and expr.startswith("$$"):
+        return variables[expr[2:]]
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if isinstance(expr, list):
+        return [_evaluate(e, doc, variables) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    (op, args), = expr.items()
+    if op == "$literal":
+        return args
+    if op == "$let":
+        inner = dict(variables, **{k: _evaluate(v, doc, variables) for k, v in args["vars"].items()})
+        return _evaluate(args["in"], doc, inner)
+    if op == "$map":
+        return [_evaluate(args["in"], doc, dict(variables, this=item)) for item in _evaluate(args["input"], doc, variables)]
+    values = _evaluate(args, doc, variables)
+    if op == "$size":
+        return len(values)
+    if op == "$slice":
+        return _slice(*values)
+    if op == "$arrayElemAt":
+        return values[0][values[1]]
+    if op == "$concatArrays":
+        return [item for array in values for item in array]
+    if op == "$ifNull":
+        return values[1] if values[0] is None else values[0]
+    if op == "$add":
+        return sum(values)
+    raise NotImplementedError(op)
+
+
+def apply_pipeline(pipeline, doc):
+    """הרצת pipeline של עדכון על מסמך, בלי שרת"""
+    for stage in pipeline:
+        doc = dict(doc, **{k: _evaluate(v, doc, {}) for k, v in stage["$set"].items()})
+    return doc
+
+
+@pytest.fixture
+def mongomock_pipelines():
+    """mongomock לא מריץ update_one עם pipeline; מריצים אותו דרך apply_pipeline"""
+    update_one = mongomock.collection.Collection.update_one
+
+    def pipeline_update_one(collection, query, update, *args, **kwargs):
+        if isinstance(update, list):
+            doc = collection.find_one(query)
+            if doc is not None:
+                fields = {k: v for k, v in apply_pipeline(update, doc).items() if k != "_id"}
+                query, update = {"_id": doc["_id"]}, {"$set": fields}
+            else:
+                update = {"$set": {}}
+        return update_one(collection, query, update, *args, **kwargs)
+
+    with patch.object(mongomock.collection.Collection, "update_one", pipeline_update_one):
+        yield
@@ -0,0 +1,129 @@
+import threading
+import pytest
+from unittest.mock import Mock, patch
+from bson import ObjectId
+
+import admission
+
+
+class TestAdmissionController:
+    def test_rejects_when_full(self):
+        """בדיקה שבקשה נדחית כשאין מקום פנוי"""
+        controller = admission.AdmissionController(max_limit=1, min_limit=1, queue_timeout=0.01)
+
+        assert controller.try_acquire("get_artists") is True
+        assert controller.try_acquire("get_playlists") is False
+        controller.release("get_artists")
+        assert controller.try_acquire("get_playlists") is True
+        assert controller.stats()["rejected"] == 1
+
+    def test_route_limit(self):
+        """בדיקת מגבלה פר נתיב"""
+        controller = admission.AdmissionController(queue_timeout=0.01, route_limits={"get_artists": 1})
+
+        assert controller.try_acquire("get_artists") is True
+        assert controller.try_acquire("get_artists") is False
+        assert controller.try_acquire("get_playlists") is True
+
+    def test_queued_request_admitted_on_release(self):
+        """בדיקה שבקשה ממתינה נכנסת כשמתפנה מקום"""
+        controller = admission.AdmissionController(max_limit=1, min_limit=1, queue_timeout=2)
+        controller.try_acquire("a")
+        threading.Timer(0.05, controller.release, args=("a",)).start()
+
+        assert controller.try_acquire("b") is True
+
+    def test_limit_adapts_to_latency(self):
+        """בדיקה שהמגבלה יורדת בעומס ועולה בהתאוששות"""
+        controller = admission.AdmissionController(max_limit=64, min_limit=4, target_latency=0.05, smoothing=1)
+
+        for _ in range(1000):
+            controller.observe_latency(0.5)
+        assert controller.stats()["limit"] == 4
+
+        for _ in range(200):
+            controller.observe_latency(0.001)
+        assert controller.stats()["limit"] > 4
+
+    def test_one_decrease_per_window(self):
+        """בדיקה שבעומס מתמשך המגבלה יורדת פעם אחת לכל חלון ולא בכל דגימה"""
+        controller = admission.AdmissionController(max_limit=64, min_limit=4, target_latency=0.05, smoothing=1)
+
+        controller.observe_latency(0.5)
+        assert controller.limit == pytest.approx(57.6)
+        for _ in range(57):
+            controller.observe_latency(0.5)
+        assert controller.limit == pytest.approx(57.6)
+
+        for _ in range(42):
+            controller.observe_latency(0.5)
+        assert controller.stats()["limit"] == 51
+
+    def test_parse_route_limits(self):
+        """בדיקת פרסור מגבלות פר נתיב"""
+        assert admission.parse_route_limits("get_artists=8, get_playlists=4") == {"get_artists": 8, "get_playlists": 4}
+        assert admission.parse_route_limits("") == {}
+
+    def test_listener_counts_request_commands_only(self, client):
+        """בדיקה שרק פקודות בזמן בקשה נמדדות"""
+        controller = Mock()
+        listener = admission.DbLatencyListener(controller)
+        event = Mock(request_id=1, duration_micros=2000)
+
+        listener.started(event)
+        listener.succeeded(event)
+        controller.observe_latency.assert_not_called()
+
+        from app import app
+        with app.test_request_context('/api/artists'):
+            listener.started(event)
+            listener.succeeded(event)
+        controller.observe_latency.assert_called_once_with(0.002)
+
+
+class TestLoadShedding:
+    def test_overloaded_returns_503(self, client, mock_db):
+        """בדיקה שבעומס מוחזר 503 עם Retry-After"""
+        controller = admission.AdmissionController(max_limit=1, min_limit=1, queue_timeout=0.01)
+        controller.try_acquire("other")
+
+        with patch('app.admission_controller', controller):
+            response = client.get('/api/artists')
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert response.get_json()["success"] is False
+        mock_db.db.artists.find.assert_not_called()
+
+    def test_health_exempt(self, client, mock_db):
+        """בדיקה שבדיקת הבריאות פטורה מהגבלה"""
+        controller = admission.AdmissionController(max_limit=1, min_limit=1, queue_timeout=0.01)
+        controller.try_acquire("other")
+        mock_db.cx.admin.command.return_value = {"ok": 1}
+
+        with patch('app.admission_controller', controller):
+            response = client.get('/health')
+
+        assert response.status_code == 200
+
+    def test_slot_released_after_request(self, client, mock_db):
+        """בדיקה שהמקום משתחרר בסוף הבקשה"""
+        controller = admission.AdmissionController(max_limit=1, min_limit=1, queue_timeout=0.01)
+        mock_db.db.artists.find.return_value = []
+
+        with patch('app.admission_controller', controller):
+            assert client.get('/api/artists').status_code == 200
+            assert client.get('/api/artists').status_code == 200
+
+        assert controller.stats()["in_flight"] == 0
+
+    def test_batch_charged_once(self, client, mock_db):
+        """בדיקה שאצווה תופסת מקום אחד בלבד"""
+        controller = admission.AdmissionController(max_limit=1, min_limit=1, queue_timeout=0.01)
+        mock_db.db.artists.find.return_value = []
+
+        with patch('app.admission_controller', controller):
+            response = client.post('/api/batch', json=[{"path": "/api/artists"}, {"path": "/api/artists"}])
+
+        assert [r["status"] for r in response.get_json()["responses"]] == [200, 200]
+        assert controller.stats()["in_flight"] == 0
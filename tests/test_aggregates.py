@@ -0,0 +1,164 @@
+import pytest
+from unittest.mock import Mock
+from bson import ObjectId
+
+import aggregates
+from durations import parse_duration
+from tests.conftest import apply_pipeline
+
+
+class TestParseDuration:
+    @pytest.mark.parametrize("value,expected", [
+        ("3:30", 210),
+        ("1:02:03", 3723),
+        ("245", 245),
+        (245, 245),
+        (199.6, 200),
+        (" 4:05 ", 245),
+    ])
+    def test_valid_durations(self, value, expected):
+        """בדיקת פרסור משכים תקינים"""
+        assert parse_duration(value) == expected
+
+    @pytest.mark.parametrize("value", ["invalid", "3:75", "-1", "", None, True, "1:2:3:4", -5,
+                                       "inf", "Infinity", "nan", "1e400", "3:nan", float("inf"), float("nan")])
+    def test_invalid_durations(self, value):
+        """בדיקת משכים לא תקינים"""
+        assert parse_duration(value) is None
+
+
+class TestPlaylistAggregates:
+    def test_add_song_increments_aggregates(self, client, mock_db):
+        """בדיקה שהוספת שיר מעדכנת מונים באופן אטומי"""
+        playlist_id = str(ObjectId())
+        mock_db.db.playlists.update_one.return_value = Mock(matched_count=1)
+
+        client.post(f'/api/playlists/{playlist_id}/songs', json={
+            "artist_id": str(ObjectId()),
+            "artist_name": "עידן רייכל",
+            "title": "מילים",
+            "duration": "4:20"
+        })
+
+        update = mock_db.db.playlists.update_one.call_args[0][1]
+        assert update["$inc"] == {"song_count": 1, "total_duration_seconds": 260, "version": 1}
+
+    def test_remove_song_decrements_aggregates(self, client, mock_db):
+        """בדיקה שהסרת שיר מפחיתה את המונים"""
+        playlist_id = str(ObjectId())
+        mock_db.db.playlists.find_one.return_value = {
+            "_id": ObjectId(playlist_id),
+            "songs": [{"title": "a", "duration": "3:00"}, {"title": "b", "duration": "1:00"}]
+        }
+
+        response = client.delete(f'/api/playlists/{playlist_id}/songs/1')
+
+        assert response.status_code == 200
+        update = mock_db.db.playlists.update_one.call_args_list[0][0][1]
+        # Only the index is sent; the server splices the array
+        assert "title" not in str(update)
+        playlist = apply_pipeline(update, {
+            "songs": [{"title": "a"}, {"title": "b"}], "song_count": 2, "total_duration_seconds": 240, "version": 4
+        })
+        assert playlist == {"songs": [{"title": "a"}], "song_count": 1, "total_duration_seconds": 180, "version": 5}
+
+    def test_get_playlists_summary_excludes_songs(self, client, mock_db):
+        """בדיקה שרשימת סיכום לא מורידה את מערכי השירים"""
+        mock_db.db.playlists.find.return_value = [
+            {"_id": ObjectId(), "name": "x", "song_count": 2, "total_duration_seconds": 300}
+        ]
+
+        response = client.get('/api/playlists?summary=true')
+
+        assert response.status_code == 200
+        assert response.get_json()[0]["song_count"] == 2
+        mock_db.db.playlists.find.assert_called_once_with({}, {"songs": 0})
+
+    def test_recompute_only_updates_drifted_playlists(self):
+        """בדיקה שחישוב מחדש מעדכן רק פלייליסטים שסטו"""
+        db = Mock()
+        drifted_id = ObjectId()
+        db.playlists.find.return_value.batch_size.return_value = [
+            {"_id": ObjectId(), "songs": [{"duration": "1:00"}], "song_count": 1, "total_duration_seconds": 60},
+            {"_id": drifted_id, "songs": [{"duration": "1:00"}, {"duration": "bad"}]},
+        ]
+        db.playlists.bulk_write.return_value = Mock(modified_count=1)
+
+        assert aggregates.recompute_playlist_aggregates(db) == 1
+
+        operations = db.playlists.bulk_write.call_args[0][0]
+        assert len(operations) == 1
+        assert operations[0]._filter == {"_id": drifted_id, "song_count": None, "total_duration_seconds": None}
+        assert operations[0]._doc == {"$set": {"song_count": 2, "total_duration_seconds": 60}}
+
+
+class TestDurationSeconds:
+    def test_add_song_stores_seconds(self, client, mock_db):
+        """בדיקה שמשך השיר נשמר גם בשניות"""
+        mock_db.db.artists.update_one.return_value = Mock(matched_count=1)
+
+        client.post(f'/api/artists/{ObjectId()}/songs', json={"title": "a", "duration": "4:30"})
+
+        song = mock_db.db.artists.update_one.call_args[0][1]["$push"]["songs"]
+        assert song["duration"] == "4:30"
+        assert song["duration_seconds"] == 270
+
+    def test_add_favorite_stores_seconds(self, client, mock_db):
+        """בדיקה שמשך שיר במועדפים נשמר בשניות"""
+        client.post('/api/favorites/songs', json={
+            "artist_id": str(ObjectId()),
+            "artist_name": "a",
+            "title": "b",
+            "duration": 185
+        })
+
+        song = mock_db.db.favorites.update_one.call_args[0][1]["$push"]["songs"]
+        assert song["duration_seconds"] == 185
+
+    def test_unparseable_duration_kept_for_display(self, client, mock_db):
+        """בדיקה שמשך לא תקין נשמר לתצוגה ללא שניות"""
+        mock_db.db.playlists.update_one.return_value = Mock(matched_count=1)
+
+        client.post(f'/api/playlists/{ObjectId()}/songs', json={
+            "artist_id": str(ObjectId()),
+            "artist_name": "a",
+            "title": "b",
+            "duration": "long"
+        })
+
+        update = mock_db.db.playlists.update_one.call_args[0][1]
+        assert update["$push"]["songs"]["duration_seconds"] is None
+        assert update["$inc"]["total_duration_seconds"] == 0
+
+    def test_song_seconds_prefers_stored_value(self):
+        """בדיקה שהחישוב משתמש בשניות השמורות"""
+        assert aggregates.song_seconds({"duration": "9:99", "duration_seconds": 42}) == 42
+        assert aggregates.song_seconds({"duration": "1:00"}) == 60
+
+    def test_backfill_duration_seconds(self):
+        """בדיקת מיגרציה שממלאת שניות במסמכים קיימים"""
+        from durations import backfill_duration_seconds
+
+        db = Mock()
+        doc_id = ObjectId()
+        songs = [{"title": "a", "duration": "2:00"}]
+        for collection, name in ((db.artists, "artists"), (db.playlists, "playlists"), (db.favorites, "favorites")):
+            collection.name = name
+            collection.find.return_value.batch_size.return_value = []
+        db.playlists.find.return_value.batch_size.return_value = [{"_id": doc_id, "songs": songs}]
+        db.playlists.update_one.return_value = Mock(modified_count=1)
+
+        assert backfill_duration_seconds(db) == {"artists": 0, "playlists": 1, "favorites": 0}
+        db.playlists.update_one.assert_called_once_with(
+            {"_id": doc_id, "songs": songs},
+            {"$set": {"songs": [{"title": "a", "duration": "2:00", "duration_seconds": 120}]}}
+        )
+
+    def test_recompute_artist_song_counts(self):
+        """בדיקת חישוב מחדש של מונה השירים לאמנים"""
+        db = Mock()
+        db.artists.update_many.return_value = Mock(modified_count=3)
+
+        assert aggregates.recompute_artist_song_counts(db) == 3
+        query, pipeline = db.artists.update_many.call_args[0]
+        assert pipeline == [{"$set": {"song_count": {"$size": {"$ifNull": ["$songs", []]}}}}]
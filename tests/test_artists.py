@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import Mock
 from bson import ObjectId, errors
+from tests.conftest import apply_pipeline
 
 class TestArtists:
     def test_get_artists_empty(self, client, mock_db):
@@ -43,7 +44,10 @@ class TestArtists:
         assert data["id"] == str(mock_id)
         mock_db.db.artists.insert_one.assert_called_once_with({
             "name": "שלמה ארצי",
-            "songs": []
+            "name_normalized": "שלמה ארצי",
+            "songs": [],
+            "song_count": 0,
+            "version": 0
         })
     
     def test_add_artist_no_name(self, client, mock_db):
@@ -215,4 +219,72 @@ class TestArtistSongs:
         
         assert response.status_code == 500
         assert data["success"] is False
-        assert "error" in data
\ No newline at end of file
+        assert "error" in data
+
+class TestArtistListing:
+    def test_sort_and_paginate(self, client, mock_db):
+        """בדיקת מיון ועימוד בצד השרת"""
+        cursor = mock_db.db.artists.find.return_value
+        cursor.sort.return_value.skip.return_value.limit.return_value = [
+            {"_id": ObjectId(), "name": "a", "song_count": 9}
+        ]
+
+        response = client.get('/api/artists?sort=-song_count&limit=20&offset=40')
+
+        assert response.status_code == 200
+        assert response.get_json()[0]["song_count"] == 9
+        mock_db.db.artists.find.assert_called_once_with({}, None)
+        cursor.sort.assert_called_once_with([("song_count", -1), ("_id", -1)])
+        cursor.sort.return_value.skip.assert_called_once_with(40)
+        cursor.sort.return_value.skip.return_value.limit.assert_called_once_with(20)
+
+    def test_sort_created_uses_id(self, client, mock_db):
+        """בדיקה שמיון לפי יצירה משתמש ב-_id"""
+        mock_db.db.artists.find.return_value.sort.return_value = []
+
+        client.get('/api/artists?sort=created')
+
+        mock_db.db.artists.find.return_value.sort.assert_called_once_with([("_id", 1)])
+
+    def test_paginate_without_sort_orders_by_id(self, client, mock_db):
+        """בדיקה שעימוד בלי מיון מפורש ממוין לפי _id כדי שהעמודים יתאימו"""
+        cursor = mock_db.db.artists.find.return_value
+        cursor.sort.return_value.limit.return_value = []
+
+        assert client.get('/api/artists?limit=10').status_code == 200
+
+        cursor.sort.assert_called_once_with([("_id", 1)])
+
+    def test_filters(self, client, mock_db):
+        """בדיקת סינון לפי תחילית שם ומספר שירים מינימלי"""
+        mock_db.db.artists.find.return_value = []
+
+        response = client.get('/api/artists?name_prefix=Beyoncé&min_songs=3')
+
+        assert response.status_code == 200
+        mock_db.db.artists.find.assert_called_once_with({
+            "name_normalized": {"$regex": "^beyonce"},
+            "song_count": {"$gte": 3}
+        }, None)
+
+    @pytest.mark.parametrize("query", ["sort=popularity", "min_songs=-1", "min_songs=x", "limit=0", "offset=-3",
+                                       "limit=abc", "limit=", "offset=x"])
+    def test_invalid_arguments(self, client, mock_db, query):
+        """בדיקת פרמטרים לא חוקיים"""
+        response = client.get(f'/api/artists?{query}')
+
+        assert response.status_code == 400
+        assert response.get_json()["success"] is False
+        mock_db.db.artists.find.assert_not_called()
+
+    def test_song_count_maintained(self, client, mock_db):
+        """בדיקה שמונה השירים של האמן מתעדכן"""
+        artist_id = str(ObjectId())
+        mock_db.db.artists.update_one.return_value = Mock(matched_count=1)
+        client.post(f'/api/artists/{artist_id}/songs', json={"title": "a", "duration": "3:00"})
+        assert mock_db.db.artists.update_one.call_args[0][1]["$inc"] == {"song_count": 1, "version": 1}
+
+        mock_db.db.artists.find_one.return_value = {"_id": ObjectId(artist_id), "songs": [{"title": "a"}]}
+        client.delete(f'/api/artists/{artist_id}/songs/0')
+        removal = mock_db.db.artists.update_one.call_args_list[1][0][1]
+        assert apply_pipeline(removal, {"songs": [{"title": "a"}], "song_count": 1}) == {"songs": [], "song_count": 0, "version": 1}
@@ -0,0 +1,216 @@
+import pytest
+from unittest.mock import Mock, patch
+from bson import ObjectId
+
+import autocomplete
+
+
+def _change(op, artist_id, doc=None):
+    return {"operationType": op, "documentKey": {"_id": artist_id}, "fullDocument": doc}
+
+
+class TestPrefixTrie:
+    def test_insert_and_prefix_lookup(self):
+        """בדיקת הכנסה וחיפוש לפי תחילית"""
+        trie = autocomplete.PrefixTrie()
+        trie.insert("queen", "a")
+        trie.insert("queens", "b")
+        trie.insert("quiet", "c")
+
+        assert list(trie.iter_prefix("que")) == ["a", "b"]
+        assert list(trie.iter_prefix("x")) == []
+
+    def test_remove(self):
+        """בדיקת הסרת ערך מהעץ"""
+        trie = autocomplete.PrefixTrie()
+        trie.insert("queen", "a")
+        trie.remove("queen", "a")
+        trie.remove("missing", "a")
+
+        assert list(trie.iter_prefix("q")) == []
+
+    def test_remove_prunes_empty_nodes(self):
+        """בדיקה שצמתים שהתרוקנו מפונים ומשמשים שוב, כך שהעץ לא גדל עם החלפות"""
+        trie = autocomplete.PrefixTrie()
+        trie.insert("queen", "a")
+        trie.insert("quiet", "c")
+        nodes = len(trie)
+
+        for i in range(100):
+            trie.insert(f"queens{i}", i)
+            trie.remove(f"queens{i}", i)
+        trie.insert("que", "b")
+        trie.remove("queen", "a")
+
+        assert list(trie.iter_prefix("q")) == ["b", "c"]
+        assert len(trie) == nodes - 2
+        # "s" plus at most two digits; every later key reuses the freed slots
+        assert len(trie._chars) == nodes + 3
+
+    def test_memory_is_reported(self):
+        """בדיקה שצריכת הזיכרון מדווחת"""
+        trie = autocomplete.PrefixTrie()
+        before = trie.memory_bytes()
+        trie.insert("abcdef", "a")
+        assert trie.memory_bytes() > before
+
+
+class TestAutocompleteIndex:
+    def test_apply_changes(self):
+        """בדיקת עדכון האינדקס מאירועי change stream"""
+        index = autocomplete.AutocompleteIndex()
+        artist_id = ObjectId()
+        index.apply_change(_change("insert", artist_id, {
+            "name": "עידן רייכל",
+            "songs": [{"title": "מילים", "duration": "4:20"}]
+        }))
+
+        result = index.search("מי")
+        assert result["songs"] == [{
+            "artist_id": str(artist_id),
+            "artist_name": "עידן רייכל",
+            "title": "מילים",
+            "duration": "4:20"
+        }]
+        assert index.search("עידן")["artists"] == [{"_id": str(artist_id), "name": "עידן רייכל"}]
+
+        index.apply_change(_change("update", artist_id, {"name": "עידן רייכל", "songs": []}))
+        assert index.search("מי")["songs"] == []
+
+        index.apply_change(_change("delete", artist_id))
+        assert index.search("עידן")["artists"] == []
+        assert index.stats()["artists"] == 0
+
+    def test_duration_returned_as_stored(self):
+        """בדיקה שמשך השיר מוחזר כמו שנשמר, כמו בחיפוש דרך Mongo"""
+        index = autocomplete.AutocompleteIndex()
+        index.apply_change(_change("insert", ObjectId(), {
+            "name": "a", "songs": [{"title": "song one"}, {"title": "song two", "duration": "3:00"}]
+        }))
+
+        assert [s["duration"] for s in index.search("song")["songs"]] == [None, "3:00"]
+
+    def test_search_shortest_first_and_limit(self):
+        """בדיקה שהשלמות קצרות מופיעות ראשונות ושהמגבלה נשמרת"""
+        index = autocomplete.AutocompleteIndex()
+        for name in ["Queens of the Stone Age", "Queen", "Queensryche"]:
+            index.apply_change(_change("insert", ObjectId(), {"name": name, "songs": []}))
+
+        result = index.search("QUEEN", limit=2)
+        assert [a["name"] for a in result["artists"]] == ["Queen", "Queensryche"]
+
+    def test_snapshot_roundtrip(self, tmp_path):
+        """בדיקת שמירה וטעינה של snapshot עם resume token"""
+        path = str(tmp_path / "snapshot.json")
+        index = autocomplete.AutocompleteIndex(snapshot_path=path)
+        artist_id = ObjectId()
+        index.apply_change(_change("insert", artist_id, {"name": "Queen", "songs": [{"title": "Bohemian Rhapsody", "duration": "5:55"}]}))
+        index.resume_token = {"_data": "8263"}
+        index.save_snapshot()
+
+        restored = autocomplete.AutocompleteIndex(snapshot_path=path)
+        assert restored.load_snapshot() is True
+        assert restored.resume_token == {"_data": "8263"}
+        assert restored.search("bohem")["songs"][0]["title"] == "Bohemian Rhapsody"
+
+    def test_snapshot_without_token_is_ignored(self, tmp_path):
+        """בדיקה ש-snapshot ללא resume token לא נטען"""
+        index = autocomplete.AutocompleteIndex(snapshot_path=str(tmp_path / "snapshot.json"))
+        index.save_snapshot()
+
+        assert autocomplete.AutocompleteIndex(snapshot_path=index.snapshot_path).load_snapshot() is False
+
+
+class TestSearchWithTrie:
+    def test_search_route_uses_trie_when_ready(self, client, mock_db):
+        """בדיקה שהחיפוש משתמש בעץ כשהוא מוכן"""
+        index = autocomplete.AutocompleteIndex()
+        index.apply_change(_change("insert", ObjectId(), {"name": "Queen", "songs": []}))
+        index.ready = True
+
+        with patch('app.autocomplete_index', index):
+            response = client.get('/api/search?q=que')
+
+        assert response.status_code == 200
+        assert response.get_json()["artists"][0]["name"] == "Queen"
+        mock_db.db.artists.find.assert_not_called()
+
+    def test_search_stats(self, client):
+        """בדיקת נקודת הקצה לסטטיסטיקות החיפוש"""
+        response = client.get('/api/search/stats')
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert data["enabled"] is False
+        assert "memory_bytes" in data
+
+
+class _FakeStream:
+    def __init__(self, index, changes):
+        self._index = index
+        self._changes = list(changes)
+        self.resume_token = {"_data": "0"}
+        self.alive = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        if not self._changes:
+            self._index._stop.set()
+            return None
+        self.resume_token = {"_data": str(len(self._changes))}
+        return self._changes.pop(0)
+
+
+class TestChangeStreamConsumer:
+    def test_initial_build_then_stream(self, tmp_path):
+        """בדיקת בנייה ראשונית וצריכת אירועים מה-change stream"""
+        index = autocomplete.AutocompleteIndex(snapshot_path=str(tmp_path / "snapshot.json"))
+        db = Mock()
+        db.artists.find.return_value.batch_size.return_value = [
+            {"_id": ObjectId(), "name": "Queen", "songs": []}
+        ]
+        new_id = ObjectId()
+        db.artists.watch.return_value = _FakeStream(index, [
+            _change("insert", new_id, {"name": "Queensryche", "songs": []})
+        ])
+
+        index.run(db)
+
+        assert index.ready is True
+        assert [a["name"] for a in index.search("queen")["artists"]] == ["Queen", "Queensryche"]
+        db.artists.watch.assert_called_once_with(full_document="updateLookup", resume_after=None)
+
+        # Restart resumes from the persisted token without rescanning
+        restarted = autocomplete.AutocompleteIndex(snapshot_path=index.snapshot_path)
+        db.reset_mock()
+        db.artists.watch.return_value = _FakeStream(restarted, [])
+        restarted.run(db)
+
+        db.artists.find.assert_not_called()
+        assert db.artists.watch.call_args.kwargs["resume_after"] == index.resume_token
+        assert restarted.stats()["artists"] == 2
+
+    def test_drop_rebuilds_from_scan(self):
+        """בדיקה שמחיקת האוסף מנקה את האינדקס ובונה אותו מחדש במקום להפיל את התהליך"""
+        index = autocomplete.AutocompleteIndex()
+        db = Mock()
+        db.artists.find.return_value.batch_size.side_effect = [
+            [{"_id": ObjectId(), "name": "Queen", "songs": []}],
+            [{"_id": ObjectId(), "name": "Abba", "songs": []}],
+        ]
+        db.artists.watch.side_effect = [
+            _FakeStream(index, [{"operationType": "drop", "ns": {"coll": "artists"}}]),
+            _FakeStream(index, []),
+        ]
+
+        index.run(db)
+
+        assert index.ready is True
+        assert index.search("queen")["artists"] == []
+        assert [a["name"] for a in index.search("abba")["artists"]] == ["Abba"]
+        assert [c.kwargs["resume_after"] for c in db.artists.watch.call_args_list] == [None, None]
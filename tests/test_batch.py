@@ -0,0 +1,91 @@
+import threading
+import pytest
+from unittest.mock import Mock
+from bson import ObjectId
+
+
+class TestBatch:
+    def test_batch_dispatches_sub_requests(self, client, mock_db):
+        """בדיקת הרצת מספר בקשות בבקשה אחת"""
+        playlist_id = ObjectId()
+        mock_db.db.artists.find.return_value = [{"_id": ObjectId(), "name": "a", "songs": []}]
+        mock_db.db.playlists.find_one.return_value = {"_id": playlist_id, "name": "p", "songs": []}
+        mock_db.db.favorites.find_one.return_value = None
+
+        response = client.post('/api/batch', json={"requests": [
+            {"method": "GET", "path": "/api/artists"},
+            {"path": f"/api/playlists/{playlist_id}"},
+            {"path": "/api/favorites"},
+            {"path": "/api/playlists/not-an-id"},
+        ]})
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert data["success"] is True
+        statuses = [r["status"] for r in data["responses"]]
+        assert statuses == [200, 200, 200, 400]
+        assert data["responses"][0]["body"][0]["name"] == "a"
+        assert data["responses"][1]["body"]["_id"] == str(playlist_id)
+        assert data["responses"][2]["body"] == {"songs": []}
+
+    def test_batch_accepts_bare_array_and_writes(self, client, mock_db):
+        """בדיקת מערך ישיר עם פעולות כתיבה"""
+        mock_db.db.artists.insert_one.return_value = Mock(inserted_id=ObjectId())
+
+        response = client.post('/api/batch', json=[
+            {"method": "POST", "path": "/api/artists", "body": {"name": "new"}},
+            {"method": "POST", "path": "/api/artists", "body": {}},
+        ])
+        data = response.get_json()
+
+        assert [r["status"] for r in data["responses"]] == [200, 400]
+        mock_db.db.artists.insert_one.assert_called_once()
+
+    def test_batch_reads_run_concurrently(self, client, mock_db):
+        """בדיקה שקריאות עצמאיות רצות במקביל"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def find(*args, **kwargs):
+            barrier.wait()
+            return []
+        mock_db.db.artists.find.side_effect = find
+        mock_db.db.playlists.find.side_effect = find
+
+        response = client.post('/api/batch', json=[{"path": "/api/artists"}, {"path": "/api/playlists"}])
+
+        assert [r["status"] for r in response.get_json()["responses"]] == [200, 200]
+
+    def test_batch_write_waits_for_earlier_reads(self, client, mock_db):
+        """בדיקה שכתיבה ממתינה לקריאות שלפניה"""
+        calls = []
+        mock_db.db.artists.find.side_effect = lambda *a, **k: calls.append("read") or []
+        mock_db.db.artists.insert_one.side_effect = lambda *a, **k: calls.append("write") or Mock(inserted_id=ObjectId())
+
+        client.post('/api/batch', json=[
+            {"path": "/api/artists"},
+            {"method": "POST", "path": "/api/artists", "body": {"name": "x"}},
+            {"path": "/api/artists"},
+        ])
+
+        assert calls == ["read", "write", "read"]
+
+    def test_unknown_route(self, client, mock_db):
+        """בדיקת נתיב שלא קיים בתוך אצווה"""
+        response = client.post('/api/batch', json=[{"path": "/api/nothing"}])
+
+        assert response.get_json()["responses"][0]["status"] == 404
+
+    @pytest.mark.parametrize("payload", [
+        [],
+        {"requests": "x"},
+        [{"method": "GET"}],
+        [{"path": "/health"}],
+        [{"path": "/api/batch"}],
+        [{"path": "/api/artists"}] * 26,
+    ])
+    def test_invalid_batch(self, client, mock_db, payload):
+        """בדיקת אצווה לא חוקית"""
+        response = client.post('/api/batch', json=payload)
+
+        assert response.status_code == 400
+        assert response.get_json()["success"] is False
@@ -0,0 +1,224 @@
+import pytest
+from unittest.mock import Mock, patch
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import cache
+
+
+class TestReadCache:
+    def test_disabled_always_loads(self):
+        """בדיקה שמטמון כבוי תמיד טוען מהמקור"""
+        read_cache = cache.ReadCache(ttl=0)
+        loader = Mock(return_value=[1])
+
+        read_cache.get_or_load(("artists", None), loader)
+        read_cache.get_or_load(("artists", None), loader)
+
+        assert loader.call_count == 2
+
+    def test_hit_and_invalidate(self):
+        """בדיקת פגיעה במטמון ופינוי לפי מסמך"""
+        read_cache = cache.ReadCache(ttl=60)
+        read_cache.stream_healthy = True
+        read_cache.get_or_load(("playlists", None), lambda: ["list"])
+        read_cache.get_or_load(("playlists", "a"), lambda: {"_id": "a"})
+        read_cache.get_or_load(("playlists", "b"), lambda: {"_id": "b"})
+
+        assert read_cache.get_or_load(("playlists", "a"), lambda: pytest.fail("should hit")) == {"_id": "a"}
+
+        read_cache.invalidate("playlists", "a")
+
+        assert len(read_cache) == 1
+        assert read_cache.get_or_load(("playlists", "b"), lambda: None) == {"_id": "b"}
+
+    def test_none_not_cached(self):
+        """בדיקה שתוצאה ריקה לא נשמרת במטמון"""
+        read_cache = cache.ReadCache(ttl=60)
+        read_cache.get_or_load(("playlists", "x"), lambda: None)
+
+        assert len(read_cache) == 0
+
+    def test_invalidated_during_load_not_stored(self):
+        """בדיקה שערך שנטען לפני כתיבה לא נשמר אחרי שהכתיבה פינתה אותו"""
+        read_cache = cache.ReadCache(ttl=300)
+        read_cache.stream_healthy = True
+
+        def slow_loader():
+            read_cache.invalidate("playlists", "a")
+            return {"name": "before write"}
+
+        assert read_cache.get_or_load(("playlists", "a"), slow_loader) == {"name": "before write"}
+        assert len(read_cache) == 0
+        assert read_cache.get_or_load(("playlists", "a"), lambda: {"name": "after write"}) == {"name": "after write"}
+        assert read_cache.get_or_load(("playlists", "b"), lambda: {"name": "b"}) == {"name": "b"}
+        assert len(read_cache) == 2
+
+    def test_least_recently_used_evicted(self):
+        """בדיקה שהמטמון חסום בגודל ומפנה את מה שלא נקרא הכי הרבה זמן"""
+        read_cache = cache.ReadCache(ttl=60, max_entries=2)
+        read_cache.get_or_load(("artists", "a"), lambda: "a")
+        read_cache.get_or_load(("artists", "b"), lambda: "b")
+        read_cache.get_or_load(("artists", "a"), lambda: pytest.fail("should hit"))
+
+        read_cache.get_or_load(("artists", "c"), lambda: "c")
+
+        assert len(read_cache) == 2
+        assert read_cache.get_or_load(("artists", "a"), lambda: pytest.fail("should hit")) == "a"
+        assert read_cache.get_or_load(("artists", "b"), lambda: "reloaded") == "reloaded"
+
+    def test_expired_entries_swept(self):
+        """בדיקה שרשומות שפג תוקפן מפונות ולא רק נדרסות"""
+        read_cache = cache.ReadCache(ttl=60, fallback_ttl=60)
+        with patch('cache.time.monotonic', return_value=0.0):
+            for i in range(500):
+                read_cache.get_or_load(("artists", None, i), lambda: [])
+        assert len(read_cache) == 500
+
+        with patch('cache.time.monotonic', return_value=61.0):
+            read_cache.get_or_load(("artists", None, "new"), lambda: [])
+
+        assert len(read_cache) == 1
+
+    def test_fallback_ttl_without_stream(self):
+        """בדיקת TTL קצר כשאין change stream"""
+        read_cache = cache.ReadCache(ttl=300, fallback_ttl=5)
+        assert read_cache.current_ttl() == 5
+        read_cache.stream_healthy = True
+        assert read_cache.current_ttl() == 300
+
+
+class TestCacheInvalidator:
+    def test_handle_change_evicts_document(self):
+        """בדיקה שאירוע שינוי מפנה את המסמך מהמטמון"""
+        read_cache = cache.ReadCache(ttl=60)
+        playlist_id = ObjectId()
+        read_cache.get_or_load(("playlists", str(playlist_id)), lambda: {"name": "x"})
+        read_cache.get_or_load(("artists", None), lambda: [])
+
+        cache.CacheInvalidator(read_cache).handle({
+            "operationType": "update",
+            "ns": {"db": "music_db", "coll": "playlists"},
+            "documentKey": {"_id": playlist_id}
+        })
+
+        assert list(read_cache._entries) == [("artists", None)]
+
+    def test_handle_drop_clears(self):
+        """בדיקה שמחיקת אוסף מנקה את כל המטמון"""
+        read_cache = cache.ReadCache(ttl=60)
+        read_cache.get_or_load(("artists", None), lambda: [])
+
+        cache.CacheInvalidator(read_cache).handle({"operationType": "drop", "ns": {"coll": "artists"}})
+
+        assert len(read_cache) == 0
+
+    def test_standalone_falls_back_to_ttl(self):
+        """בדיקה שבשרת ללא replica set המטמון עובר ל-TTL קצר"""
+        read_cache = cache.ReadCache(ttl=60)
+        read_cache.stream_healthy = True
+        read_cache.get_or_load(("artists", None), lambda: [])
+        invalidator = cache.CacheInvalidator(read_cache, retry_interval=0)
+        db = Mock()
+
+        def watch(*args, **kwargs):
+            invalidator._stop.set()
+            raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+        db.watch.side_effect = watch
+
+        invalidator.run(db)
+
+        assert read_cache.stream_healthy is False
+        assert len(read_cache) == 0
+
+    def test_consumer_reopens_closed_stream(self):
+        """בדיקה שהצרכן יוצא מ-stream שנסגר ופותח אותו מחדש במקום להסתובב עליו"""
+        read_cache = cache.ReadCache(ttl=60)
+        invalidator = cache.CacheInvalidator(read_cache)
+        closed, reopened = Mock(alive=False, resume_token={"_data": "1"}), Mock(alive=True)
+        for stream in (closed, reopened):
+            stream.__enter__ = Mock(return_value=stream)
+            stream.__exit__ = Mock(return_value=False)
+        reopened.try_next.side_effect = lambda: invalidator._stop.set()
+        db = Mock()
+        db.watch.side_effect = [closed, reopened]
+
+        invalidator.run(db)
+
+        closed.try_next.assert_not_called()
+        assert db.watch.call_count == 2
+
+    def test_invalidate_event_restarts_without_token(self):
+        """בדיקה שאירוע invalidate מנקה את המטמון ופותח stream חדש בלי resume token"""
+        read_cache = cache.ReadCache(ttl=60)
+        read_cache.get_or_load(("artists", None), lambda: [])
+        invalidator = cache.CacheInvalidator(read_cache)
+        invalidator.resume_token = {"_data": "0"}
+        stream = Mock(alive=True, resume_token={"_data": "1"})
+        stream.__enter__ = Mock(return_value=stream)
+        stream.__exit__ = Mock(return_value=False)
+        stream.try_next.return_value = {"operationType": "invalidate"}
+
+        invalidator._consume(Mock(watch=Mock(return_value=stream)))
+
+        assert invalidator.resume_token is None
+        assert len(read_cache) == 0
+
+
+class TestCachedRoutes:
+    def test_get_playlist_served_from_cache_until_write(self, client, mock_db):
+        """בדיקה שפלייליסט מוגש מהמטמון עד לכתיבה"""
+        read_cache = cache.ReadCache(ttl=60)
+        playlist_id = ObjectId()
+        mock_db.db.playlists.find_one.return_value = {"_id": playlist_id, "name": "x", "songs": []}
+        mock_db.db.playlists.update_one.return_value = Mock(matched_count=1)
+
+        with patch('app.read_cache', read_cache):
+            client.get(f'/api/playlists/{playlist_id}')
+            client.get(f'/api/playlists/{playlist_id}')
+            assert mock_db.db.playlists.find_one.call_count == 1
+
+            client.post(f'/api/playlists/{playlist_id}/songs', json={
+                "artist_id": str(ObjectId()),
+                "artist_name": "Test",
+                "title": "Test",
+                "duration": "3:30"
+            })
+            response = client.get(f'/api/playlists/{playlist_id}')
+
+        assert response.status_code == 200
+        assert response.get_json()["_id"] == str(playlist_id)
+        assert mock_db.db.playlists.find_one.call_count == 2
+
+    def test_upper_case_id_invalidated_by_write(self, client, mock_db):
+        """בדיקה שמזהה באותיות גדולות ממופה לאותו מפתח מטמון שהכתיבה מפנה"""
+        read_cache = cache.ReadCache(ttl=60)
+        playlist_id = ObjectId()
+        mock_db.db.playlists.find_one.return_value = {"_id": playlist_id, "name": "x", "songs": []}
+        mock_db.db.playlists.delete_one.return_value = Mock(deleted_count=1)
+
+        with patch('app.read_cache', read_cache):
+            client.get(f'/api/playlists/{str(playlist_id).upper()}')
+            client.get(f'/api/playlists/{playlist_id}')
+            assert mock_db.db.playlists.find_one.call_count == 1
+
+            client.delete(f'/api/playlists/{str(playlist_id).upper()}')
+
+        assert len(read_cache) == 0
+
+    def test_listing_key_ignores_unknown_params(self, client, mock_db):
+        """בדיקה שפרמטרים לא מוכרים לא יוצרים עותקים נפרדים של הרשימה"""
+        read_cache = cache.ReadCache(ttl=60)
+        mock_db.db.artists.find.return_value = []
+        mock_db.db.playlists.find.return_value = []
+
+        with patch('app.read_cache', read_cache):
+            for i in range(5):
+                assert client.get(f'/api/artists?junk={i}').status_code == 200
+                assert client.get(f'/api/playlists?junk={i}').status_code == 200
+            client.get('/api/artists?min_songs=1&name_prefix=A')
+            client.get('/api/artists?name_prefix=a&min_songs=1&junk=x')
+
+        assert mock_db.db.artists.find.call_count == 2
+        assert mock_db.db.playlists.find.call_count == 1
+        assert len(read_cache) == 3
@@ -0,0 +1,119 @@
+import pytest
+import mongomock
+from unittest.mock import Mock, patch
+from bson import ObjectId
+
+import cascade
+
+
+def _db_with_batches(*batches):
+    db = Mock()
+    cursor = db.playlists.find.return_value.sort.return_value.limit
+    cursor.side_effect = [[{"_id": i} for i in batch] for batch in batches] + [[]]
+    db.playlists.update_many.side_effect = lambda query, update: Mock(modified_count=len(query["_id"]["$in"]))
+    db.favorites.update_many.return_value = Mock(modified_count=1)
+    return db
+
+
+class TestCascadeWorker:
+    def test_run_cleans_in_batches(self):
+        """בדיקת ניקוי הפניות לאמן במנות"""
+        artist_id = str(ObjectId())
+        first, second = [ObjectId(), ObjectId()], [ObjectId()]
+        db = _db_with_batches(first, second)
+        updated = []
+        worker = cascade.CascadeWorker(batch_size=2, pause=0, on_playlists_updated=updated.extend)
+        job = {"id": "1", "artist_id": artist_id, "batches": 0, "playlists_updated": 0, "favorites_updated": 0}
+
+        worker.run(db, job)
+
+        assert job["batches"] == 2
+        assert job["playlists_updated"] == 3
+        assert job["favorites_updated"] == 1
+        assert updated == first + second
+        # Second page resumes after the last _id of the first
+        assert db.playlists.find.call_args_list[1][0][0] == {"songs.artist_id": artist_id, "_id": {"$gt": first[-1]}}
+        pipeline = db.playlists.update_many.call_args[0][1]
+        assert pipeline[0]["$set"]["songs"]["$filter"]["cond"] == {"$ne": ["$$this.artist_id", artist_id]}
+        db.favorites.update_many.assert_called_once_with(
+            {"songs.artist_id": artist_id},
+            {"$pull": {"songs": {"artist_id": artist_id}}}
+        )
+
+    def test_enqueue_tracks_progress(self):
+        """בדיקת מעקב אחר התקדמות משימה ברקע"""
+        worker = cascade.CascadeWorker(pause=0)
+        job_id = worker.enqueue(_db_with_batches([ObjectId()]), "a1")
+        worker.join()
+
+        job = worker.get(job_id)
+        assert job["state"] == "done"
+        assert job["playlists_updated"] == 1
+
+    def test_failed_job_reports_error(self):
+        """בדיקה שמשימה שנכשלה מדווחת שגיאה"""
+        db = Mock()
+        db.playlists.find.side_effect = Exception("DB Error")
+        worker = cascade.CascadeWorker(pause=0)
+        job_id = worker.enqueue(db, "a1")
+        worker.join()
+
+        assert worker.get(job_id)["state"] == "failed"
+        assert worker.get(job_id)["error"] == "DB Error"
+
+    def test_job_ids_unique_across_workers(self):
+        """בדיקה שמזהי משימות לא מתנגשים בין שרתים"""
+        first, second = cascade.CascadeWorker(), cascade.CascadeWorker()
+
+        ids = {first.record_done("a1", 0, 0), second.record_done("a1", 0, 0), first.record_done("a2", 0, 0)}
+
+        assert len(ids) == 3
+        assert all(ObjectId.is_valid(job_id) for job_id in ids)
+
+    def test_sweep_finds_artists_left_behind(self):
+        """בדיקה שסריקה מוצאת אמנים שנמחקו ששיריהם עדיין ברשימות"""
+        db = mongomock.MongoClient().db
+        kept, deleted, deleted_favorite = ObjectId(), ObjectId(), ObjectId()
+        db.artists.insert_one({"_id": kept, "name": "kept"})
+        db.playlists.insert_one({"songs": [{"artist_id": str(kept)}, {"artist_id": str(deleted)}, {"artist_id": "legacy"}]})
+        db.favorites.insert_one({"songs": [{"artist_id": str(deleted_favorite)}]})
+
+        assert cascade.orphaned_artist_ids(db) == sorted([str(deleted), str(deleted_favorite)])
+
+        worker = cascade.CascadeWorker(pause=0)
+        with patch.object(worker, "enqueue", side_effect=lambda db, artist_id: artist_id) as enqueue:
+            assert len(worker.sweep(db)) == 2
+        assert {c.args[1] for c in enqueue.call_args_list} == {str(deleted), str(deleted_favorite)}
+
+
+class TestCascadeRoutes:
+    def test_delete_artist_enqueues_cleanup(self, client, mock_db):
+        """בדיקה שמחיקת אמן מתזמנת ניקוי ברקע"""
+        artist_id = str(ObjectId())
+        mock_db.db.artists.delete_one.return_value = Mock(deleted_count=1)
+        worker = Mock()
+        worker.enqueue.return_value = "7"
+
+        with patch('app.cascade_worker', worker):
+            response = client.delete(f'/api/artists/{artist_id}')
+
+        assert response.get_json() == {"success": True, "cleanup_job": "7"}
+        worker.enqueue.assert_called_once_with(mock_db.db, artist_id)
+
+    def test_get_job(self, client):
+        """בדיקת קבלת סטטוס משימה"""
+        worker = Mock()
+        worker.get.return_value = {"id": "7", "state": "running"}
+
+        with patch('app.cascade_worker', worker):
+            response = client.get('/api/jobs/7')
+
+        assert response.status_code == 200
+        assert response.get_json()["state"] == "running"
+
+    def test_get_job_not_found(self, client):
+        """בדיקת משימה שלא קיימת"""
+        response = client.get('/api/jobs/does-not-exist')
+
+        assert response.status_code == 404
+        assert response.get_json()["success"] is False
@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import Mock
+from bson import ObjectId
+
+
+class TestExpandArtists:
+    def test_playlist_expand_artists_single_query(self, client, mock_db):
+        """בדיקה שהרחבת אמנים מתבצעת בשאילתה אחת"""
+        first, second = ObjectId(), ObjectId()
+        mock_db.db.playlists.find_one.return_value = {
+            "_id": ObjectId(),
+            "name": "p",
+            "songs": [
+                {"artist_id": str(first), "title": "a"},
+                {"artist_id": str(second), "title": "b"},
+                {"artist_id": str(first), "title": "c"},
+                {"artist_id": "legacy-id", "title": "d"},
+            ]
+        }
+        mock_db.db.artists.find.return_value = [
+            {"_id": first, "name": "עידן רייכל", "song_count": 3},
+            {"_id": second, "name": "שלמה ארצי", "song_count": 1},
+        ]
+
+        response = client.get(f'/api/playlists/{ObjectId()}?expand=artists')
+        songs = response.get_json()["songs"]
+
+        assert response.status_code == 200
+        mock_db.db.artists.find.assert_called_once_with(
+            {"_id": {"$in": [first, second]}}, {"name": 1, "song_count": 1}
+        )
+        assert songs[0]["artist"] == {"_id": str(first), "name": "עידן רייכל", "song_count": 3}
+        assert songs[2]["artist"]["name"] == "עידן רייכל"
+        assert songs[3]["artist"] is None
+
+    def test_playlist_without_expand_does_not_query_artists(self, client, mock_db):
+        """בדיקה שללא הרחבה אין שאילתת אמנים"""
+        mock_db.db.playlists.find_one.return_value = {"_id": ObjectId(), "songs": [{"artist_id": str(ObjectId())}]}
+
+        response = client.get(f'/api/playlists/{ObjectId()}')
+
+        assert "artist" not in response.get_json()["songs"][0]
+        mock_db.db.artists.find.assert_not_called()
+
+    def test_favorites_expand_artists(self, client, mock_db):
+        """בדיקת הרחבת אמנים במועדפים"""
+        artist_id = ObjectId()
+        mock_db.db.favorites.find_one.return_value = {
+            "_id": ObjectId(),
+            "type": "user_favorites",
+            "songs": [{"artist_id": str(artist_id), "title": "a"}]
+        }
+        mock_db.db.artists.find.return_value = [{"_id": artist_id, "name": "x", "song_count": 1}]
+
+        response = client.get('/api/favorites?expand=artists')
+
+        assert response.get_json()["songs"][0]["artist"]["name"] == "x"
+
+    def test_favorites_expand_empty(self, client, mock_db):
+        """בדיקת הרחבה כשאין מועדפים"""
+        mock_db.db.favorites.find_one.return_value = None
+
+        response = client.get('/api/favorites?expand=artists')
+
+        assert response.get_json() == {"songs": []}
+        mock_db.db.artists.find.assert_not_called()
+
+    def test_unsupported_expand(self, client, mock_db):
+        """בדיקת ערך הרחבה לא נתמך"""
+        response = client.get(f'/api/playlists/{ObjectId()}?expand=owners')
+
+        assert response.status_code == 400
+        assert "owners" in response.get_json()["error"]
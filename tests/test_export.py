@@ -0,0 +1,140 @@
+import gzip
+import json
+import pytest
+import mongomock
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+
+import export
+from app import app
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient().db
+    db.artists.insert_many([{"_id": ObjectId(), "name": f"artist {i}", "songs": [{"title": "t"}]} for i in range(50)])
+    db.playlists.insert_one({"name": "p", "songs": []})
+    return db
+
+
+def _lines(data):
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+
+class TestExportHelpers:
+    def test_ndjson_in_id_order(self, db):
+        """בדיקה שהייצוא מחזיר שורת JSON לכל מסמך לפי סדר _id"""
+        data = b"".join(export.stream_collection(db, "artists", batch_size=7))
+
+        lines = _lines(data)
+        assert len(lines) == 50
+        ids = [line["_id"]["$oid"] for line in lines]
+        assert ids == sorted(ids)
+
+    def test_resume_after_id(self, db):
+        """בדיקה שהמשך ייצוא מתחיל אחרי ה-_id האחרון"""
+        ids = [doc["_id"] for doc in db.artists.find(sort=[("_id", 1)])]
+
+        lines = _lines(b"".join(export.stream_collection(db, "artists", after=str(ids[19]))))
+
+        assert [line["_id"]["$oid"] for line in lines] == [str(i) for i in ids[20:]]
+
+    def test_gzip_stream_in_chunks(self, db):
+        """בדיקה שהדחיסה מחזירה gzip תקין במספר חלקים"""
+        chunks = list(export.iter_ndjson(db.artists.find(), compress=True, chunk_size=100))
+
+        assert len(chunks) > 1
+        assert len(_lines(gzip.decompress(b"".join(chunks)))) == 50
+
+    def test_empty_collection(self, db):
+        """בדיקה שאוסף ריק מחזיר זרם ריק"""
+        assert b"".join(export.stream_collection(db, "favorites")) == b""
+        assert gzip.decompress(b"".join(export.stream_collection(db, "favorites", compress=True))) == b""
+
+    def test_snapshot_session_used_for_reads(self):
+        """בדיקה שייצוא עם snapshot קורא דרך session אחד"""
+        db = MagicMock()
+        session = db.client.start_session.return_value.__enter__.return_value
+        db.__getitem__.return_value.find.return_value = []
+
+        list(export.stream_collection(db, "artists", snapshot=True))
+
+        db.client.start_session.assert_called_once_with(snapshot=True)
+        assert db.__getitem__.return_value.find.call_args[1]["session"] is session
+
+    def test_export_to_directory(self, db, tmp_path):
+        """בדיקה שייצוא לתיקייה כותב קובץ לכל אוסף"""
+        paths = export.export_to_directory(db, str(tmp_path), compress=True)
+
+        assert [p.rsplit("/", 1)[1] for p in paths] == ["artists.ndjson.gz", "playlists.ndjson.gz", "favorites.ndjson.gz"]
+        with gzip.open(paths[1]) as f:
+            assert _lines(f.read())[0]["name"] == "p"
+
+
+class TestExportRoute:
+    @pytest.fixture
+    def mongo_db(self, db):
+        with patch('app.mongo') as mock_mongo:
+            mock_mongo.db = db
+            yield db
+
+    def test_export_route(self, client, mongo_db):
+        """בדיקת נקודת הקצה לייצוא"""
+        response = client.get('/api/export/artists?batch_size=10')
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert len(_lines(response.data)) == 50
+
+    def test_export_route_gzip(self, client, mongo_db):
+        """בדיקת ייצוא דחוס"""
+        response = client.get('/api/export/playlists?compress=gzip')
+
+        assert response.mimetype == "application/gzip"
+        assert "playlists.ndjson.gz" in response.headers["Content-Disposition"]
+        assert _lines(gzip.decompress(response.data))[0]["name"] == "p"
+
+    @pytest.mark.parametrize("url,status", [
+        ('/api/export/users', 404),
+        ('/api/export/artists?after=nope', 400),
+        ('/api/export/artists?batch_size=0', 400),
+        ('/api/export/artists?compress=zip', 400),
+    ])
+    def test_export_invalid_arguments(self, client, mock_db, url, status):
+        """בדיקת פרמטרים לא חוקיים"""
+        response = client.get(url)
+
+        assert response.status_code == status
+        assert response.get_json()["success"] is False
+
+    def test_export_query_error(self, client, mock_db):
+        """בדיקה ששגיאת שאילתה מחזירה 500 לפני תחילת הזרם"""
+        mock_db.db.__getitem__ = MagicMock(side_effect=Exception("Database error"))
+
+        response = client.get('/api/export/artists')
+
+        assert response.status_code == 500
+        assert "Database error" in response.get_json()["error"]
+
+    def test_export_cli(self, mongo_db, tmp_path):
+        """בדיקת פקודת הייצוא"""
+        result = app.test_cli_runner().invoke(args=["export-data", str(tmp_path)])
+
+        assert result.exit_code == 0
+        assert (tmp_path / "artists.ndjson").exists()
+
+    def test_export_cli_after(self, mongo_db, tmp_path):
+        """בדיקה שהמשך ייצוא מדלג על מסמכים שכבר נכתבו"""
+        ids = sorted(doc["_id"] for doc in mongo_db.artists.find())
+
+        result = app.test_cli_runner().invoke(args=["export-data", str(tmp_path), "--after", str(ids[39])])
+
+        assert result.exit_code == 0
+        assert [doc["_id"]["$oid"] for doc in _lines((tmp_path / "artists.ndjson").read_bytes())] == [str(i) for i in ids[40:]]
+
+    def test_export_cli_invalid_after(self, mongo_db, tmp_path):
+        """בדיקה שמזהה לא חוקי נדחה"""
+        result = app.test_cli_runner().invoke(args=["export-data", str(tmp_path), "--after", "xyz"])
+
+        assert result.exit_code != 0
+        assert not (tmp_path / "artists.ndjson").exists()
@@ -0,0 +1,186 @@
+import pytest
+import mongomock
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from bson import ObjectId
+
+import idempotency
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().db
+
+
+@pytest.fixture
+def store(db):
+    return idempotency.IdempotencyStore(lambda: db.idempotency_keys)
+
+
+class TestIdempotencyStore:
+    def test_first_request_owns_key(self, store, db):
+        """בדיקה שהבקשה הראשונה תופסת את המפתח"""
+        assert store.begin("k", "fp") is None
+        assert db.idempotency_keys.find_one({"_id": "k"})["status"] == idempotency.IN_PROGRESS
+
+    def test_retry_gets_stored_response(self, store):
+        """בדיקה שניסיון חוזר מקבל את התשובה השמורה"""
+        store.begin("k", "fp")
+        store.complete("k", 200, '{"id": "1"}', "application/json")
+
+        record = store.begin("k", "fp")
+        assert record["status"] == idempotency.COMPLETED
+        assert record["response"]["body"] == '{"id": "1"}'
+
+    def test_stale_claim_taken_over(self, store, db):
+        """בדיקה שתפיסה ישנה של תהליך שקרס משתחררת"""
+        db.idempotency_keys.insert_one({
+            "_id": "k", "fingerprint": "fp", "status": idempotency.IN_PROGRESS,
+            "created_at": datetime.now(timezone.utc) - timedelta(minutes=5)
+        })
+
+        assert store.begin("k", "fp") is None
+
+    def test_abandon_releases_key(self, store):
+        """בדיקה ששחרור מפתח מאפשר הרצה מחדש"""
+        store.begin("k", "fp")
+        store.abandon("k")
+
+        assert store.begin("k", "fp") is None
+
+    def test_keys_scoped_per_client(self):
+        """בדיקה שאותו מפתח אצל לקוחות שונים לא מתנגש"""
+        assert idempotency.record_id("ip:1.2.3.4", "abc") != idempotency.record_id("ip:5.6.7.8", "abc")
+
+    def test_ttl_index(self, db):
+        """בדיקת יצירת אינדקס TTL"""
+        idempotency.ensure_idempotency_indexes(db, 3600)
+
+        assert db.idempotency_keys.index_information()["created_at_ttl"]["expireAfterSeconds"] == 3600
+
+
+class TestMemoryIdempotencyStore:
+    def test_claim_replay_and_abandon(self):
+        """בדיקת תפיסה, החזרת תשובה שמורה ושחרור במאגר שבזיכרון"""
+        store = idempotency.MemoryIdempotencyStore(3600)
+
+        assert store.begin("k", "fp") is None
+        assert store.begin("k", "fp")["status"] == idempotency.IN_PROGRESS
+        store.complete("k", 200, '{"id": "1"}', "application/json")
+        assert store.begin("k", "other")["response"]["body"] == '{"id": "1"}'
+
+        store.begin("j", "fp")
+        store.abandon("j")
+        assert store.begin("j", "fp") is None
+
+    def test_stale_claim_and_expiry(self):
+        """בדיקה שתפיסה ישנה משתחררת ושרשומות פגות אחרי ה-TTL"""
+        store = idempotency.MemoryIdempotencyStore(3600, lock_timeout=60)
+        store.begin("k", "fp")
+        store.begin("done", "fp")
+        store.complete("done", 200, "{}", "application/json")
+
+        later = datetime.now(timezone.utc) + timedelta(minutes=5)
+        with patch("idempotency.datetime") as clock:
+            clock.now.return_value = later
+            assert store.begin("k", "fp") is None
+            assert store.begin("done", "fp")["status"] == idempotency.COMPLETED
+            clock.now.return_value = later + timedelta(hours=2)
+            assert store.begin("done", "fp") is None
+
+
+class TestIdempotentRoutes:
+    @pytest.fixture
+    def mongo_db(self, db):
+        with patch('app.mongo') as mock_mongo:
+            mock_mongo.db = db
+            yield db
+
+    def test_retry_does_not_create_duplicate(self, client, mongo_db):
+        """בדיקה שניסיון חוזר לא יוצר אמן כפול"""
+        headers = {"Idempotency-Key": "create-1"}
+        first = client.post('/api/artists', json={"name": "Queen"}, headers=headers)
+        second = client.post('/api/artists', json={"name": "Queen"}, headers=headers)
+
+        assert first.status_code == second.status_code == 200
+        assert second.get_json()["id"] == first.get_json()["id"]
+        assert second.headers["Idempotent-Replayed"] == "true"
+        assert mongo_db.artists.count_documents({}) == 1
+
+    def test_key_reused_with_different_body(self, client, mongo_db):
+        """בדיקה ששימוש חוזר במפתח עם גוף אחר נדחה"""
+        headers = {"Idempotency-Key": "create-1"}
+        client.post('/api/playlists', json={"name": "a"}, headers=headers)
+        response = client.post('/api/playlists', json={"name": "b"}, headers=headers)
+
+        assert response.status_code == 422
+        assert mongo_db.playlists.count_documents({}) == 1
+
+    def test_batch_keys_scoped_to_batch_caller(self, client, mongo_db):
+        """בדיקה שאותו מפתח ב-batch משני לקוחות שונים לא מתנגש"""
+        sub = {"method": "POST", "path": "/api/artists", "body": {"name": "Queen"}, "headers": {"Idempotency-Key": "k"}}
+
+        first = client.post('/api/batch', json=[sub], environ_base={"REMOTE_ADDR": "10.0.0.1"})
+        second = client.post('/api/batch', json=[sub], environ_base={"REMOTE_ADDR": "10.0.0.2"})
+        retry = client.post('/api/batch', json=[sub], environ_base={"REMOTE_ADDR": "10.0.0.1"})
+
+        ids = [r.get_json()["responses"][0]["body"]["id"] for r in (first, second, retry)]
+        assert ids[0] != ids[1]
+        assert ids[2] == ids[0]
+        assert mongo_db.artists.count_documents({}) == 2
+
+    def test_request_in_progress(self, client, mongo_db):
+        """בדיקה שבקשה מקבילה עם אותו מפתח מקבלת 409"""
+        body = b'{"name": "Queen"}'
+        client_id = "ip:127.0.0.1"
+        mongo_db.idempotency_keys.insert_one({
+            "_id": idempotency.record_id(client_id, "k"),
+            "fingerprint": idempotency.fingerprint("POST", "/api/artists", body),
+            "status": idempotency.IN_PROGRESS,
+            "created_at": datetime.now(timezone.utc)
+        })
+
+        response = client.post('/api/artists', data=body, content_type="application/json",
+                               headers={"Idempotency-Key": "k"})
+
+        assert response.status_code == 409
+        assert mongo_db.artists.count_documents({}) == 0
+
+    def test_not_found_is_replayed(self, client, mongo_db):
+        """בדיקה שתשובת 404 נשמרת ומוחזרת"""
+        headers = {"Idempotency-Key": "append-1"}
+        song = {"artist_id": "a", "artist_name": "A", "title": "t", "duration": "3:00"}
+        playlist_id = ObjectId()
+        client.post(f'/api/playlists/{playlist_id}/songs', json=song, headers=headers)
+        response = client.post(f'/api/playlists/{playlist_id}/songs', json=song, headers=headers)
+
+        assert response.status_code == 404
+        assert response.headers["Idempotent-Replayed"] == "true"
+
+    def test_server_error_not_stored(self, client, mock_db):
+        """בדיקה ששגיאת שרת לא נשמרת וניסיון חוזר רץ שוב"""
+        mock_db.db.artists.update_one.side_effect = Exception("Database error")
+        mock_db.db.idempotency_keys.find_one.return_value = None
+
+        response = client.post(f'/api/artists/{ObjectId()}/songs', json={"title": "t", "duration": "3:00"},
+                               headers={"Idempotency-Key": "k"})
+
+        assert response.status_code == 500
+        mock_db.db.idempotency_keys.delete_one.assert_called_once()
+        mock_db.db.idempotency_keys.update_one.assert_not_called()
+
+    def test_invalid_key(self, client, mock_db):
+        """בדיקה שמפתח ארוך מדי נדחה"""
+        response = client.post('/api/artists', json={"name": "Queen"}, headers={"Idempotency-Key": "x" * 300})
+
+        assert response.status_code == 400
+        mock_db.db.artists.insert_one.assert_not_called()
+
+    def test_without_header_no_store_access(self, client, mock_db):
+        """בדיקה שבלי הכותרת אין גישה לאוסף המפתחות"""
+        mock_db.db.artists.insert_one.return_value.inserted_id = ObjectId()
+
+        response = client.post('/api/artists', json={"name": "Queen"})
+
+        assert response.status_code == 200
+        mock_db.db.idempotency_keys.insert_one.assert_not_called()
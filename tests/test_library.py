@@ -0,0 +1,77 @@
+import threading
+import pytest
+from unittest.mock import Mock
+from bson import ObjectId
+
+
+class TestLibrary:
+    def test_library_combines_sections(self, client, mock_db):
+        """בדיקת איחוד אמנים, פלייליסטים ומועדפים בתגובה אחת"""
+        artist_id, playlist_id = ObjectId(), ObjectId()
+        mock_db.db.artists.find.return_value.sort.return_value.limit.return_value = [
+            {"_id": artist_id, "name": "a", "song_count": 2}
+        ]
+        mock_db.db.playlists.find.return_value.sort.return_value.skip.return_value.limit.return_value = [
+            {"_id": playlist_id, "name": "p", "song_count": 1, "total_duration_seconds": 200}
+        ]
+        mock_db.db.favorites.find_one.return_value = {"_id": ObjectId(), "songs": [{"title": "s"}]}
+
+        response = client.get('/api/library?limit=10')
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert data["artists"] == [{"_id": str(artist_id), "name": "a", "song_count": 2}]
+        assert data["playlists"][0]["_id"] == str(playlist_id)
+        assert data["favorites"]["songs"] == [{"title": "s"}]
+        mock_db.db.artists.find.assert_called_once_with({}, {"name": 1, "song_count": 1})
+        mock_db.db.playlists.find.assert_called_once_with({}, {"songs": 0})
+        mock_db.db.favorites.find_one.assert_called_once_with(
+            {"type": "user_favorites"}, {"songs": {"$slice": [0, 10]}}
+        )
+
+    def test_library_queries_run_concurrently(self, client, mock_db):
+        """בדיקה ששלוש השאילתות רצות במקביל"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def wait(result):
+            def query(*args, **kwargs):
+                barrier.wait()
+                return result
+            return query
+        mock_db.db.artists.find.return_value.sort.return_value.limit.side_effect = wait([])
+        mock_db.db.playlists.find.return_value.sort.return_value.skip.return_value.limit.side_effect = wait([])
+        mock_db.db.favorites.find_one.side_effect = wait(None)
+
+        response = client.get('/api/library')
+
+        assert response.status_code == 200
+        assert response.get_json()["favorites"] == {"songs": []}
+
+    def test_library_invalid_limit(self, client, mock_db):
+        """בדיקת מגבלה לא חוקית"""
+        response = client.get('/api/library?limit=1000')
+
+        assert response.status_code == 400
+
+    def test_library_db_error(self, client, mock_db):
+        """בדיקת שגיאת דאטהבייס באחת השאילתות"""
+        mock_db.db.favorites.find_one.side_effect = Exception("DB Error")
+
+        response = client.get('/api/library')
+
+        assert response.status_code == 500
+        assert response.get_json()["success"] is False
+
+
+class TestPlaylistPagination:
+    def test_get_playlists_paginated(self, client, mock_db):
+        """בדיקת עימוד ברשימת הפלייליסטים"""
+        cursor = mock_db.db.playlists.find.return_value
+        cursor.sort.return_value.skip.return_value.limit.return_value = []
+
+        response = client.get('/api/playlists?limit=5&offset=10')
+
+        assert response.status_code == 200
+        cursor.sort.assert_called_once_with("_id", 1)
+        cursor.sort.return_value.skip.assert_called_once_with(10)
+        cursor.sort.return_value.skip.return_value.limit.assert_called_once_with(5)
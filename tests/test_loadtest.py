@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import patch
+
+import storage
+from app import app
+from benchmarks import loadtest
+
+
+class TestLoadTest:
+    def test_percentile(self):
+        """בדיקת חישוב אחוזונים"""
+        values = list(range(1, 101))
+
+        assert loadtest.percentile(values, 0.50) == 50
+        assert loadtest.percentile(values, 0.99) == 99
+        assert loadtest.percentile([], 0.5) is None
+
+    def test_compare_flags_regressions(self):
+        """בדיקה שהשוואה לבסיס מזהה האטה"""
+        baseline = {"GET /api/favorites": {"p95_ms": 10, "throughput": 100, "errors": 0}}
+        current = {"GET /api/favorites": {"p95_ms": 13, "throughput": 70, "errors": 0}}
+
+        regressions = loadtest.compare(current, baseline, 0.2)
+
+        assert len(regressions) == 2
+        assert loadtest.compare(current, baseline, 0.5) == []
+
+    def test_in_process_run(self):
+        """בדיקת הרצה קצרה של כל הנתיבים מול אחסון בזיכרון"""
+        with patch('app.store', storage.MemoryStorage()):
+            results, elapsed = loadtest.run(lambda: loadtest.InProcessClient(app), loadtest.WORKLOAD,
+                                            concurrency=4, total_requests=400)
+
+        summary = loadtest.summarize(results, elapsed)
+        assert sum(s["requests"] for s in summary.values()) <= 400
+        assert all(s["errors"] == 0 for s in summary.values())
+        assert summary["GET /api/playlists/<id>"]["p50_ms"] > 0
+
+    def test_requires_stop_condition(self):
+        """בדיקה שחובה להגדיר מספר בקשות או משך"""
+        with patch('app.store', storage.MemoryStorage()):
+            with pytest.raises(ValueError):
+                loadtest.run(lambda: loadtest.InProcessClient(app))
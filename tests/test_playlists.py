@@ -34,7 +34,10 @@ class TestPlaylists:
         mock_db.db.playlists.insert_one.assert_called_once_with({
             "name": "שירי קיץ",
             "description": "השירים הכי טובים לקיץ",
-            "songs": []
+            "songs": [],
+            "song_count": 0,
+            "total_duration_seconds": 0,
+            "version": 0
         })
     
     def test_create_playlist_no_name(self, client, mock_db):
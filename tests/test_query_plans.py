@@ -0,0 +1,219 @@
+"""
+Query-plan regression tests.
+
+Every route is run against a real mongod loaded with a seeded catalog.
+Each query and write it issues is captured and explained with
+executionStats. The test fails when a filtered query uses a COLLSCAN, or
+when it examines more than QUERY_PLAN_MAX_EXAMINED_RATIO documents per
+document returned or written. Unfiltered scans (listings, exports) are
+allowed; they can't use an index.
+
+    MONGO_TEST_URI=mongodb://localhost:27017 pytest tests/test_query_plans.py
+
+Skipped when MONGO_TEST_URI is not set. A throwaway database is created and
+dropped for each run.
+"""
+import copy
+import os
+import random
+import threading
+import pytest
+from unittest.mock import patch
+from pymongo import MongoClient, monitoring
+
+from app import app
+import app as app_module
+from benchmarks import seed
+
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI")
+MAX_EXAMINED_RATIO = float(os.getenv("QUERY_PLAN_MAX_EXAMINED_RATIO", "5"))
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Fields a driver adds that explain rejects or doesn't need
+DRIVER_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "writeConcern", "readConcern"}
+
+
+class CommandRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE_COMMANDS:
+            with self._lock:
+                self.commands.append(copy.deepcopy(dict(event.command)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def take(self):
+        with self._lock:
+            commands, self.commands = self.commands, []
+        return commands
+
+
+def explainable(command):
+    """Split a captured command into explainable single-statement commands."""
+    command = {k: v for k, v in command.items() if not k.startswith("$") and k not in DRIVER_FIELDS}
+    for key in ("updates", "deletes"):
+        if key in command:
+            return [dict(command, **{key: [statement]}) for statement in command[key]]
+    return [command]
+
+
+def command_filter(command):
+    name = next(iter(command))
+    if name == "find":
+        return command.get("filter") or {}
+    if name == "aggregate":
+        first = (command.get("pipeline") or [{}])[0]
+        return first.get("$match") or {}
+    if name in ("update", "delete"):
+        return command[name + "s"][0].get("q") or {}
+    return command.get("query") or {}
+
+
+def _values(doc, key):
+    """Every value stored under ``key`` anywhere in a nested explain document."""
+    if isinstance(doc, dict):
+        for k, v in doc.items():
+            if k == key:
+                yield v
+            yield from _values(v, key)
+    elif isinstance(doc, list):
+        for item in doc:
+            yield from _values(item, key)
+
+
+def plan_stages(explain):
+    return {stage for plan in _values(explain, "winningPlan") for stage in _values(plan, "stage")}
+
+
+def examined_ratio(explain):
+    worst = 0
+    for stats in _values(explain, "executionStats"):
+        root = stats.get("executionStages", {})
+        produced = max(stats.get("nReturned", 0), root.get("nMatched", 0), root.get("nWouldDelete", 0), 1)
+        worst = max(worst, stats.get("totalDocsExamined", 0) / produced)
+    return worst
+
+
+def plan_violations(command, explain, max_ratio=MAX_EXAMINED_RATIO):
+    violations = []
+    if "COLLSCAN" in plan_stages(explain) and command_filter(command):
+        violations.append(f"COLLSCAN for filter {command_filter(command)}")
+    ratio = examined_ratio(explain)
+    if ratio > max_ratio:
+        violations.append(f"examined {ratio:.1f} documents per result (max {max_ratio})")
+    return violations
+
+
+class TestPlanAnalysis:
+    def test_explainable_splits_bulk_updates(self):
+        """בדיקה שעדכון מרובה מתפצל לפקודות explain נפרדות"""
+        command = {"update": "playlists", "updates": [{"q": {"_id": 1}}, {"q": {"_id": 2}}],
+                   "ordered": True, "lsid": {}, "$db": "music"}
+
+        parts = explainable(command)
+
+        assert [p["updates"][0]["q"] for p in parts] == [{"_id": 1}, {"_id": 2}]
+        assert "lsid" not in parts[0] and "$db" not in parts[0]
+
+    def test_collscan_on_filter_flagged(self):
+        """בדיקה ש-COLLSCAN עם סינון מזוהה"""
+        explain = {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}},
+                   "executionStats": {"nReturned": 1, "totalDocsExamined": 1}}
+
+        assert plan_violations({"find": "favorites", "filter": {"type": "user_favorites"}}, explain)
+        assert plan_violations({"find": "artists", "filter": {}}, explain) == []
+
+    def test_examined_ratio_flagged(self):
+        """בדיקה שסריקת יותר מדי מסמכים מזוהה"""
+        explain = {"stages": [{"$cursor": {
+            "queryPlanner": {"winningPlan": {"queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}},
+            "executionStats": {"nReturned": 2, "totalDocsExamined": 50},
+        }}]}
+
+        assert plan_stages(explain) == {"FETCH", "IXSCAN"}
+        assert plan_violations({"aggregate": "artists", "pipeline": [{"$match": {"x": 1}}]}, explain)
+
+    def test_write_counts_matched_documents(self):
+        """בדיקה שבכתיבה נספרים המסמכים שעודכנו"""
+        explain = {"queryPlanner": {"winningPlan": {"stage": "UPDATE", "inputStage": {"stage": "IXSCAN"}}},
+                   "executionStats": {"nReturned": 0, "totalDocsExamined": 40,
+                                      "executionStages": {"stage": "UPDATE", "nMatched": 40}}}
+
+        assert examined_ratio(explain) == 1
+
+
+def _song(catalog, artist_index=0):
+    reference = catalog.song_reference(random.Random(artist_index))
+    return dict(reference, title=reference["title"] + " plan")
+
+
+ROUTES = {
+    "list artists": lambda c: ("GET", "/api/artists?limit=50", None),
+    "artists by name": lambda c: ("GET", "/api/artists?sort=name&limit=20", None),
+    "artists by song count": lambda c: ("GET", "/api/artists?sort=-song_count&limit=20", None),
+    "artists min songs": lambda c: ("GET", "/api/artists?min_songs=30&sort=song_count&limit=20", None),
+    "artists name prefix": lambda c: ("GET", f"/api/artists?name_prefix={c.artist_name(5)[:6]}&limit=20", None),
+    "add artist": lambda c: ("POST", "/api/artists", {"name": "Plan Test"}),
+    "add song": lambda c: ("POST", f"/api/artists/{seed.object_id(1, 10)}/songs", {"title": "Plan", "duration": "3:00"}),
+    "delete song": lambda c: ("DELETE", f"/api/artists/{seed.object_id(1, 11)}/songs/0", None),
+    "search": lambda c: ("GET", "/api/search?q=blue", None),
+    "search multiword": lambda c: ("GET", "/api/search?q=silent%20night", None),
+    "list playlists": lambda c: ("GET", "/api/playlists?summary=true&limit=20", None),
+    "get playlist expanded": lambda c: ("GET", f"/api/playlists/{seed.object_id(2, 3)}?expand=artists", None),
+    "create playlist": lambda c: ("POST", "/api/playlists", {"name": "Plan Test"}),
+    "add to playlist": lambda c: ("POST", f"/api/playlists/{seed.object_id(2, 4)}/songs", _song(c)),
+    "remove from playlist": lambda c: ("DELETE", f"/api/playlists/{seed.object_id(2, 5)}/songs/0", None),
+    "move in playlist": lambda c: ("POST", f"/api/playlists/{seed.object_id(2, 6)}/songs:move", {"from": 0, "to": 1}),
+    "reorder playlist": lambda c: ("POST", f"/api/playlists/{seed.object_id(2, 7)}/songs:reorder",
+                                   {"order": list(range(c.playlist(7)["song_count"]))[::-1]}),
+    "get favorites": lambda c: ("GET", "/api/favorites", None),
+    "add favorite": lambda c: ("POST", "/api/favorites/songs", _song(c, 1)),
+    "remove favorite": lambda c: ("DELETE", "/api/favorites/songs/{artist_id}/{title}".format(**c.favorites_document()["songs"][0]), None),
+    "library": lambda c: ("GET", "/api/library", None),
+    "export": lambda c: ("GET", "/api/export/playlists", None),
+    "delete playlist": lambda c: ("DELETE", f"/api/playlists/{seed.object_id(2, 8)}", None),
+    "delete artist": lambda c: ("DELETE", f"/api/artists/{seed.object_id(1, 0)}", None),
+}
+
+
+@pytest.mark.skipif(not MONGO_TEST_URI, reason="MONGO_TEST_URI not set; query plans need a real mongod")
+class TestQueryPlans:
+    @pytest.fixture(scope="class")
+    def plan_env(self):
+        recorder = CommandRecorder()
+        client = MongoClient(MONGO_TEST_URI, event_listeners=[recorder])
+        db = client[f"music_plan_test_{os.getpid()}"]
+        catalog = seed.Catalog(artists=3000, songs_per_artist=20, playlists=300, playlist_size=40, favorites=200)
+        seed.seed(db, catalog, drop=True)
+        with patch("app.mongo") as mock_mongo:
+            mock_mongo.db = db
+            mock_mongo.cx = client
+            app_module.ensure_indexes()
+            recorder.take()
+            yield app.test_client(), recorder, db, catalog
+        client.drop_database(db.name)
+        client.close()
+
+    @pytest.mark.parametrize("route", list(ROUTES))
+    def test_route_uses_indexes(self, plan_env, route):
+        client, recorder, db, catalog = plan_env
+        method, path, body = ROUTES[route](catalog)
+
+        response = client.open(path, method=method, json=body)
+        if route == "delete artist":
+            app_module.cascade_worker.join()
+        assert response.status_code < 500, response.get_data(as_text=True)
+
+        violations = []
+        for captured in recorder.take():
+            for command in explainable(captured):
+                explain = db.command({"explain": command, "verbosity": "executionStats"})
+                violations += [f"{next(iter(command))} {command[next(iter(command))]}: {v}"
+                               for v in plan_violations(command, explain)]
+        assert violations == [], f"{method} {path}:\n" + "\n".join(violations)
@@ -0,0 +1,131 @@
+import pytest
+from unittest.mock import Mock, patch
+
+import ratelimit
+
+
+class TestMemoryBucketStore:
+    def test_consume_until_empty_then_refill(self):
+        """בדיקת צריכת אסימונים עד לריקון ומילוי מחדש"""
+        store = ratelimit.MemoryBucketStore()
+        with patch('ratelimit.time.monotonic', return_value=100.0):
+            assert store.consume("c", 5, 10, 1) == (True, 5)
+            assert store.consume("c", 5, 10, 1) == (True, 0)
+            assert store.consume("c", 1, 10, 1) == (False, 0)
+        with patch('ratelimit.time.monotonic', return_value=103.0):
+            assert store.consume("c", 1, 10, 1) == (True, 2)
+
+    def test_refill_capped_at_capacity(self):
+        """בדיקה שהמילוי לא עובר את הקיבולת"""
+        store = ratelimit.MemoryBucketStore()
+        with patch('ratelimit.time.monotonic', return_value=0.0):
+            store.consume("c", 1, 10, 1)
+        with patch('ratelimit.time.monotonic', return_value=1000.0):
+            assert store.consume("c", 1, 10, 1) == (True, 9)
+
+
+class TestMongoBucketStore:
+    def test_consume_uses_atomic_pipeline(self):
+        """בדיקה שהבדיקה מתבצעת בעדכון אטומי אחד"""
+        collection = Mock()
+        collection.find_one_and_update.return_value = {"_id": "c", "allowed": False, "tokens": 0.5}
+        store = ratelimit.MongoBucketStore(lambda: collection)
+
+        assert store.consume("c", 5, 60, 10) == (False, 0.5)
+        args, kwargs = collection.find_one_and_update.call_args
+        assert args[0] == {"_id": "c"}
+        assert args[1] == ratelimit.MongoBucketStore.pipeline(5, 60, 10)
+        assert kwargs["upsert"] is True
+
+
+class TestRateLimiter:
+    def test_client_key(self):
+        """בדיקת זיהוי לקוח לפי מפתח או כתובת"""
+        assert ratelimit.client_key(None, "10.0.0.1") == "ip:10.0.0.1"
+        key = ratelimit.client_key("secret", "10.0.0.1", {"secret"})
+        assert key.startswith("key:") and "secret" not in key
+        assert ratelimit.client_key("made-up", "10.0.0.1", {"secret"}) == "ip:10.0.0.1"
+        assert ratelimit.parse_api_keys(" a, b ,,") == {"a", "b"}
+
+    def test_route_costs(self):
+        """בדיקת עלות שונה לנתיבים שונים"""
+        limiter = ratelimit.RateLimiter(ratelimit.MemoryBucketStore(), capacity=10, rate=1, route_costs={"get_artists": 6})
+
+        assert limiter.check("c", "get_artists")[0] is True
+        allowed, remaining, retry_after = limiter.check("c", "get_artists")
+        assert allowed is False
+        assert retry_after >= 2
+        assert limiter.check("c", "get_playlist")[0] is True
+
+
+class TestRateLimitedRoutes:
+    @pytest.fixture
+    def limiter(self):
+        limiter = ratelimit.RateLimiter(ratelimit.MemoryBucketStore(), capacity=5, rate=0.001, route_costs={"get_artists": 5})
+        with patch('app.rate_limiter', limiter), patch.dict('app.app.config', {"RATE_LIMIT_ENABLED": True}):
+            yield limiter
+
+    def test_headers_and_429(self, client, mock_db, limiter):
+        """בדיקת כותרות המגבלה והחזרת 429"""
+        mock_db.db.artists.find.return_value = []
+
+        first = client.get('/api/artists')
+        second = client.get('/api/artists')
+
+        assert first.status_code == 200
+        assert first.headers["X-RateLimit-Limit"] == "5"
+        assert first.headers["X-RateLimit-Remaining"] == "0"
+        assert first.headers["X-RateLimit-Cost"] == "5"
+        assert second.status_code == 429
+        assert int(second.headers["Retry-After"]) >= 1
+        mock_db.db.artists.find.assert_called_once()
+
+    def test_api_keys_have_separate_buckets(self, client, mock_db, limiter):
+        """בדיקה שלכל מפתח API דלי נפרד"""
+        mock_db.db.artists.find.return_value = []
+
+        with patch.dict('app.app.config', {"API_KEYS": frozenset({"a", "b"})}):
+            assert client.get('/api/artists', headers={"X-API-Key": "a"}).status_code == 200
+            assert client.get('/api/artists', headers={"X-API-Key": "b"}).status_code == 200
+
+    def test_unknown_api_key_uses_ip_bucket(self, client, mock_db, limiter):
+        """בדיקה שמפתח שלא הונפק לא נותן דלי חדש"""
+        mock_db.db.artists.find.return_value = []
+
+        assert client.get('/api/artists', headers={"X-API-Key": "a"}).status_code == 200
+        assert client.get('/api/artists', headers={"X-API-Key": "b"}).status_code == 429
+
+    def test_batch_sub_requests_charged_to_caller(self, client, mock_db):
+        """בדיקה שבקשות משנה ב-batch נספרות לדלי של השולח, לפי כתובת"""
+        mock_db.db.artists.find.return_value = []
+        limiter = ratelimit.RateLimiter(ratelimit.MemoryBucketStore(), capacity=10, rate=0.001, route_costs={"get_artists": 5})
+        sub = {"path": "/api/artists", "headers": {"X-API-Key": "rotated"}}
+
+        def statuses(ip):
+            response = client.post('/api/batch', json=[sub], environ_base={"REMOTE_ADDR": ip})
+            return response.status_code, [r["status"] for r in response.get_json()["responses"]]
+
+        with patch('app.rate_limiter', limiter), patch.dict('app.app.config', {"RATE_LIMIT_ENABLED": True}):
+            assert statuses("10.0.0.1") == (200, [200])
+            assert statuses("10.0.0.1") == (200, [429])
+            assert statuses("10.0.0.2") == (200, [200])
+
+    def test_health_exempt(self, client, mock_db, limiter):
+        """בדיקה שבדיקת הבריאות פטורה"""
+        mock_db.cx.admin.command.return_value = {"ok": 1}
+
+        for _ in range(10):
+            assert client.get('/health').status_code == 200
+
+    def test_store_failure_fails_open(self, client, mock_db):
+        """בדיקה שתקלה במאגר לא חוסמת בקשות"""
+        store = Mock()
+        store.consume.side_effect = Exception("store down")
+        mock_db.db.artists.find.return_value = []
+
+        with patch('app.rate_limiter', ratelimit.RateLimiter(store)), \
+                patch.dict('app.app.config', {"RATE_LIMIT_ENABLED": True}):
+            response = client.get('/api/artists')
+
+        assert response.status_code == 200
+        assert "X-RateLimit-Remaining" not in response.headers
@@ -0,0 +1,115 @@
+import pytest
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from tests.conftest import apply_pipeline
+
+
+class TestMoveSong:
+    @pytest.mark.parametrize("from_index,to_index,expected", [
+        (0, 2, ["b", "c", "a"]),
+        (2, 0, ["c", "a", "b"]),
+        (1, 1, ["a", "b", "c"]),
+        (1, 2, ["a", "c", "b"]),
+    ])
+    def test_move_pipeline(self, client, mock_db, from_index, to_index, expected):
+        """בדיקה שהעברת שיר היא עדכון אטומי אחד שמזיז את השיר"""
+        playlist_id = ObjectId()
+        mock_db.db.playlists.find_one_and_update.return_value = {"_id": playlist_id, "version": 3}
+
+        response = client.post(f'/api/playlists/{playlist_id}/songs:move', json={"from": from_index, "to": to_index})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"3"'
+        query, pipeline = mock_db.db.playlists.find_one_and_update.call_args[0]
+        assert query == {"_id": playlist_id, f"songs.{max(from_index, to_index)}": {"$exists": True}}
+        assert mock_db.db.playlists.find_one_and_update.call_args[1]["return_document"] == ReturnDocument.AFTER
+        result = apply_pipeline(pipeline, {"songs": ["a", "b", "c"], "version": 2})
+        assert result["songs"] == expected
+        assert result["version"] == 3
+        mock_db.db.playlists.update_one.assert_not_called()
+        mock_db.db.playlists.find_one.assert_not_called()
+
+    def test_move_out_of_range(self, client, mock_db):
+        """בדיקה שאינדקס מחוץ לטווח מחזיר 409"""
+        mock_db.db.playlists.find_one_and_update.return_value = None
+        mock_db.db.playlists.find_one.return_value = {"_id": ObjectId(), "version": 0}
+
+        response = client.post(f'/api/playlists/{ObjectId()}/songs:move', json={"from": 0, "to": 9})
+
+        assert response.status_code == 409
+        assert "out of range" in response.get_json()["error"]
+
+    def test_move_playlist_not_found(self, client, mock_db):
+        """בדיקה שפלייליסט שלא קיים מחזיר 404"""
+        mock_db.db.playlists.find_one_and_update.return_value = None
+        mock_db.db.playlists.find_one.return_value = None
+
+        response = client.post(f'/api/playlists/{ObjectId()}/songs:move', json={"from": 0, "to": 1})
+
+        assert response.status_code == 404
+
+    def test_move_with_stale_if_match(self, client, mock_db):
+        """בדיקה שהעברה עם גרסה ישנה מחזירה 412"""
+        playlist_id = ObjectId()
+        mock_db.db.playlists.find_one_and_update.return_value = None
+        mock_db.db.playlists.find_one.return_value = {"_id": playlist_id, "version": 7}
+
+        response = client.post(f'/api/playlists/{playlist_id}/songs:move', json={"from": 0, "to": 1},
+                               headers={"If-Match": '"6"'})
+
+        assert response.status_code == 412
+        assert mock_db.db.playlists.find_one_and_update.call_args[0][0]["version"] == 6
+
+    @pytest.mark.parametrize("body", [{"from": 0}, {"from": -1, "to": 0}, {"from": "0", "to": 1}, {"from": True, "to": 0}])
+    def test_move_invalid_body(self, client, mock_db, body):
+        """בדיקת גוף בקשה לא תקין"""
+        response = client.post(f'/api/playlists/{ObjectId()}/songs:move', json=body)
+
+        assert response.status_code == 400
+        mock_db.db.playlists.find_one_and_update.assert_not_called()
+
+    def test_move_invalid_id(self, client, mock_db):
+        """בדיקת מזהה פלייליסט לא תקין"""
+        response = client.post('/api/playlists/invalid_id/songs:move', json={"from": 0, "to": 1})
+
+        assert response.status_code == 400
+
+
+class TestReorderSongs:
+    def test_reorder_pipeline(self, client, mock_db):
+        """בדיקה שסידור מחדש מחיל את הפרמוטציה בעדכון אחד"""
+        playlist_id = ObjectId()
+        mock_db.db.playlists.find_one_and_update.return_value = {"_id": playlist_id, "version": 1}
+
+        response = client.post(f'/api/playlists/{playlist_id}/songs:reorder', json={"order": [2, 0, 1]})
+
+        assert response.status_code == 200
+        query, pipeline = mock_db.db.playlists.find_one_and_update.call_args[0]
+        assert query == {"_id": playlist_id, "songs": {"$size": 3}}
+        assert apply_pipeline(pipeline, {"songs": ["a", "b", "c"]})["songs"] == ["c", "a", "b"]
+
+    def test_reorder_length_mismatch(self, client, mock_db):
+        """בדיקה שפרמוטציה באורך שונה מהפלייליסט נדחית"""
+        mock_db.db.playlists.find_one_and_update.return_value = None
+        mock_db.db.playlists.find_one.return_value = {"_id": ObjectId(), "version": 0}
+
+        response = client.post(f'/api/playlists/{ObjectId()}/songs:reorder', json={"order": [1, 0]})
+
+        assert response.status_code == 409
+
+    @pytest.mark.parametrize("order", [[0, 0], [1, 2], "01", [0, "1"], None])
+    def test_reorder_not_permutation(self, client, mock_db, order):
+        """בדיקה שרשימה שאינה פרמוטציה נדחית"""
+        response = client.post(f'/api/playlists/{ObjectId()}/songs:reorder', json={"order": order})
+
+        assert response.status_code == 400
+        mock_db.db.playlists.find_one_and_update.assert_not_called()
+
+    def test_reorder_database_error(self, client, mock_db):
+        """בדיקת שגיאת דאטהבייס"""
+        mock_db.db.playlists.find_one_and_update.side_effect = Exception("Database error")
+
+        response = client.post(f'/api/playlists/{ObjectId()}/songs:reorder', json={"order": [0]})
+
+        assert response.status_code == 500
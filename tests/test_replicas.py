@@ -0,0 +1,154 @@
+import time
+import pytest
+from unittest.mock import Mock, patch
+from bson import ObjectId
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+import cache
+import replicas
+import storage
+
+SECONDARY = SecondaryPreferred(max_staleness=90)
+
+
+@pytest.fixture
+def routed(mock_db):
+    """הפניית קריאות של רשימת הפלייליסטים ל-secondary"""
+    router = replicas.ReadRouter({"get_playlists": "secondaryPreferred", "get_playlist": "secondaryPreferred"},
+                                 max_staleness=90, pin_seconds=120)
+    # with_options returns the same mocked collections so routes work unchanged
+    mock_db.db.with_options.return_value = mock_db.db
+    mock_db.db.playlists.find.return_value = []
+    with patch("app.read_router", router), patch("app.read_cache", cache.ReadCache(ttl=60)):
+        yield mock_db
+
+
+def _preferences(mock_db):
+    return [c.kwargs["read_preference"] for c in mock_db.db.with_options.call_args_list]
+
+
+class TestReadRouter:
+    def test_parse_route_preferences(self):
+        """בדיקת פענוח הגדרת read preference לפי נתיב"""
+        assert replicas.parse_route_preferences("get_artists=secondaryPreferred, search_catalog = nearest") == {
+            "get_artists": "secondaryPreferred", "search_catalog": "nearest"
+        }
+        assert replicas.parse_route_preferences("") == {}
+        with pytest.raises(ValueError):
+            replicas.parse_route_preferences("get_artists=secondary_preferred")
+
+    def test_preference_per_route(self):
+        """בדיקת בחירת read preference, כולל נעילה ל-primary"""
+        router = replicas.ReadRouter({"get_artists": "secondaryPreferred", "get_playlist": "primary"}, max_staleness=90)
+
+        assert router.preference("get_artists") == SECONDARY
+        assert router.preference("get_playlist") == Primary()
+        assert router.preference("get_favorites") is None
+        assert router.preference("get_artists", pinned=True) == Primary()
+        assert replicas.ReadRouter().preference("get_artists", pinned=True) is None
+
+    def test_pin_window(self):
+        """בדיקה שחלון read-your-writes פג ושערכים רחוקים מדי נדחים"""
+        router = replicas.ReadRouter({"get_artists": "nearest"}, pin_seconds=60)
+        now = time.time()
+        until = router.pin_until(now)
+
+        assert router.is_pinned(str(until), now)
+        assert not router.is_pinned(str(until), now + 61)
+        assert not router.is_pinned(str(until + 3600), now)
+        assert not router.is_pinned("not-a-number", now)
+        assert not router.is_pinned(None, now)
+
+    def test_mongo_storage_applies_preference(self):
+        """בדיקה שהאחסון פונה לדאטהבייס עם ה-read preference של הבקשה"""
+        db = Mock()
+        db.artists.find.return_value = []
+        db.with_options.return_value = db
+        preference = [None]
+        store = storage.MongoStorage(lambda: db, lambda: None, lambda: preference[0])
+
+        store.artists.find()
+        db.with_options.assert_not_called()
+
+        preference[0] = SECONDARY
+        store.artists.find()
+        db.with_options.assert_called_once_with(read_preference=SECONDARY)
+
+
+class TestReadRouting:
+    def test_disabled_by_default(self, client, mock_db):
+        """בדיקה שבלי הגדרה הכל נקרא מה-primary ולא נשלחת עוגייה"""
+        mock_db.db.playlists.find.return_value = []
+        mock_db.db.playlists.insert_one.return_value = Mock(inserted_id=ObjectId())
+
+        assert client.get('/api/playlists').status_code == 200
+        response = client.post('/api/playlists', json={"name": "p"})
+
+        mock_db.db.with_options.assert_not_called()
+        assert "Set-Cookie" not in response.headers
+
+    def test_list_reads_go_to_secondary(self, client, routed):
+        """בדיקה שנתיב רשימה מוגדר נקרא מ-secondary עם maxStalenessSeconds"""
+        routed.db.favorites.find_one.return_value = None
+
+        assert client.get('/api/playlists').status_code == 200
+        assert client.get('/api/favorites').status_code == 200
+
+        assert _preferences(routed) == [SECONDARY]
+
+    def test_read_your_writes_after_mutation(self, client, routed):
+        """בדיקה שאחרי כתיבה הלקוח קורא מה-primary ולא מהמטמון"""
+        playlist_id = ObjectId()
+        routed.db.playlists.insert_one.return_value = Mock(inserted_id=ObjectId())
+        routed.db.playlists.find_one.return_value = {"_id": playlist_id, "name": "p", "songs": []}
+
+        with patch("app.read_router", replicas.ReadRouter({"get_playlist": "primary"}, pin_seconds=120)):
+            client.get(f'/api/playlists/{playlist_id}')
+            response = client.post('/api/playlists', json={"name": "p"})
+            assert replicas.PIN_COOKIE in response.headers["Set-Cookie"]
+            client.get(f'/api/playlists/{playlist_id}')
+            client.get(f'/api/playlists/{playlist_id}')
+
+        assert _preferences(routed) == [Primary(), Primary(), Primary()]
+        assert routed.db.playlists.find_one.call_count == 3
+
+    def test_secondary_reads_not_cached(self, client, routed):
+        """בדיקה שקריאה מ-secondary לא ממלאת את המטמון המשותף"""
+        client.get('/api/playlists')
+        client.get('/api/playlists')
+
+        assert routed.db.playlists.find.call_count == 2
+        with patch("app.read_router", replicas.ReadRouter({"get_playlists": "primary"})):
+            client.get('/api/playlists')
+            client.get('/api/playlists')
+        assert routed.db.playlists.find.call_count == 3
+
+    def test_failed_write_does_not_pin(self, client, routed):
+        """בדיקה שכתיבה שנכשלה לא נועלת קריאות ל-primary"""
+        response = client.post('/api/playlists', json={"name": ""})
+
+        assert response.status_code == 400
+        assert "Set-Cookie" not in response.headers
+
+    def test_batch_reads_see_batch_writes(self, client, routed):
+        """בדיקה שקריאות ב-batch שכותב נקראות מה-primary"""
+        playlist_id = ObjectId()
+        routed.db.playlists.insert_one.return_value = Mock(inserted_id=playlist_id)
+        routed.db.playlists.find_one.return_value = {"_id": playlist_id, "name": "p", "songs": []}
+
+        response = client.post('/api/batch', json=[
+            {"method": "POST", "path": "/api/playlists", "body": {"name": "p"}},
+            {"path": f"/api/playlists/{playlist_id}"},
+        ])
+
+        assert response.status_code == 200
+        assert _preferences(routed) == [Primary()]
+        assert replicas.PIN_COOKIE in response.headers["Set-Cookie"]
+
+    def test_read_only_batch_does_not_pin(self, client, routed):
+        """בדיקה ש-batch של קריאות בלבד נקרא מ-secondary ולא נועל"""
+        response = client.post('/api/batch', json=[{"path": "/api/playlists"}])
+
+        assert response.status_code == 200
+        assert _preferences(routed) == [SECONDARY]
+        assert "Set-Cookie" not in response.headers
@@ -0,0 +1,159 @@
+import threading
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+from bson import ObjectId
+
+import app as app_module
+import roundtrips
+from tests.conftest import count_db_calls
+
+
+def _charge(command, result=None):
+    """side_effect שמדמה את ה-listener: כל קריאה נספרת כפקודה אחת"""
+    def query(*args, **kwargs):
+        roundtrips.current().add(command)
+        return result
+    return query
+
+
+class TestRoundTripCounter:
+    def test_listener_charges_active_request_only(self):
+        """בדיקה שפקודות נספרות רק כשיש בקשה פעילה"""
+        listener = roundtrips.RoundTripListener()
+        listener.started(Mock(command_name="find"))
+
+        counter, token = roundtrips.start()
+        listener.started(Mock(command_name="find"))
+        listener.started(Mock(command_name="update"))
+        roundtrips.stop(token)
+        listener.started(Mock(command_name="find"))
+
+        assert counter.count == 2
+        assert counter.commands == ["find", "update"]
+        assert roundtrips.current() is None
+
+    def test_in_current_context_crosses_threads(self):
+        """בדיקה שפקודות מ-thread אחר נספרות לבקשה שהפעילה אותו"""
+        counter, token = roundtrips.start()
+        work = roundtrips.in_current_context(lambda: roundtrips.current().add("find"))
+        threads = [threading.Thread(target=work) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        roundtrips.stop(token)
+
+        assert counter.count == 2
+
+    def test_stats_track_budget(self):
+        """בדיקת סטטיסטיקה לפי נתיב וחריגה מהתקציב"""
+        stats = roundtrips.RoundTripStats(budget=2)
+
+        assert stats.record("get_playlist", 1) is False
+        assert stats.record("get_playlist", 3) is True
+
+        assert stats.stats()["endpoints"]["get_playlist"] == {
+            "requests": 2, "round_trips": 4, "max": 3, "over_budget": 1, "mean": 2.0
+        }
+
+
+class TestRoundTripReporting:
+    def test_header_and_metrics(self, client, mock_db):
+        """בדיקת כותרת X-DB-Round-Trips ורישום ב-metrics"""
+        playlist_id = ObjectId()
+        mock_db.db.playlists.find_one.side_effect = _charge("find", {"_id": playlist_id, "name": "p", "songs": []})
+
+        response = client.get(f'/api/playlists/{playlist_id}')
+
+        assert response.status_code == 200
+        assert response.headers["X-DB-Round-Trips"] == "1"
+        endpoints = client.get('/metrics').get_json()["db_round_trips"]["endpoints"]
+        assert endpoints["get_playlist"]["max"] >= 1
+
+    def test_library_pool_queries_charged_to_request(self, client, mock_db):
+        """בדיקה ששאילתות שרצות ב-pool נספרות לבקשה"""
+        app_module.read_cache.clear()
+        mock_db.db.artists.find.return_value.sort.return_value.limit.side_effect = _charge("find", [])
+        mock_db.db.playlists.find.return_value.sort.return_value.skip.return_value.limit.side_effect = _charge("find", [])
+        mock_db.db.favorites.find_one.side_effect = _charge("find", None)
+
+        response = client.get('/api/library?limit=7')
+
+        assert response.status_code == 200
+        assert response.headers["X-DB-Round-Trips"] == "3"
+
+    def test_batch_sub_requests_charged_to_batch(self, client, mock_db):
+        """בדיקה שקריאות של בקשות משנה נספרות לבקשת ה-batch"""
+        mock_db.db.favorites.find_one.side_effect = _charge("find", None)
+
+        response = client.post('/api/batch', json={"requests": [
+            {"path": "/api/favorites"}, {"path": "/api/favorites"},
+        ]})
+
+        assert response.status_code == 200
+        assert response.headers["X-DB-Round-Trips"] == "2"
+
+    def test_over_budget_logged(self, client, mock_db):
+        """בדיקת אזהרה בלוג כשנתיב חורג מהתקציב"""
+        mock_db.db.favorites.find_one.side_effect = _charge("find", None)
+
+        with patch.object(app_module.round_trip_stats, "budget", 0.5), \
+                patch.object(app_module.app.logger, "warning") as warning:
+            response = client.get('/api/favorites')
+
+        assert response.status_code == 200
+        warning.assert_called_once()
+        assert "budget" in warning.call_args[0][0]
+
+
+PLAYLIST_ID = ObjectId()
+ARTIST_ID = ObjectId()
+SONG = {"artist_id": str(ARTIST_ID), "artist_name": "a", "title": "t", "duration": "3:00"}
+
+# Database calls each route may make on its happy path
+ROUTE_BUDGETS = [
+    ("GET", "/api/artists", None, 1),
+    ("POST", "/api/artists", {"name": "a"}, 1),
+    ("POST", f"/api/artists/{ARTIST_ID}/songs", {"title": "t", "duration": "3:00"}, 1),
+    ("DELETE", f"/api/artists/{ARTIST_ID}/songs/0", None, 2),
+    ("GET", f"/api/playlists/{PLAYLIST_ID}", None, 1),
+    ("POST", "/api/playlists", {"name": "p"}, 1),
+    ("POST", f"/api/playlists/{PLAYLIST_ID}/songs", SONG, 1),
+    ("DELETE", f"/api/playlists/{PLAYLIST_ID}/songs/0", None, 2),
+    ("DELETE", f"/api/playlists/{PLAYLIST_ID}", None, 1),
+    ("GET", "/api/favorites", None, 1),
+    ("POST", "/api/favorites/songs", SONG, 2),
+    ("DELETE", f"/api/favorites/songs/{ARTIST_ID}/t", None, 1),
+    ("GET", "/api/library", None, 3),
+]
+
+
+class TestRouteBudgets:
+    @pytest.mark.parametrize("method,path,body,budget", ROUTE_BUDGETS)
+    def test_route_within_budget(self, client, mock_db, assert_max_db_calls, method, path, body, budget):
+        """בדיקה שכל נתיב נשאר בתקציב הקריאות לדאטהבייס"""
+        app_module.read_cache.clear()
+        document = {"_id": PLAYLIST_ID, "name": "p", "songs": [dict(SONG)], "version": 0}
+        mock_db.db.artists.find_one.return_value = document
+        mock_db.db.playlists.find_one.return_value = document
+        mock_db.db.favorites.find_one.return_value = None
+        mock_db.db.artists.insert_one.return_value = Mock(inserted_id=ObjectId())
+        mock_db.db.playlists.insert_one.return_value = Mock(inserted_id=ObjectId())
+        mock_db.db.playlists.update_one.return_value = Mock(matched_count=1)
+        artists_cursor = MagicMock()
+        artists_cursor.__iter__.return_value = iter([])
+        artists_cursor.sort.return_value.limit.return_value = []
+        mock_db.db.artists.find.return_value = artists_cursor
+        mock_db.db.playlists.find.return_value.sort.return_value.skip.return_value.limit.return_value = []
+
+        response = client.open(path, method=method, json=body)
+
+        assert response.status_code < 400, response.get_data(as_text=True)
+        assert_max_db_calls(budget)
+
+    def test_count_ignores_cursor_chaining(self, mock_db):
+        """בדיקה ששרשור על cursor לא נספר כקריאה נוספת"""
+        mock_db.db.artists.find({}).sort("name").limit(5)
+        mock_db.db.favorites.find_one({})
+
+        assert count_db_calls(mock_db) == 2
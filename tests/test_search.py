@@ -0,0 +1,110 @@
+import pytest
+from unittest.mock import Mock
+from bson import ObjectId
+
+import search
+
+
+class TestNormalize:
+    def test_normalize_case_and_accents(self):
+        """בדיקת נרמול אותיות גדולות וסימני ניקוד"""
+        assert search.normalize("  Beyoncé  KNOWLES ") == "beyonce knowles"
+
+    def test_normalize_hebrew_niqqud(self):
+        """בדיקת הסרת ניקוד בעברית"""
+        assert search.normalize("שָׁלוֹם") == "שלום"
+
+    def test_normalize_non_string(self):
+        """בדיקת נרמול של ערך שאינו מחרוזת"""
+        assert search.normalize(None) == ""
+
+
+class TestSearch:
+    def _mock_artist_cursor(self, mock_db, artists):
+        mock_db.db.artists.find.return_value.sort.return_value.limit.return_value = artists
+
+    def test_search_empty_query(self, client, mock_db):
+        """בדיקת חיפוש ללא מחרוזת"""
+        response = client.get('/api/search?q=')
+
+        assert response.status_code == 200
+        assert response.get_json() == {"artists": [], "songs": []}
+        mock_db.db.artists.find.assert_not_called()
+
+    def test_search_ranks_exact_match_first(self, client, mock_db):
+        """בדיקה שהתאמה מדויקת מופיעה ראשונה"""
+        exact_id = ObjectId()
+        self._mock_artist_cursor(mock_db, [
+            {"_id": ObjectId(), "name": "Queens of the Stone Age", "name_normalized": "queens of the stone age"},
+            {"_id": exact_id, "name": "Queen", "name_normalized": "queen"},
+        ])
+        mock_db.db.artists.aggregate.return_value = []
+
+        response = client.get('/api/search?q=QUEEN')
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert data["artists"][0] == {"_id": str(exact_id), "name": "Queen"}
+        query = mock_db.db.artists.find.call_args[0][0]
+        assert query == {"name_normalized": {"$regex": "^queen"}}
+        mock_db.db.artists.find.return_value.sort.return_value.limit.assert_called_once_with(10)
+
+    def test_search_songs(self, client, mock_db):
+        """בדיקת חיפוש שירים לפי תחילית"""
+        artist_id = ObjectId()
+        self._mock_artist_cursor(mock_db, [])
+        mock_db.db.artists.aggregate.return_value = [
+            {"_id": artist_id, "name": "עידן רייכל",
+             "songs": {"title": "מילים", "title_normalized": "מילים", "duration": "4:20"}}
+        ]
+
+        response = client.get('/api/search?q=מיל&limit=5')
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert data["songs"] == [{
+            "artist_id": str(artist_id),
+            "artist_name": "עידן רייכל",
+            "title": "מילים",
+            "duration": "4:20"
+        }]
+        pipeline = mock_db.db.artists.aggregate.call_args[0][0]
+        assert pipeline[0] == {"$match": {"songs.title_normalized": {"$regex": "^מיל"}}}
+        assert pipeline[-1] == {"$limit": 5}
+
+    def test_search_escapes_regex(self, client, mock_db):
+        """בדיקה שתווים מיוחדים לא מפורשים כביטוי רגולרי"""
+        self._mock_artist_cursor(mock_db, [])
+        mock_db.db.artists.aggregate.return_value = []
+
+        response = client.get('/api/search?q=a.b*')
+
+        assert response.status_code == 200
+        query = mock_db.db.artists.find.call_args[0][0]
+        assert query == {"name_normalized": {"$regex": r"^a\.b\*"}}
+
+    def test_search_invalid_limit(self, client, mock_db):
+        """בדיקת מגבלת תוצאות לא חוקית"""
+        response = client.get('/api/search?q=a&limit=500')
+        data = response.get_json()
+
+        assert response.status_code == 400
+        assert data["success"] is False
+
+    def test_search_db_error(self, client, mock_db):
+        """בדיקת שגיאת דאטהבייס בחיפוש"""
+        mock_db.db.artists.find.side_effect = Exception("DB Error")
+
+        response = client.get('/api/search?q=a')
+
+        assert response.status_code == 500
+        assert response.get_json()["success"] is False
+
+    def test_add_song_stores_normalized_title(self, client, mock_db):
+        """בדיקה ששם השיר נשמר גם בצורה מנורמלת"""
+        mock_db.db.artists.update_one.return_value = Mock(matched_count=1)
+
+        client.post(f'/api/artists/{ObjectId()}/songs', json={"title": "Hey Jude", "duration": "7:11"})
+
+        update = mock_db.db.artists.update_one.call_args[0][1]
+        assert update["$push"]["songs"]["title_normalized"] == "hey jude"
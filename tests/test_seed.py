@@ -0,0 +1,59 @@
+import random
+import mongomock
+from collections import Counter
+from bson import ObjectId
+
+import search
+from benchmarks import loadtest, seed
+
+
+class TestSeed:
+    def test_catalog_is_deterministic(self):
+        """בדיקה שאותו seed מייצר בדיוק את אותם נתונים"""
+        first = seed.Catalog(artists=100, playlists=10, seed=7)
+        second = seed.Catalog(artists=100, playlists=10, seed=7)
+
+        assert first.artist(42) == second.artist(42)
+        assert first.playlist(3) == second.playlist(3)
+        assert first.playlist(3) != seed.Catalog(artists=100, playlists=10, seed=8).playlist(3)
+
+    def test_documents_match_api_schema(self):
+        """בדיקה שהמסמכים בנויים כמו המסמכים שה-API כותב"""
+        catalog = seed.Catalog(artists=50, playlists=5)
+        artist = catalog.artist(0)
+        playlist = catalog.playlist(0)
+
+        assert artist["song_count"] == len(artist["songs"])
+        assert artist["name_normalized"] == search.normalize(artist["name"])
+        assert playlist["total_duration_seconds"] == sum(s["duration_seconds"] for s in playlist["songs"])
+        referenced = ObjectId(playlist["songs"][0]["artist_id"])
+        assert referenced in {seed.object_id(1, i) for i in range(50)}
+
+    def test_popularity_is_skewed(self):
+        """בדיקה שהפופולריות של האמנים מתפלגת לפי Zipf"""
+        catalog = seed.Catalog(artists=1000, zipf_s=1.1)
+        rng = random.Random(1)
+        draws = Counter(catalog.popular_artist(rng) for _ in range(20000))
+
+        top = sum(count for _, count in draws.most_common(10))
+        assert top > 20000 * 0.3
+        assert all(0 <= i < 1000 for i in draws)
+
+    def test_seed_inserts_in_batches(self):
+        """בדיקת הכנסת הנתונים באצוות ויצירת האינדקסים"""
+        db = mongomock.MongoClient().db
+        catalog = seed.Catalog(artists=120, playlists=30, favorites=20)
+
+        counts = seed.seed(db, catalog, batch_size=50)
+
+        assert counts == {"artists": 120, "playlists": 30, "favorites": 1}
+        assert db.artists.find_one({"_id": seed.object_id(1, 7)})["name"] == catalog.artist_name(7)
+        assert "songs_title_normalized_1" in db.artists.index_information()
+        assert db.favorites.index_information()["type_1"]["unique"] is True
+
+    def test_loadtest_uses_seeded_catalog(self):
+        """בדיקה שבדיקת העומס יכולה לפעול על קטלוג שנזרע מראש"""
+        state = loadtest.catalog_state(100, 10, random.Random(0), sample=20)
+
+        assert len(state.artists) == 20 and len(state.playlists) == 10
+        assert state.artists[0] in {str(seed.object_id(1, i)) for i in range(100)}
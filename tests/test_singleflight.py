@@ -0,0 +1,91 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from bson import ObjectId
+
+import singleflight
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_coalesced(self):
+        """בדיקה שקריאות זהות במקביל מתאחדות לקריאה אחת"""
+        flights = singleflight.SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def query():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"name": "p"}
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flights.do("k", query)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flights.do("k", query))) for _ in range(5)]
+        for t in followers:
+            t.start()
+        while flights.stats()["coalesced"] < 5:
+            time.sleep(0.001)
+        release.set()
+        for t in [leader] + followers:
+            t.join(5)
+
+        assert len(calls) == 1
+        assert len(results) == 6 and all(r is results[0] for r in results)
+        assert flights.stats() == {"executed": 1, "coalesced": 5, "in_flight": 0}
+
+    def test_error_propagates_to_waiters(self):
+        """בדיקה ששגיאה מועברת לכל הממתינים"""
+        flights = singleflight.SingleFlight()
+
+        with pytest.raises(ValueError):
+            flights.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+        assert flights.stats()["in_flight"] == 0
+
+    def test_sequential_calls_not_cached(self):
+        """בדיקה שקריאות עוקבות לא נשמרות"""
+        flights = singleflight.SingleFlight()
+
+        assert flights.do("k", lambda: 1) == 1
+        assert flights.do("k", lambda: 2) == 2
+
+    def test_forget_detaches_in_flight_call(self):
+        """בדיקה שאחרי כתיבה נפתחת קריאה חדשה"""
+        flights = singleflight.SingleFlight()
+        inner = []
+
+        def query():
+            # A write lands while the first query is still running
+            flights.forget(lambda key: key == "k")
+            inner.append(flights.do("k", lambda: "fresh"))
+            return "stale"
+
+        assert flights.do("k", query) == "stale"
+        assert inner == ["fresh"]
+        assert flights.stats()["executed"] == 2
+
+
+class TestCoalescedRoutes:
+    def test_get_playlist_uses_single_flight(self, client, mock_db):
+        """בדיקה שקריאת פלייליסט עוברת דרך האיחוד"""
+        playlist_id = ObjectId()
+        mock_db.db.playlists.find_one.return_value = {"_id": playlist_id, "songs": []}
+        flights = singleflight.SingleFlight()
+
+        with patch('app.read_flights', flights):
+            response = client.get(f'/api/playlists/{playlist_id}')
+
+        assert response.status_code == 200
+        assert flights.stats()["executed"] == 1
+
+    def test_metrics_endpoint(self, client):
+        """בדיקת נקודת הקצה למדדים"""
+        response = client.get('/metrics')
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert set(data["singleflight"]) == {"executed", "coalesced", "in_flight"}
+        assert "limit" in data["admission"]
@@ -0,0 +1,217 @@
+import gzip
+import json
+import pytest
+import mongomock
+from unittest.mock import Mock, patch
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+import cascade
+import idempotency
+import storage
+from app import app
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def store(request, mongomock_pipelines):
+    """אותן בדיקות מול שני המימושים: זיכרון ו-Mongo (mongomock)"""
+    if request.param == "memory":
+        return storage.MemoryStorage()
+    client = mongomock.MongoClient()
+    return storage.MongoStorage(lambda: client.db, lambda: client)
+
+
+@pytest.fixture
+def memory_store():
+    return storage.MemoryStorage()
+
+
+def _artist(name, songs=()):
+    songs = [{"title": t, "title_normalized": t.lower(), "duration": "3:00", "duration_seconds": 180} for t in songs]
+    return {"name": name, "name_normalized": name.lower(), "songs": songs, "song_count": len(songs), "version": 0}
+
+
+def _song(artist_id, title, seconds=180):
+    return {"artist_id": str(artist_id), "artist_name": "a", "title": title, "duration": "3:00", "duration_seconds": seconds}
+
+
+class TestRepositoryContract:
+    def test_artist_filters_sort_and_paging(self, store):
+        """בדיקת סינון, מיון ודפדוף של אמנים"""
+        for name, count in [("abba", 3), ("adele", 1), ("beatles", 5), ("abbey", 2)]:
+            store.artists.insert(_artist(name, [f"s{i}" for i in range(count)]))
+
+        by_name = store.artists.find(sort=[("name_normalized", DESCENDING), ("_id", DESCENDING)], limit=2, offset=1)
+        assert [a["name"] for a in by_name] == ["adele", "abbey"]
+        assert [a["name"] for a in store.artists.find(name_prefix="ab", sort=[("name_normalized", ASCENDING), ("_id", ASCENDING)])] == ["abba", "abbey"]
+        assert [a["name"] for a in store.artists.find(min_songs=2, sort=[("song_count", ASCENDING), ("_id", ASCENDING)])] == ["abbey", "abba", "beatles"]
+        assert [a["name"] for a in store.artists.find(name_prefix="a", min_songs=2, sort=[("song_count", DESCENDING), ("_id", DESCENDING)])] == ["abba", "abbey"]
+
+    def test_projection_and_ids(self, store):
+        """בדיקת projection ושליפה לפי רשימת מזהים"""
+        first = store.artists.insert(_artist("first", ["x"]))
+        store.artists.insert(_artist("second"))
+
+        [artist] = store.artists.find(ids=[first, ObjectId()], projection={"name": 1, "song_count": 1})
+
+        assert artist == {"_id": first, "name": "first", "song_count": 1}
+        assert store.artists.get(first, {"songs": 0}) == {"_id": first, "name": "first", "name_normalized": "first", "song_count": 1, "version": 0}
+
+    def test_versioned_song_writes(self, store):
+        """בדיקה שכתיבה עם גרסה ישנה נדחית"""
+        artist_id = store.artists.insert(_artist("a"))
+
+        assert store.artists.push_song(artist_id, {"title": "one"}, expected_version=0)
+        assert not store.artists.push_song(artist_id, {"title": "two"}, expected_version=0)
+        stale = store.artists.get(artist_id)
+        assert store.artists.push_song(artist_id, {"title": "two"})
+        assert not store.artists.remove_song(artist_id, stale, 0)
+
+        current = store.artists.get(artist_id)
+        assert store.artists.remove_song(artist_id, current, 0)
+        artist = store.artists.get(artist_id)
+        assert [s["title"] for s in artist["songs"]] == ["two"]
+        assert (artist["song_count"], artist["version"]) == (1, 3)
+        assert not store.artists.push_song(ObjectId(), {"title": "x"})
+
+    def test_playlist_aggregates(self, store):
+        """בדיקה שסיכומי הפלייליסט מתעדכנים בהוספה והסרה"""
+        playlist_id = store.playlists.insert({"name": "p", "songs": [], "song_count": 0, "total_duration_seconds": 0, "version": 0})
+        artist_id = ObjectId()
+
+        assert store.playlists.push_song(playlist_id, _song(artist_id, "a", 100))
+        assert store.playlists.push_song(playlist_id, _song(artist_id, "b", 200))
+        assert store.playlists.remove_song(playlist_id, store.playlists.get(playlist_id), 0)
+
+        playlist = store.playlists.get(playlist_id)
+        assert (playlist["song_count"], playlist["total_duration_seconds"], playlist["version"]) == (1, 200, 3)
+        assert store.playlists.get(playlist_id, {"version": 1}) == {"_id": playlist_id, "version": 3}
+        assert store.playlists.delete(playlist_id)
+        assert not store.playlists.delete(playlist_id)
+
+    def test_favorites(self, store):
+        """בדיקת מועדפים: יצירה, מניעת כפילויות, חיתוך והסרה"""
+        artist_id = ObjectId()
+        assert store.favorites.get() is None
+        assert not store.favorites.remove_song(str(artist_id), "a")
+
+        for title in ("a", "b", "a", "c"):
+            store.favorites.add_song(_song(artist_id, title))
+
+        assert [s["title"] for s in store.favorites.get()["songs"]] == ["a", "b", "c"]
+        assert [s["title"] for s in store.favorites.get(songs_limit=1, songs_offset=1)["songs"]] == ["b"]
+        assert store.favorites.remove_song(str(artist_id), "b")
+        store.favorites.add_song(_song(artist_id, "b"))
+        assert [s["title"] for s in store.favorites.get()["songs"]] == ["a", "c", "b"]
+
+    def test_stream_collection(self, store):
+        """בדיקת ייצוא לפי סדר _id והמשך אחרי מזהה"""
+        ids = [store.playlists.insert({"name": str(i), "songs": []}) for i in range(3)]
+
+        lines = b"".join(store.stream_collection("playlists", after=str(ids[0]), compress=True))
+        names = [json.loads(line)["name"] for line in gzip.decompress(lines).splitlines()]
+
+        assert names == ["1", "2"]
+
+
+class TestMemoryStorage:
+    def test_reads_are_copies(self, memory_store):
+        """בדיקה ששינוי בתוצאה לא משנה את המסמך השמור"""
+        artist_id = memory_store.artists.insert(_artist("a", ["x"]))
+
+        artist = memory_store.artists.get(artist_id)
+        artist["songs"].append({"title": "y"})
+        artist["name"] = "changed"
+
+        assert memory_store.artists.get(artist_id)["name"] == "a"
+        assert len(memory_store.artists.get(artist_id)["songs"]) == 1
+
+    def test_indexes_follow_updates(self, memory_store):
+        """בדיקה שהאינדקסים מתעדכנים אחרי כתיבה ומחיקה"""
+        artist_id = memory_store.artists.insert(_artist("solo"))
+        memory_store.artists.insert(_artist("duo", ["a", "b"]))
+        memory_store.artists.push_song(artist_id, {"title": "Blue", "title_normalized": "blue"})
+        memory_store.artists.push_song(artist_id, {"title": "Black", "title_normalized": "black"})
+        memory_store.artists.push_song(artist_id, {"title": "Bold", "title_normalized": "bold"})
+
+        assert [a["name"] for a in memory_store.artists.find(min_songs=3)] == ["solo"]
+        assert [s["title"] for s in memory_store.search("bl")["songs"]] == ["Blue", "Black"]
+
+        memory_store.artists.delete(artist_id)
+        assert memory_store.artists.find(min_songs=3) == []
+        assert memory_store.search("bl") == {"artists": [], "songs": []}
+
+    def test_search_ranks_like_mongo(self, memory_store):
+        """בדיקה שהדירוג זהה לחיפוש ב-Mongo: התאמה מלאה קודם, אחר כך קצרים"""
+        for name in ("Queen Latifah", "Queens", "Queen"):
+            memory_store.artists.insert(_artist(name))
+
+        assert [a["name"] for a in memory_store.search("queen")["artists"]] == ["Queen", "Queens", "Queen Latifah"]
+
+    def test_move_and_reorder(self, memory_store):
+        """בדיקת הזזה וסידור מחדש עם בדיקת גרסה"""
+        artist_id = ObjectId()
+        playlist_id = memory_store.playlists.insert({"name": "p", "songs": [_song(artist_id, t) for t in "abcd"], "version": 0})
+
+        assert memory_store.playlists.move_song(playlist_id, 0, 2) == 1
+        assert memory_store.playlists.move_song(playlist_id, 0, 9) is None
+        assert memory_store.playlists.reorder_songs(playlist_id, [3, 2, 1, 0], expected_version=0) is None
+        assert memory_store.playlists.reorder_songs(playlist_id, [3, 2, 1, 0], expected_version=1) == 2
+        assert memory_store.playlists.reorder_songs(playlist_id, [1, 0]) is None
+
+        assert [s["title"] for s in memory_store.playlists.get(playlist_id)["songs"]] == ["d", "a", "c", "b"]
+
+    def test_cascade_runs_inline(self, memory_store):
+        """בדיקה שמחיקת אמן מנקה פלייליסטים ומועדפים מיד ונרשמת כעבודה שהסתיימה"""
+        gone, kept = ObjectId(), ObjectId()
+        playlist_id = memory_store.playlists.insert({
+            "name": "p", "songs": [_song(gone, "x", 100), _song(kept, "y", 200)],
+            "song_count": 2, "total_duration_seconds": 300, "version": 0
+        })
+        untouched = memory_store.playlists.insert({"name": "q", "songs": [_song(kept, "z")], "version": 0})
+        memory_store.favorites.add_song(_song(gone, "x"))
+        worker = cascade.CascadeWorker(on_playlists_updated=Mock(), on_favorites_updated=Mock())
+
+        job_id = memory_store.enqueue_cascade(worker, str(gone))
+
+        playlist = memory_store.playlists.get(playlist_id)
+        assert [s["title"] for s in playlist["songs"]] == ["y"]
+        assert (playlist["song_count"], playlist["total_duration_seconds"], playlist["version"]) == (1, 200, 1)
+        assert memory_store.playlists.get(untouched)["version"] == 0
+        assert memory_store.favorites.get()["songs"] == []
+        worker.on_playlists_updated.assert_called_once_with([playlist_id])
+        worker.on_favorites_updated.assert_called_once()
+        assert worker.get(job_id)["state"] == "done"
+        assert worker.get(job_id)["playlists_updated"] == 1
+
+
+class TestMemoryBackedApi:
+    def test_full_flow_without_mongo(self):
+        """בדיקת זרימה מלאה דרך ה-API מול אחסון בזיכרון, בלי Mongo"""
+        client = app.test_client()
+        with patch("app.store", storage.MemoryStorage()), patch("app.mongo", None), \
+                patch("app.idempotency_store", idempotency.MemoryIdempotencyStore(3600)):
+            headers = {"Idempotency-Key": "create-artist"}
+            artist_id = client.post("/api/artists", json={"name": "Beyoncé"}, headers=headers).get_json()["id"]
+            retry = client.post("/api/artists", json={"name": "Beyoncé"}, headers=headers)
+            assert retry.headers["Idempotent-Replayed"] == "true"
+            assert retry.get_json()["id"] == artist_id
+            assert client.post(f"/api/artists/{artist_id}/songs", json={"title": "Halo", "duration": "4:21"}).status_code == 200
+            playlist_id = client.post("/api/playlists", json={"name": "mix"}).get_json()["id"]
+            song = {"artist_id": artist_id, "artist_name": "Beyoncé", "title": "Halo", "duration": "4:21"}
+            assert client.post(f"/api/playlists/{playlist_id}/songs", json=song).status_code == 200
+            assert client.post("/api/favorites/songs", json=song).status_code == 200
+
+            playlist = client.get(f"/api/playlists/{playlist_id}?expand=artists")
+            assert playlist.headers["ETag"] == '"1"'
+            assert playlist.get_json()["songs"][0]["artist"]["name"] == "Beyoncé"
+            assert playlist.get_json()["total_duration_seconds"] == 261
+            assert client.get("/api/search?q=beyonce").get_json()["artists"][0]["name"] == "Beyoncé"
+            assert client.get("/api/artists?sort=-song_count&min_songs=1").get_json()[0]["_id"] == artist_id
+            assert client.get("/health").status_code == 200
+
+            response = client.delete(f"/api/artists/{artist_id}")
+            assert response.status_code == 200
+            assert client.get(f"/api/jobs/{response.get_json()['cleanup_job']}").get_json()["state"] == "done"
+            assert client.get(f"/api/playlists/{playlist_id}").get_json()["songs"] == []
+            assert client.get("/api/favorites").get_json()["songs"] == []
@@ -0,0 +1,119 @@
+import pytest
+import mongomock
+from unittest.mock import Mock, patch
+from bson import ObjectId
+
+import cascade
+from tests.conftest import apply_pipeline
+
+
+@pytest.fixture
+def mongo_db(mongomock_pipelines):
+    db = mongomock.MongoClient().db
+    with patch('app.mongo') as mock_mongo:
+        mock_mongo.db = db
+        yield db
+
+
+SONG = {"artist_id": "a", "artist_name": "A", "title": "t", "duration": "1:00"}
+
+
+class TestOptimisticConcurrency:
+    def test_get_playlist_returns_etag(self, client, mongo_db):
+        """בדיקה שקריאת פלייליסט מחזירה ETag לפי הגרסה"""
+        playlist_id = mongo_db.playlists.insert_one({"name": "p", "songs": [], "version": 4}).inserted_id
+
+        response = client.get(f'/api/playlists/{playlist_id}')
+
+        assert response.headers["ETag"] == '"4"'
+
+    def test_remove_with_matching_if_match(self, client, mongo_db):
+        """בדיקה שהסרה עם גרסה נכונה מצליחה ומקדמת את הגרסה"""
+        playlist_id = mongo_db.playlists.insert_one({
+            "songs": [{"title": "a", "duration_seconds": 60}, {"title": "b", "duration_seconds": 30}],
+            "song_count": 2, "total_duration_seconds": 90, "version": 2
+        }).inserted_id
+
+        response = client.delete(f'/api/playlists/{playlist_id}/songs/0', headers={"If-Match": '"2"'})
+
+        playlist = mongo_db.playlists.find_one({"_id": playlist_id})
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"3"'
+        assert [s["title"] for s in playlist["songs"]] == ["b"]
+        assert (playlist["song_count"], playlist["total_duration_seconds"], playlist["version"]) == (1, 30, 3)
+
+    def test_remove_with_stale_if_match(self, client, mongo_db):
+        """בדיקה שהסרה עם גרסה ישנה נדחית ב-412"""
+        playlist_id = mongo_db.playlists.insert_one({"songs": [{"title": "a"}], "version": 5}).inserted_id
+
+        response = client.delete(f'/api/playlists/{playlist_id}/songs/0', headers={"If-Match": '"4"'})
+
+        assert response.status_code == 412
+        assert response.headers["ETag"] == '"5"'
+        assert len(mongo_db.playlists.find_one({"_id": playlist_id})["songs"]) == 1
+
+    def test_legacy_document_without_version(self, client, mongo_db):
+        """בדיקה שמסמך ישן ללא גרסה מתנהג כגרסה 0"""
+        artist_id = mongo_db.artists.insert_one({"songs": [{"title": "a"}, {"title": "b"}], "song_count": 2}).inserted_id
+
+        response = client.delete(f'/api/artists/{artist_id}/songs/1', headers={"If-Match": 'W/"0"'})
+
+        artist = mongo_db.artists.find_one({"_id": artist_id})
+        assert response.status_code == 200
+        assert artist["songs"] == [{"title": "a"}]
+        assert artist["version"] == 1
+
+    def test_append_with_stale_if_match(self, client, mongo_db):
+        """בדיקה שהוספה עם גרסה ישנה נדחית ולא נכתבת"""
+        playlist_id = mongo_db.playlists.insert_one({"songs": [], "version": 1}).inserted_id
+
+        response = client.post(f'/api/playlists/{playlist_id}/songs', json=SONG, headers={"If-Match": '"0"'})
+
+        assert response.status_code == 412
+        assert mongo_db.playlists.find_one({"_id": playlist_id})["songs"] == []
+
+    def test_append_with_if_match_to_missing_playlist(self, client, mongo_db):
+        """בדיקה שהוספה לפלייליסט שלא קיים מחזירה 404 גם עם If-Match"""
+        response = client.post(f'/api/playlists/{ObjectId()}/songs', json=SONG, headers={"If-Match": '"0"'})
+
+        assert response.status_code == 404
+
+    def test_invalid_if_match(self, client, mock_db):
+        """בדיקה ש-If-Match לא תקין מחזיר 400"""
+        response = client.delete(f'/api/playlists/{ObjectId()}/songs/0', headers={"If-Match": "abc"})
+
+        assert response.status_code == 400
+        mock_db.db.playlists.update_one.assert_not_called()
+
+    def test_concurrent_write_retried(self, client, mock_db):
+        """בדיקה שכתיבה מקבילה גורמת לקריאה מחדש ולניסיון נוסף"""
+        playlist_id = ObjectId()
+        mock_db.db.playlists.find_one.side_effect = [
+            {"_id": playlist_id, "songs": [{"title": "a"}, {"title": "b"}], "version": 0},
+            {"_id": playlist_id, "songs": [{"title": "x"}, {"title": "a"}, {"title": "b"}], "version": 1},
+        ]
+        mock_db.db.playlists.update_one.side_effect = [Mock(matched_count=0), Mock(matched_count=1)]
+
+        response = client.delete(f'/api/playlists/{playlist_id}/songs/0')
+
+        assert response.status_code == 200
+        query, update = mock_db.db.playlists.update_one.call_args[0]
+        assert query == {"_id": playlist_id, "version": 1}
+        assert apply_pipeline(update, {"songs": [{"title": "x"}, {"title": "a"}, {"title": "b"}]})["songs"] == [{"title": "a"}, {"title": "b"}]
+
+    def test_retries_exhausted(self, client, mock_db):
+        """בדיקה שאחרי ניסיונות חוזרים מוחזר 409"""
+        artist_id = ObjectId()
+        mock_db.db.artists.find_one.return_value = {"_id": artist_id, "songs": [{"title": "a"}], "version": 3}
+        mock_db.db.artists.update_one.return_value = Mock(matched_count=0)
+
+        response = client.delete(f'/api/artists/{artist_id}/songs/0')
+
+        assert response.status_code == 409
+        assert mock_db.db.artists.update_one.call_count == 3
+
+    def test_cascade_bumps_version(self):
+        """בדיקה שניקוי אמן מקדם את גרסת הפלייליסט"""
+        final = cascade._remove_artist_pipeline("a")[-1]["$set"]
+
+        assert final["version"] == {"$add": [{"$ifNull": ["$version", 0]}, 1]}
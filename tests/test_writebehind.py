@@ -0,0 +1,195 @@
+import threading
+import pytest
+import mongomock
+from unittest.mock import Mock, patch
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+import writebehind
+from app import app
+
+
+@pytest.fixture
+def coalescer():
+    return writebehind.WriteCoalescer(window=0.05)
+
+
+class TestWriteCoalescer:
+    def test_burst_flushed_as_one_bulk_write(self, coalescer):
+        """בדיקה שפרץ כתיבות נשלח כ-bulk_write אחד"""
+        playlists = mongomock.MongoClient().db.playlists
+        playlist_id = playlists.insert_one({"songs": [], "song_count": 0}).inserted_id
+
+        futures = [
+            coalescer.submit(playlists, {"_id": playlist_id}, {"$push": {"songs": i}, "$inc": {"song_count": 1}})
+            for i in range(20)
+        ]
+
+        assert [f.result(5) for f in futures] == [True] * 20
+        playlist = playlists.find_one({"_id": playlist_id})
+        assert playlist["songs"] == list(range(20))
+        assert playlist["song_count"] == 20
+        assert coalescer.stats() == {"flushes": 1, "operations": 20}
+
+    def test_unmatched_document_resolves_false(self, coalescer):
+        """בדיקה שכתיבה למסמך שלא קיים מחזירה False"""
+        playlists = mongomock.MongoClient().db.playlists
+        existing = playlists.insert_one({"songs": []}).inserted_id
+
+        hit = coalescer.submit(playlists, {"_id": existing}, {"$push": {"songs": 1}})
+        miss = coalescer.submit(playlists, {"_id": ObjectId()}, {"$push": {"songs": 1}})
+
+        assert hit.result(5) is True
+        assert miss.result(5) is False
+
+    def test_unmatched_conditional_write_not_reported_as_matched(self, coalescer):
+        """בדיקה שכתיבה מותנית שלא התאימה למסמך קיים לא מדווחת כהצלחה"""
+        playlists = mongomock.MongoClient().db.playlists
+        playlist_id = playlists.insert_one({"songs": [], "version": 5}).inserted_id
+
+        stale = coalescer.submit(playlists, {"_id": playlist_id, "version": 3}, {"$push": {"songs": 1}})
+
+        assert stale.result(5) is None
+        assert playlists.find_one({"_id": playlist_id})["songs"] == []
+
+    def test_dedupe_key_runs_upsert_once(self, coalescer):
+        """בדיקה שאתחול משותף רץ פעם אחת בחלון"""
+        favorites = mongomock.MongoClient().db.favorites
+        init = {"$setOnInsert": {"type": "user_favorites", "songs": []}}
+
+        futures = []
+        for title in ("a", "b", "c"):
+            futures.append(coalescer.submit(favorites, {"type": "user_favorites"}, init, upsert=True, dedupe_key="init"))
+            futures.append(coalescer.submit(favorites, {"type": "user_favorites"}, {"$push": {"songs": title}}))
+        for f in futures:
+            f.result(5)
+
+        assert favorites.count_documents({}) == 1
+        assert favorites.find_one()["songs"] == ["a", "b", "c"]
+        assert coalescer.stats()["operations"] == 4
+
+    def test_collections_flushed_separately(self, coalescer):
+        """בדיקה שכל אוסף נשלח ב-bulk_write משלו"""
+        db = mongomock.MongoClient().db
+        a = db.playlists.insert_one({"songs": []}).inserted_id
+        b = db.favorites.insert_one({"songs": []}).inserted_id
+
+        coalescer.submit(db.playlists, {"_id": a}, {"$push": {"songs": 1}}).result(5)
+        coalescer.submit(db.favorites, {"_id": b}, {"$push": {"songs": 1}}).result(5)
+
+        assert coalescer.stats()["operations"] == 2
+
+    def test_bulk_write_error_fails_remaining_operations(self, coalescer):
+        """בדיקה שכשל באמצע מכשיל רק את הפעולות שאחריו"""
+        collection = Mock(full_name="db.playlists")
+        ids = [ObjectId() for _ in range(3)]
+        collection.bulk_write.side_effect = BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "boom"}]})
+        collection.find.return_value = [{"_id": ids[0]}]
+
+        futures = [coalescer.submit(collection, {"_id": i}, {"$inc": {"n": 1}}) for i in ids]
+
+        assert futures[0].result(5) is True
+        for f in futures[1:]:
+            with pytest.raises(BulkWriteError):
+                f.result(5)
+
+    def test_connection_error_fails_all_operations(self, coalescer):
+        """בדיקה שכשל כללי מועבר לכל הממתינים"""
+        collection = Mock(full_name="db.playlists")
+        collection.bulk_write.side_effect = Exception("Database error")
+
+        futures = [coalescer.submit(collection, {"_id": ObjectId()}, {"$inc": {"n": 1}}) for _ in range(2)]
+
+        for f in futures:
+            with pytest.raises(Exception, match="Database error"):
+                f.result(5)
+
+    def test_write_concern_error_fails_all_operations(self, coalescer):
+        """בדיקה ששגיאת write concern בלבד מכשילה את כל הממתינים ולא תוקעת אותם"""
+        collection = Mock(full_name="db.playlists")
+        collection.bulk_write.side_effect = BulkWriteError({"writeErrors": [], "writeConcernErrors": [{"errmsg": "wtimeout"}]})
+
+        futures = [coalescer.submit(collection, {"_id": ObjectId()}, {"$inc": {"n": 1}}) for _ in range(2)]
+
+        for f in futures:
+            with pytest.raises(BulkWriteError):
+                f.result(5)
+
+    def test_failed_match_check_does_not_stop_flusher(self, coalescer):
+        """בדיקה שכשל בבדיקת ההתאמה מכשיל את הממתינים והמנגנון ממשיך לעבוד"""
+        collection = Mock(full_name="db.playlists")
+        collection.bulk_write.return_value = Mock(matched_count=0, upserted_count=0)
+        collection.find.side_effect = AutoReconnect("connection lost")
+
+        failed = coalescer.submit(collection, {"_id": ObjectId()}, {"$inc": {"n": 1}})
+        with pytest.raises(AutoReconnect):
+            failed.result(5)
+
+        collection.bulk_write.return_value = Mock(matched_count=1, upserted_count=0)
+        assert coalescer.submit(collection, {"_id": ObjectId()}, {"$inc": {"n": 1}}).result(5) is True
+
+
+class TestCoalescedRoutes:
+    @pytest.fixture
+    def coalesced_db(self, client):
+        db = mongomock.MongoClient().db
+        with patch('app.mongo') as mock_mongo, \
+                patch('app.write_coalescer', writebehind.WriteCoalescer(window=0.05)), \
+                patch.dict('app.app.config', {"WRITE_COALESCING_ENABLED": True}):
+            mock_mongo.db = db
+            yield db
+
+    def test_concurrent_playlist_appends(self, client, coalesced_db):
+        """בדיקה שהוספות במקביל לפלייליסט נשמרות כולן"""
+        playlist_id = coalesced_db.playlists.insert_one(
+            {"songs": [], "song_count": 0, "total_duration_seconds": 0}
+        ).inserted_id
+        statuses = []
+
+        def add(i):
+            # A client per thread; the shared fixture client keeps its request context
+            statuses.append(app.test_client().post(f'/api/playlists/{playlist_id}/songs', json={
+                "artist_id": "a", "artist_name": "A", "title": f"song {i}", "duration": "1:00"
+            }).status_code)
+
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        playlist = coalesced_db.playlists.find_one({"_id": playlist_id})
+        assert statuses == [200] * 10
+        assert playlist["song_count"] == 10
+        assert playlist["total_duration_seconds"] == 600
+
+    def test_playlist_not_found(self, client, coalesced_db):
+        """בדיקה שפלייליסט שלא קיים מחזיר 404"""
+        response = client.post(f'/api/playlists/{ObjectId()}/songs', json={
+            "artist_id": "a", "artist_name": "A", "title": "t", "duration": "1:00"
+        })
+
+        assert response.status_code == 404
+
+    def test_stale_if_match_append(self, client, coalesced_db):
+        """בדיקה שהוספה עם If-Match ישן מחזירה 412 ולא נבלעת"""
+        playlist_id = coalesced_db.playlists.insert_one({"songs": [], "version": 5}).inserted_id
+
+        response = client.post(f'/api/playlists/{playlist_id}/songs', headers={"If-Match": '"3"'}, json={
+            "artist_id": "a", "artist_name": "A", "title": "t", "duration": "1:00"
+        })
+
+        assert response.status_code == 412
+        assert coalesced_db.playlists.find_one({"_id": playlist_id})["songs"] == []
+
+    def test_add_favorite_creates_document(self, client, coalesced_db):
+        """בדיקה שהוספת מועדף יוצרת את המסמך פעם אחת"""
+        for title in ("t1", "t1", "t2"):
+            response = client.post('/api/favorites/songs', json={
+                "artist_id": "a", "artist_name": "A", "title": title, "duration": "1:00"
+            })
+            assert response.status_code == 200
+
+        favorites = coalesced_db.favorites.find_one({"type": "user_favorites"})
+        assert coalesced_db.favorites.count_documents({}) == 1
+        assert [s["title"] for s in favorites["songs"]] == ["t1", "t2"]
@@ -0,0 +1,129 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+class WriteCoalescer:
+    """
+    Write-behind batching for bursty single-document updates.
+
+    Callers submit single-document updates and block on the returned
+    future. A flusher thread waits up to ``window`` seconds after
+    the first pending write (or until ``max_batch`` are queued), then sends
+    everything for a collection as one ordered ``bulk_write``. Futures
+    resolve to True/False for whether the operation's filter matched a
+    document, or None when that cannot be told.
+
+    Operations submitted with the same ``dedupe_key`` within one window run
+    once, at the position of the first submission. This lets many callers
+    share one "ensure document exists" upsert.
+
+    Every future is resolved or failed whatever goes wrong in a flush;
+    callers should still wait at most ``timeout`` seconds for it.
+    """
+
+    def __init__(self, window=0.005, max_batch=500, logger=None, timeout=10.0):
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.logger = logger
+        self.flushes = 0
+        self.operations = 0
+        self._pending = {}
+        self._size = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, collection, query, update, upsert=False, dedupe_key=None):
+        future = Future()
+        operation = UpdateOne(query, update, upsert=upsert)
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            batch = self._pending.setdefault(collection.full_name, {"collection": collection, "ops": [], "keys": {}})
+            if dedupe_key is not None and dedupe_key in batch["keys"]:
+                batch["keys"][dedupe_key][2].append(future)
+            else:
+                entry = (query, operation, [future])
+                batch["ops"].append(entry)
+                if dedupe_key is not None:
+                    batch["keys"][dedupe_key] = entry
+                self._size += 1
+            self._cond.notify_all()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.window
+                while self._size < self.max_batch and time.monotonic() < deadline:
+                    self._cond.wait(deadline - time.monotonic())
+                pending, self._pending, self._size = self._pending, {}, 0
+            for batch in pending.values():
+                try:
+                    self.flush(batch["collection"], batch["ops"])
+                except Exception as e:
+                    # Keep the flusher alive and never leave a caller waiting
+                    if self.logger:
+                        self.logger.warning("Write-behind flush failed: %s", e)
+                    self._fail(batch["ops"], e)
+
+    @staticmethod
+    def _fail(entries, error):
+        for _, _, futures in entries:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+
+    def flush(self, collection, entries):
+        operations = [operation for _, operation, _ in entries]
+        self.flushes += 1
+        self.operations += len(operations)
+        try:
+            result = collection.bulk_write(operations, ordered=True)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors") or []
+            if not write_errors:
+                # Only a write concern error: applied, but not durably confirmed
+                self._fail(entries, e)
+                return
+            # Ordered: everything before the first error was applied, nothing after it
+            failed_at = write_errors[0]["index"]
+            self._fail(entries[failed_at:], e)
+            self._resolve(collection, entries[:failed_at], None)
+            return
+        except Exception as e:
+            if self.logger:
+                self.logger.warning("Write-behind flush failed: %s", e)
+            self._fail(entries, e)
+            return
+        self._resolve(collection, entries, result.matched_count + result.upserted_count)
+
+    def _resolve(self, collection, entries, matched_count):
+        if matched_count == len(entries):
+            matched = {i: True for i in range(len(entries))}
+        else:
+            matched = self._which_matched(collection, entries)
+        for i, (_, _, futures) in enumerate(entries):
+            for future in futures:
+                future.set_result(matched.get(i))
+
+    @staticmethod
+    def _which_matched(collection, entries):
+        # Only writes filtered on _id alone can be checked afterwards, with one
+        # query for all of them. Any other predicate (a version, say) may have
+        # failed on a document that exists, or stopped matching once applied.
+        ids = {i: query["_id"] for i, (query, _, _) in enumerate(entries) if query.keys() == {"_id"}}
+        if not ids:
+            return {}
+        existing = {doc["_id"] for doc in collection.find({"_id": {"$in": list(ids.values())}}, {"_id": 1})}
+        return {i: _id in existing for i, _id in ids.items()}
+
+    def stats(self):
+        return {"flushes": self.flushes, "operations": self.operations}